@@ -1,18 +1,44 @@
 """Flask application entry point for the CureHelp+ medical assistant."""
 from __future__ import annotations
 
+import hmac
 import os
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import joblib
-import numpy as np
 from flask import Flask, jsonify, render_template, request, send_file, session
 
-from chatbot import get_chatbot_response
+from chatbot import (
+    coalescing_stats,
+    end_session,
+    get_chatbot_response,
+    get_chatbot_responses,
+    get_session_response,
+    resolve_faq_ranker,
+    response_cache_stats,
+    session_stats,
+    suggest_names,
+    update_knowledge_base,
+)
+from chatbot_runtime import ChatExecutor, ChatUnavailableError
+from chatbot_updates import ADMIN_TOKEN_ENV_VAR, ADMIN_TOKEN_HEADER, UpdateError
+from chatbot_warmup import QueryLog
 from consultant import get_consultant_directory, search_providers
 from helper import fetch_gemini_recommendations
 from makepdf import generate_pdf_report
+from predictions import (
+    PREDICTORS,
+    parse_anemia,
+    parse_diabetes,
+    parse_fever,
+    parse_heart,
+    predict_records,
+    score_anemia,
+    score_diabetes,
+    score_fever,
+    score_heart,
+)
 from profile_manager import profile_manager
 from report_parser import REPORT_ALLOWED_EXTENSIONS, parse_medical_report
 
@@ -44,6 +70,11 @@ def load_models() -> Dict[str, Any]:
 MODELS = load_models()
 
 MAX_REPORT_SIZE_BYTES = 200 * 1024 * 1024
+CHAT_BATCH_LIMIT = int(os.environ.get("CUREHELP_CHAT_BATCH_LIMIT", "1000"))
+PREDICT_BATCH_LIMIT = int(os.environ.get("CUREHELP_PREDICT_BATCH_LIMIT", "10000"))
+CHAT_EXECUTOR = ChatExecutor.from_env()
+CHAT_QUERY_LOG = QueryLog.from_env()
+CHAT_SUGGEST_MAX_LIMIT = 25
 
 DIABETES_NORMALS = {
     "Pregnancies": 3,
@@ -81,81 +112,6 @@ FEVER_NORMALS = {
     "Heart Rate": 75,
 }
 
-DIABETES_INPUT_LABELS = {
-    "gender": "Gender",
-    "age": "Age",
-    "bmi": "BMI",
-    "glucose": "Glucose",
-    "blood_pressure": "Blood Pressure",
-    "pregnancies": "Pregnancies",
-    "skin_thickness": "Skin Thickness",
-    "insulin": "Insulin",
-    "diabetes_pedigree_function": "Diabetes Pedigree Function",
-}
-
-HEART_INPUT_LABELS = {
-    "gender": "Sex",
-    "age": "Age",
-    "resting_bp": "Resting BP",
-    "cholesterol": "Cholesterol",
-    "chest_pain_type": "Chest Pain Type",
-    "fasting_bs": "Fasting BS > 120?",
-    "resting_ecg": "Resting ECG",
-    "max_heart_rate": "Max Heart Rate",
-    "exercise_angina": "Exercise Angina",
-    "st_depression": "ST Depression",
-    "slope": "Slope of ST",
-    "major_vessels": "Major Vessels (ca)",
-    "thal": "Thal",
-}
-
-FEVER_CATEGORICAL_ENCODERS = {
-    "gender": "Gender",
-    "headache": "Headache",
-    "body_ache": "Body_Ache",
-    "fatigue": "Fatigue",
-    "chronic_conditions": "Chronic_Conditions",
-    "allergies": "Allergies",
-    "smoking_history": "Smoking_History",
-    "alcohol_consumption": "Alcohol_Consumption",
-    "physical_activity": "Physical_Activity",
-    "diet_type": "Diet_Type",
-    "blood_pressure": "Blood_Pressure",
-    "previous_medication": "Previous_Medication",
-}
-
-ANEMIA_INPUT_LABELS = {
-    "gender": "Gender",
-    "rbc": "RBC",
-    "hemoglobin": "Hemoglobin (Hb)",
-    "hematocrit": "Hematocrit (HCT)",
-    "mcv": "MCV",
-    "mch": "MCH",
-    "mchc": "MCHC",
-    "wbc": "WBC",
-    "platelets": "Platelets",
-    "rdw": "RDW",
-    "pdw": "PDW",
-    "pct": "PCT",
-    "lymphocytes": "Lymphocytes",
-    "neutrophils_pct": "Neutrophils %",
-    "neutrophils_num": "Neutrophils #",
-}
-
-
-def _convert_to_float(payload: Dict[str, Any], key: str) -> float:
-    if key not in payload:
-        raise ValueError(f"Missing field: {key}")
-    try:
-        return float(payload[key])
-    except (TypeError, ValueError):
-        raise ValueError(f"Invalid value for {key}")
-
-
-def _map_display_inputs(payload: Dict[str, Any], mapping: Dict[str, str]) -> Dict[str, Any]:
-    return {friendly: payload.get(raw) for raw, friendly in mapping.items() if raw in payload}
-
-
 def _current_predictions() -> Dict[str, Any]:
     return session.get("predictions", {})
 
@@ -339,35 +295,12 @@ def delete_profile(profile_id: str):
 def predict_diabetes():
     data = request.get_json(force=True, silent=True) or {}
     try:
-        gender = data.get("gender", "Female")
-        pregnancies = _convert_to_float(data, "pregnancies") if gender.lower() == "female" else 0.0
-        inputs = {
-            "Pregnancies": pregnancies,
-            "Glucose": _convert_to_float(data, "glucose"),
-            "Blood Pressure": _convert_to_float(data, "blood_pressure"),
-            "Skin Thickness": _convert_to_float(data, "skin_thickness"),
-            "Insulin": _convert_to_float(data, "insulin"),
-            "BMI": _convert_to_float(data, "bmi"),
-            "Diabetes Pedigree Function": _convert_to_float(data, "diabetes_pedigree_function"),
-            "Age": _convert_to_float(data, "age"),
-        }
+        features, display_inputs = parse_diabetes(data)
     except ValueError as exc:
         return jsonify({"success": False, "error": str(exc)}), 400
 
-    arr = np.array([[
-        inputs["Pregnancies"],
-        inputs["Glucose"],
-        inputs["Blood Pressure"],
-        inputs["Skin Thickness"],
-        inputs["Insulin"],
-        inputs["BMI"],
-        inputs["Diabetes Pedigree Function"],
-        inputs["Age"],
-    ]], dtype=np.float64)
-    arr_scaled = MODELS["diabetes_scaler"].transform(arr)
-    probability = float(MODELS["diabetes_model"].predict_proba(arr_scaled)[0][1] * 100)
-
-    display_inputs = _map_display_inputs({**data, **{"pregnancies": pregnancies}}, DIABETES_INPUT_LABELS)
+    probability = score_diabetes(MODELS, [features])[0]["probability"]
+
     _store_prediction(
         "Diabetes",
         {"prob": probability, "inputs": display_inputs},
@@ -391,65 +324,11 @@ def predict_diabetes():
 def predict_heart():
     data = request.get_json(force=True, silent=True) or {}
     try:
-        gender = data.get("gender", "Male")
-        sex_code = 1 if gender.lower() == "male" else 0
-        cp_value = str(data.get("chest_pain_type", "1"))
-        fbs_value = data.get("fasting_bs", "No")
-        restecg_value = str(data.get("resting_ecg", "0"))
-        exang_value = data.get("exercise_angina", "No")
-        slope_value = str(data.get("slope", "1"))
-        thal_value = str(data.get("thal", "3"))
-
-        cp_code = int(cp_value.split(" ")[0]) if " " in cp_value else int(cp_value)
-        restecg_code = int(restecg_value.split(" ")[0]) if " " in restecg_value else int(restecg_value)
-        slope_code = int(slope_value.split(" ")[0]) if " " in slope_value else int(slope_value)
-        thal_code = int(thal_value.split(" ")[0]) if " " in thal_value else int(thal_value)
-
-        inputs = {
-            "Age": _convert_to_float(data, "age"),
-            "Sex": sex_code,
-            "Chest Pain Type": cp_code,
-            "Resting BP": _convert_to_float(data, "resting_bp"),
-            "Cholesterol": _convert_to_float(data, "cholesterol"),
-            "Fasting BS > 120?": 1 if str(fbs_value).lower() in {"yes", "1", "true"} else 0,
-            "Resting ECG": restecg_code,
-            "Max Heart Rate": _convert_to_float(data, "max_heart_rate"),
-            "Exercise Angina": 1 if str(exang_value).lower() in {"yes", "1", "true"} else 0,
-            "ST Depression": _convert_to_float(data, "st_depression"),
-            "Slope of ST": slope_code,
-            "Major Vessels (ca)": _convert_to_float(data, "major_vessels"),
-            "Thal": thal_code,
-        }
+        features, display_inputs = parse_heart(data)
     except ValueError as exc:
         return jsonify({"success": False, "error": str(exc)}), 400
 
-    arr = np.array([[
-        inputs["Age"],
-        inputs["Sex"],
-        inputs["Chest Pain Type"],
-        inputs["Resting BP"],
-        inputs["Cholesterol"],
-        inputs["Fasting BS > 120?"],
-        inputs["Resting ECG"],
-        inputs["Max Heart Rate"],
-        inputs["Exercise Angina"],
-        inputs["ST Depression"],
-        inputs["Slope of ST"],
-        inputs["Major Vessels (ca)"],
-        inputs["Thal"],
-    ]], dtype=np.float64)
-    arr_scaled = MODELS["heart_scaler"].transform(arr)
-    probability = float(MODELS["heart_model"].predict_proba(arr_scaled)[0][1] * 100)
-
-    display_inputs = _map_display_inputs({**data, **{"gender": gender}}, HEART_INPUT_LABELS)
-    display_inputs.update({
-        "Sex": inputs["Sex"],
-        "Chest Pain Type": inputs["Chest Pain Type"],
-        "Fasting BS > 120?": inputs["Fasting BS > 120?"],
-        "Exercise Angina": inputs["Exercise Angina"],
-        "Slope of ST": inputs["Slope of ST"],
-        "Thal": inputs["Thal"],
-    })
+    probability = score_heart(MODELS, [features])[0]["probability"]
 
     _store_prediction(
         "Heart Disease",
@@ -474,44 +353,15 @@ def predict_heart():
 def predict_fever():
     data = request.get_json(force=True, silent=True) or {}
     try:
-        numeric_inputs = {
-            "Temperature (C)": _convert_to_float(data, "temperature"),
-            "Age": _convert_to_float(data, "age"),
-            "BMI": _convert_to_float(data, "bmi"),
-            "Humidity (%)": _convert_to_float(data, "humidity"),
-            "Air Quality Index": _convert_to_float(data, "air_quality"),
-            "Heart Rate": _convert_to_float(data, "heart_rate"),
-        }
-    except ValueError as exc:
-        return jsonify({"success": False, "error": str(exc)}), 400
-
-    numeric_array = np.array([list(numeric_inputs.values())], dtype=np.float64)
-    numeric_scaled = MODELS["fever_scaler"].transform(numeric_array)
-
-    encoded = []
-    categorical_display: Dict[str, Any] = {}
-    try:
-        for key, encoder_name in FEVER_CATEGORICAL_ENCODERS.items():
-            value = data.get(key)
-            if value is None:
-                raise ValueError(f"Missing field: {key}")
-            categorical_display[encoder_name.replace("_", " ")] = value
-            encoder = MODELS["fever_le_dict"][encoder_name]
-            if value in encoder.classes_:
-                encoded.append(encoder.transform([value])[0])
-            else:
-                encoded.append(encoder.transform([encoder.classes_[0]])[0])
+        features, display_inputs = parse_fever(data)
+        prediction = score_fever(MODELS, [features])[0]
     except KeyError as exc:
         return jsonify({"success": False, "error": f"Unknown categorical field: {exc}"}), 400
     except ValueError as exc:
         return jsonify({"success": False, "error": str(exc)}), 400
 
-    final_input = np.hstack([numeric_scaled, np.array([encoded])])
-    severity_idx = int(MODELS["fever_severity_model"].predict(final_input)[0])
-    severity_label = MODELS["fever_target_le"].inverse_transform([severity_idx])[0]
-    risk_percent = float(np.clip(MODELS["fever_risk_model"].predict(final_input)[0], 0, 100))
-
-    display_inputs = {**numeric_inputs, **categorical_display}
+    risk_percent = prediction["probability"]
+    severity_label = prediction["severity"]
     _store_prediction(
         "Fever",
         {"prob": risk_percent, "inputs": display_inputs, "severity": severity_label},
@@ -535,37 +385,16 @@ def predict_fever():
 @app.route("/api/anemia", methods=["POST"])
 def predict_anemia():
     data = request.get_json(force=True, silent=True) or {}
+    gender = data.get("gender", "Female")
     try:
-        gender = data.get("gender", "Female")
-        input_array = np.array([
-            _convert_to_float(data, "rbc"),
-            _convert_to_float(data, "hemoglobin"),
-            _convert_to_float(data, "mcv"),
-            _convert_to_float(data, "mch"),
-            _convert_to_float(data, "mchc"),
-            _convert_to_float(data, "hematocrit"),
-            _convert_to_float(data, "wbc"),
-            _convert_to_float(data, "platelets"),
-            _convert_to_float(data, "pdw"),
-            _convert_to_float(data, "pct"),
-            _convert_to_float(data, "lymphocytes"),
-            _convert_to_float(data, "neutrophils_pct"),
-            _convert_to_float(data, "neutrophils_num"),
-        ]).reshape(1, -1)
+        features, display_inputs = parse_anemia(data)
     except ValueError as exc:
         return jsonify({"success": False, "error": str(exc)}), 400
 
-    input_scaled = MODELS["anemia_scaler"].transform(input_array)
-    risk_prob = float(MODELS["anemia_risk_model"].predict_proba(input_scaled)[0][1] * 100)
-
-    try:
-        type_pred = MODELS["anemia_type_model"].predict(input_scaled)[0]
-        anemia_type_label = MODELS["anemia_label_encoder"].inverse_transform([type_pred])[0]
-    except Exception:
-        mcv_value = _convert_to_float(data, "mcv")
-        anemia_type_label = "Microcytic" if mcv_value < 80 else ("Normocytic" if mcv_value <= 100 else "Macrocytic")
+    prediction = score_anemia(MODELS, [features])[0]
+    risk_prob = prediction["probability"]
+    anemia_type_label = prediction["severity"]
 
-    display_inputs = _map_display_inputs(data, ANEMIA_INPUT_LABELS)
     _store_prediction(
         "Anemia",
         {"prob": risk_prob, "inputs": display_inputs, "severity": anemia_type_label},
@@ -586,6 +415,24 @@ def predict_anemia():
     )
 
 
+@app.route("/api/<disease>/batch", methods=["POST"])
+def predict_batch(disease: str):
+    if disease not in PREDICTORS:
+        return jsonify({"success": False, "error": f"Unknown disease: {disease}"}), 404
+    payload = request.get_json(force=True, silent=True) or {}
+    records = payload.get("records")
+    if not isinstance(records, list) or not records:
+        return jsonify({"success": False, "error": "Records must be a non-empty list."}), 400
+    if len(records) > PREDICT_BATCH_LIMIT:
+        return jsonify({"success": False, "error": f"At most {PREDICT_BATCH_LIMIT} records per batch."}), 400
+
+    try:
+        results = predict_records(disease, MODELS, records)
+    except KeyError as exc:
+        return jsonify({"success": False, "error": f"Unknown categorical field: {exc}"}), 400
+    return jsonify({"success": True, "disease": PREDICTORS[disease][0], "results": results})
+
+
 @app.route("/api/report", methods=["GET"])
 def get_report_summary():
     return jsonify({"success": True, "predictions": _current_predictions()})
@@ -611,21 +458,152 @@ def download_report():
     return send_file(pdf_buffer, as_attachment=True, download_name=f"CureHelp_Report_{timestamp}.pdf", mimetype="application/pdf")
 
 
+def _requested_faq_ranker(payload: Dict[str, Any]) -> str:
+    """FAQ ranker from ``?ranker=`` or the JSON body; raises ValueError if unknown."""
+
+    ranker = request.args.get("ranker") or payload.get("ranker")
+    if ranker is not None and not isinstance(ranker, str):
+        raise ValueError("Ranker must be a string.")
+    return resolve_faq_ranker(ranker)
+
+
+def _requested_flag(name: str, payload: Dict[str, Any]) -> bool:
+    """Boolean option from ``?name=`` or the JSON body (``true``/``1``/``yes``)."""
+
+    value = request.args.get(name, payload.get(name, False))
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes"}
+    return value is True
+
+
 @app.route("/api/chat", methods=["POST"])
 def chat():
     payload = request.get_json(force=True, silent=True) or {}
     message = payload.get("message", "").strip()
     if not message:
         return jsonify({"success": False, "error": "Message cannot be empty."}), 400
+    try:
+        ranker = _requested_faq_ranker(payload)
+    except ValueError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 400
+    session_id = payload.get("session_id")
+    if session_id is not None and not isinstance(session_id, str):
+        return jsonify({"success": False, "error": "Session id must be a string."}), 400
+    explain = _requested_flag("explain", payload)
+    in_session = session_id is not None or _requested_flag("session", payload)
+    if in_session and explain:
+        return jsonify({"success": False, "error": "Explain is not available in chat sessions."}), 400
+    if CHAT_QUERY_LOG is not None:
+        CHAT_QUERY_LOG.record(message, ranker)
 
     try:
-        response = get_chatbot_response(message)
+        if in_session:
+            response = CHAT_EXECUTOR.run(get_session_response, message, session_id, ranker)
+        else:
+            response = CHAT_EXECUTOR.run(get_chatbot_response, message, ranker, explain)
+    except ChatUnavailableError as exc:
+        return jsonify({"success": False, "error": str(exc), "retry": True}), 503
     except RuntimeError as exc:
         return jsonify({"success": False, "error": str(exc)}), 500
 
     return jsonify({"success": True, "response": response})
 
 
+@app.route("/api/chat/session/<session_id>", methods=["DELETE"])
+def chat_session_end(session_id: str):
+    return jsonify({"success": True, "ended": end_session(session_id)})
+
+
+@app.route("/api/chat/batch", methods=["POST"])
+def chat_batch():
+    payload = request.get_json(force=True, silent=True) or {}
+    messages = payload.get("messages")
+    if not isinstance(messages, list) or not messages:
+        return jsonify({"success": False, "error": "Messages must be a non-empty list."}), 400
+    if len(messages) > CHAT_BATCH_LIMIT:
+        return jsonify({"success": False, "error": f"At most {CHAT_BATCH_LIMIT} messages per batch."}), 400
+    try:
+        ranker = _requested_faq_ranker(payload)
+    except ValueError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 400
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+    valid: Dict[int, str] = {}
+    for position, message in enumerate(messages):
+        if not isinstance(message, str):
+            results[position] = {"success": False, "error": "Message must be a string."}
+        elif not message.strip():
+            results[position] = {"success": False, "error": "Message cannot be empty."}
+        else:
+            valid[position] = message.strip()
+
+    try:
+        responses = (
+            CHAT_EXECUTOR.run(
+                get_chatbot_responses, list(valid.values()), ranker, timeout=CHAT_EXECUTOR.batch_timeout_seconds
+            )
+            if valid
+            else []
+        )
+    except ChatUnavailableError as exc:
+        return jsonify({"success": False, "error": str(exc), "retry": True}), 503
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 500
+
+    for position, response in zip(valid, responses):
+        results[position] = {"success": True, "response": response}
+    return jsonify({"success": True, "results": results})
+
+
+@app.route("/api/chat/suggest", methods=["GET"])
+def chat_suggest():
+    query = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 8, type=int), 1), CHAT_SUGGEST_MAX_LIMIT)
+    if not query.strip():
+        return jsonify({"success": True, "suggestions": []})
+
+    # Completions are a bisect over an in-memory table, so they run inline
+    # rather than queueing behind chat requests on CHAT_EXECUTOR.
+    try:
+        suggestions = suggest_names(query, limit)
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 500
+    return jsonify({"success": True, "suggestions": suggestions})
+
+
+@app.route("/api/chat/metrics", methods=["GET"])
+def chat_metrics():
+    return jsonify(
+        {
+            "success": True,
+            "cache": response_cache_stats(),
+            "coalescing": coalescing_stats(),
+            "sessions": session_stats(),
+            "executor": CHAT_EXECUTOR.stats(),
+        }
+    )
+
+
+@app.route("/api/admin/kb", methods=["POST"])
+def admin_update_knowledge_base():
+    """Apply one chatbot knowledge-base update (see ``chatbot_updates``)."""
+
+    token = os.environ.get(ADMIN_TOKEN_ENV_VAR)
+    if not token:
+        return jsonify({"success": False, "error": "Knowledge-base updates are disabled."}), 403
+    if not hmac.compare_digest(request.headers.get(ADMIN_TOKEN_HEADER, "").encode(), token.encode()):
+        return jsonify({"success": False, "error": "Invalid admin token."}), 403
+
+    payload = request.get_json(force=True, silent=True)
+    try:
+        result = update_knowledge_base(payload)
+    except UpdateError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 400
+    except RuntimeError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 500
+    return jsonify({"success": True, "result": result})
+
+
 @app.route("/api/consultants", methods=["GET"])
 def consultants():
     query = request.args.get("q")
@@ -0,0 +1,85 @@
+"""Throughput of ``/api/chat/batch`` against one ``/api/chat`` call per message.
+
+Builds a mixed workload of FAQ questions, symptom lists and disease names from
+the shipped datasets, posts it through the Flask test client both ways and
+checks that every batch result matches the single-message reply.
+
+Usage::
+
+    python benchmarks/bench_chat_batch.py --messages 1000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import chatbot  # noqa: E402
+from app import app  # noqa: E402
+
+
+def workload(size: int, seed: int = 11) -> List[str]:
+    """Roughly half FAQ questions, a third symptom lists, the rest disease names."""
+
+    knowledge_base = chatbot.get_knowledge_base()
+    _, _, _, _, humanqa_df = knowledge_base.datasets
+    questions = humanqa_df["question"].astype(str).tolist()
+    matrix = knowledge_base.symptom_matrix
+    symptoms = [symptom.replace("_", " ") for symptom in matrix.symptoms]
+
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.5:
+            messages.append(rng.choice(questions))
+        elif roll < 0.85:
+            messages.append(", ".join(rng.sample(symptoms, rng.randint(2, 4))))
+        else:
+            messages.append(rng.choice(matrix.diseases))
+    return messages
+
+
+def _post(client, url: str, payload) -> dict:
+    response = client.post(url, data=json.dumps(payload), content_type="application/json")
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1000, help="messages per batch request")
+    args = parser.parse_args()
+
+    messages = workload(args.messages)
+    client = app.test_client()
+    _post(client, "/api/chat", {"message": messages[0]})
+
+    start = time.perf_counter()
+    single = [_post(client, "/api/chat", {"message": message})["response"] for message in messages]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = []
+    for offset in range(0, len(messages), args.batch_size):
+        chunk = messages[offset:offset + args.batch_size]
+        batched.extend(item["response"] for item in _post(client, "/api/chat/batch", {"messages": chunk})["results"])
+    batch_seconds = time.perf_counter() - start
+
+    agree = sum(a == b for a, b in zip(single, batched))
+    print(f"{'route':>16} {'seconds':>8} {'msgs/s':>9}")
+    print(f"{'/api/chat':>16} {single_seconds:>8.3f} {len(messages) / single_seconds:>9.0f}")
+    print(f"{'/api/chat/batch':>16} {batch_seconds:>8.3f} {len(messages) / batch_seconds:>9.0f}")
+    print(f"speed-up {single_seconds / batch_seconds:.1f}x, identical replies {agree}/{len(messages)}")
+
+
+if __name__ == "__main__":
+    main()
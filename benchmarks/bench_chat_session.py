@@ -0,0 +1,132 @@
+"""Per-turn cost of a multi-turn symptom session: running scores vs recomputing.
+
+A simulated user names one more of a sampled disease's listed symptoms
+per message, for up to ``--turns`` messages, and every second message
+also denies a symptom the disease does not list. Each turn is scored two
+ways:
+
+* scratch: ``SymptomMatrix.candidate_weights`` over every symptom so far
+  (one sparse mat-vec over the whole query), as a stateless reply must
+* session: ``SymptomSession.confirm`` / ``rule_out`` (one sparse column
+  add or row mask per new symptom) and ``weights``
+
+``--copies`` stacks that many copies of the shipped matrix (rows of the
+same disease) to see how both scale with the number of rows. Reported:
+median microseconds per turn for the score update alone and for a whole
+turn (update, ranking and follow-up questions), the share of turns whose
+ranking and follow-ups agree, and the memory of one session.
+
+Usage::
+
+    python benchmarks/bench_chat_session.py --copies 1 10 100
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from chatbot import DIFFERENTIAL_SIZE, FOLLOW_UP_SYMPTOMS, get_knowledge_base  # noqa: E402
+from chatbot_index import SymptomMatrix  # noqa: E402
+from chatbot_session import SymptomSession  # noqa: E402
+
+
+def stacked(matrix: SymptomMatrix, copies: int) -> SymptomMatrix:
+    if copies == 1:
+        return matrix
+    labels = [matrix.diseases[code] for code in matrix._row_disease.tolist()]
+    return SymptomMatrix(labels * copies, matrix.symptoms, sparse.vstack([matrix._raw] * copies, format="csr"), matrix.resolver)
+
+
+def conversations(matrix: SymptomMatrix, count: int, turns: int, seed: int) -> List[List[Tuple[int, bool]]]:
+    """Per conversation, ``(column, confirmed)`` per turn."""
+
+    rng = random.Random(seed)
+    scripts = []
+    for disease in rng.sample(matrix.diseases, min(count, len(matrix.diseases))):
+        # Benchmark-only introspection: the symptoms the disease's rows list.
+        rows = np.flatnonzero(matrix._row_disease == matrix.diseases.index(disease))
+        listed = sorted(set(matrix._raw[rows].indices.tolist()))
+        rng.shuffle(listed)
+        script = []
+        for turn, column in enumerate(listed[:turns]):
+            script.append((column, True))
+            if turn % 2:
+                other = rng.randrange(len(matrix.symptoms))
+                if other not in listed:
+                    script.append((other, False))
+        scripts.append(script)
+    return scripts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    shipped = get_knowledge_base().symptom_matrix
+    if shipped is None:
+        raise SystemExit("No symptom data in bot_data/")
+    print(
+        f"{'rows':>8} {'turns':>6} {'scratch us':>11} {'session us':>11} {'scratch turn':>13} "
+        f"{'session turn':>13} {'same':>7} {'KiB/session':>12}"
+    )
+    for copies in args.copies:
+        matrix = stacked(shipped, copies)
+        update = {"scratch": [], "session": []}
+        turn_time = {"scratch": [], "session": []}
+        same = turns = 0
+        for script in conversations(matrix, args.conversations, args.turns, args.seed):
+            session = SymptomSession(matrix)
+            columns: List[int] = []
+            ruled_out: List[int] = []
+            for column, confirmed in script:
+                (columns if confirmed else ruled_out).append(column)
+
+                start = time.perf_counter()
+                weights = matrix.candidate_weights(columns, ruled_out) if columns else np.zeros(matrix.shape[0])
+                scored = time.perf_counter()
+                scratch = (matrix.rank_scores(weights, DIFFERENTIAL_SIZE), matrix.follow_up(columns, FOLLOW_UP_SYMPTOMS, ruled_out))
+                update["scratch"].append(scored - start)
+                turn_time["scratch"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                session.confirm([column]) if confirmed else session.rule_out([column])
+                weights = session.weights()
+                scored = time.perf_counter()
+                running = (
+                    matrix.rank_scores(weights, DIFFERENTIAL_SIZE),
+                    matrix.follow_up(session.confirmed, FOLLOW_UP_SYMPTOMS, session.ruled_out, weights),
+                )
+                update["session"].append(scored - start)
+                turn_time["session"].append(time.perf_counter() - start)
+
+                turns += 1
+                same += [name for name, _ in scratch[0]] == [name for name, _ in running[0]] and [
+                    name for name, _, _ in scratch[1]
+                ] == [name for name, _, _ in running[1]]
+        print(
+            f"{matrix.shape[0]:>8} {turns:>6} {statistics.median(update['scratch']) * 1e6:>11.1f} "
+            f"{statistics.median(update['session']) * 1e6:>11.1f} {statistics.median(turn_time['scratch']) * 1e6:>13.1f} "
+            f"{statistics.median(turn_time['session']) * 1e6:>13.1f} {same / turns:>7.1%} "
+            f"{SymptomSession(matrix).nbytes / 1024:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
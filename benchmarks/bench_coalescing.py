@@ -0,0 +1,92 @@
+"""Bursts of identical chat messages with and without request coalescing.
+
+Each round releases ``--threads`` threads at once, all sending the same
+message through ``get_chatbot_response`` (as a health-campaign message
+arriving from many users would). The response cache is disabled so every
+request lands in the window before the first reply is cached; with the
+cache on, only requests arriving within one analysis of each other
+coalesce. Reports the analyses actually run, wall time per burst and the
+coalescing counters.
+
+Usage::
+
+    python benchmarks/bench_coalescing.py --threads 32
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import chatbot  # noqa: E402
+from chatbot_cache import ResponseCache, SingleFlight  # noqa: E402
+
+MESSAGES = [
+    "What are the early signs of dengue fever?",
+    "high fever, headache, joint pain, skin rash",
+    "How can I prevent malaria during the rainy season?",
+]
+
+
+class _NoCoalescing(SingleFlight):
+    def do(self, key, function):
+        return function()
+
+
+def burst(message: str, threads: int) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def send() -> None:
+        barrier.wait()
+        chatbot.get_chatbot_response(message)
+
+    workers = [threading.Thread(target=send) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    chatbot._response_cache = ResponseCache(max_entries=0)
+    chatbot.get_knowledge_base()
+    analysed = 0
+    analyse_input = chatbot.analyse_input
+
+    def counting(*call_args, **kwargs):
+        nonlocal analysed
+        analysed += 1
+        return analyse_input(*call_args, **kwargs)
+
+    chatbot.analyse_input = counting
+    print(f"{'mode':>12} {'analyses':>9} {'requests':>9} {'ms/burst p50':>13} {'p95':>8}")
+    for mode, flight in (("independent", _NoCoalescing()), ("coalesced", SingleFlight())):
+        chatbot._in_flight = flight
+        analysed = 0
+        times = [burst(message, args.threads) * 1000 for _ in range(args.rounds) for message in MESSAGES]
+        quantiles = statistics.quantiles(times, n=100)
+        print(
+            f"{mode:>12} {analysed:>9} {len(times) * args.threads:>9} "
+            f"{quantiles[49]:>13.2f} {quantiles[94]:>8.2f}"
+        )
+    print(f"coalescing counters: {chatbot.coalescing_stats()}")
+
+
+if __name__ == "__main__":
+    main()
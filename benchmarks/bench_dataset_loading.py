@@ -0,0 +1,123 @@
+"""Peak memory of loading a large QA dataset from a ``bot_data`` archive.
+
+Builds a synthetic ``humanqa.csv`` of ``--mib`` MiB by repeating the shipped
+one, stores it in a deflated zip (plain and as ``humanqa.csv.gz``), and
+loads it in a fresh interpreter per mode:
+
+* ``read``: the previous loader, ``ZipFile.read`` the whole member and
+  parse it from a ``BytesIO`` (retrying every encoding on failure)
+* ``stream``: ``chatbot.load_csv_flexible``, which decompresses and
+  decodes the member while pandas parses it
+
+Reported are the peak and final RSS growth over the load (after imports)
+and their difference, i.e. what loading holds on top of its result.
+
+Usage::
+
+    python benchmarks/bench_dataset_loading.py --mib 64 128
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+MEMBER = "bot_data/humanqa.csv"
+
+
+def build_archive(path: Path, mib: int, member: str) -> None:
+    lines = (ROOT / MEMBER).read_bytes().splitlines(keepends=True)
+    header, body = lines[0], b"".join(lines[1:])
+    repeats = max(1, mib * 2**20 // len(body))
+    data = header + body * repeats
+    if member.endswith(".gz"):
+        data = gzip.compress(data, compresslevel=1)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        archive.writestr(member, data)
+
+
+def _status_kib(field: str) -> int:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(mode: str, archive_path: str) -> Dict[str, Any]:
+    import pandas as pd
+
+    import chatbot
+
+    # VmHWM, unlike ru_maxrss, starts afresh at exec, so the parent's
+    # synthetic data does not count.
+    baseline = _status_kib("VmRSS")
+    start = time.perf_counter()
+    with zipfile.ZipFile(archive_path) as archive:
+        if mode == "read":
+            frame = None
+            for encoding in ("utf-8", "latin-1"):
+                try:
+                    data = archive.read(MEMBER)
+                    frame = pd.read_csv(io.BytesIO(data), encoding=encoding, on_bad_lines="skip")
+                    break
+                except UnicodeDecodeError:
+                    continue
+        else:
+            frame = chatbot.load_csv_flexible(Path(MEMBER), archive)
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": len(frame),
+        "seconds": elapsed,
+        "peak_rss_mib": (_status_kib("VmHWM") - baseline) / 1024,
+        "retained_mib": (_status_kib("VmRSS") - baseline) / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mib", type=int, nargs="+", default=[64])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--archive", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.child:
+        print(json.dumps(measure(args.child, args.archive)))
+        return
+
+    print(f"{'MiB':>5} {'archive':>8} {'mode':>7} {'rows':>9} {'seconds':>8} {'peak RSS +MiB':>14} {'retained +MiB':>14} {'transient MiB':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mib in args.mib:
+            for member, cases in ((MEMBER, ("read", "stream")), (MEMBER + ".gz", ("stream",))):
+                archive_path = Path(tmp) / "bot_data.zip"
+                build_archive(archive_path, mib, member)
+                for mode in cases:
+                    output = subprocess.run(
+                        [sys.executable, __file__, "--child", mode, "--archive", str(archive_path)],
+                        check=True,
+                        capture_output=True,
+                        text=True,
+                    ).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                    print(
+                        f"{mib:>5} {Path(member).suffix:>8} {mode:>7} {result['rows']:>9} {result['seconds']:>8.2f} "
+                        f"{result['peak_rss_mib']:>14.1f} {result['retained_mib']:>14.1f} "
+                        f"{result['peak_rss_mib'] - result['retained_mib']:>14.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
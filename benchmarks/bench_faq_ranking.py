@@ -0,0 +1,125 @@
+"""Latency and recall of the FAQ rankers on a fixed set of paraphrased questions.
+
+Questions are sampled from the shipped ``humanqa.csv`` with a fixed seed and
+perturbed the way users retype them: a word dropped, two neighbouring words
+swapped, punctuation and capitals stripped, or a lead-in phrase added. A
+query is recalled when the ranker returns the question it was made from
+(any copy of it). The ``overlap`` scorer returns one answer; ``bm25`` is
+also scored on recall@k over its answer plus alternates. A handful of
+off-topic messages measures how often each ranker answers when it should
+not. ``--thresholds`` sweeps the BM25 acceptance threshold.
+
+Usage::
+
+    python benchmarks/bench_faq_ranking.py --queries 500
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from chatbot import FAQ_ALTERNATES, find_question_answer, get_knowledge_base  # noqa: E402
+from chatbot_index import BM25_MATCH_THRESHOLD  # noqa: E402
+
+LEAD_INS = ["please tell me", "i want to know", "can you explain", "quick question:"]
+OFF_TOPIC = [
+    "what is the weather tomorrow?",
+    "who won the football match yesterday?",
+    "how do i reset my router password?",
+    "what is the capital of france?",
+    "recommend a good movie to watch tonight",
+    "how much does a used car cost?",
+    "what time does the bank open?",
+    "can you write a poem about the sea?",
+]
+
+
+def perturb(question: str, rng: random.Random) -> str:
+    words = question.split()
+    kind = rng.randrange(4)
+    if kind == 0 and len(words) > 3:
+        del words[rng.randrange(len(words))]
+    elif kind == 1 and len(words) > 2:
+        position = rng.randrange(len(words) - 1)
+        words[position], words[position + 1] = words[position + 1], words[position]
+    elif kind == 2:
+        words = re.sub(r"[^\w\s]", "", question.lower()).split()
+    else:
+        words = rng.choice(LEAD_INS).split() + words
+    return " ".join(words)
+
+
+def query_set(questions: Sequence[str], size: int, seed: int) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    distinct = sorted(set(questions))
+    return [(perturb(question, rng), question) for question in rng.sample(distinct, min(size, len(distinct)))]
+
+
+def _timed(func: Callable[[str], object], queries: Sequence[str]) -> Tuple[List[object], float]:
+    results, samples = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(func(query))
+        samples.append(time.perf_counter() - start)
+    return results, statistics.mean(samples) * 1000
+
+
+def _key(question: Optional[str]) -> str:
+    return str(question or "").lower().strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--thresholds", type=float, nargs="*", default=[0.3, 0.4, 0.5, 0.6, 0.7])
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    kb = get_knowledge_base()
+    qa_index = kb.qa_index
+    questions = [str(qa_index.record(row_id).get("question", "")) for row_id in range(len(kb.bm25_index()))]
+    pairs = query_set(questions, args.queries, args.seed)
+    queries = [query for query, _ in pairs]
+    targets = [_key(target) for _, target in pairs]
+
+    def question_of(row_id: int) -> str:
+        return _key(qa_index.record(row_id).get("question"))
+
+    overlap, overlap_ms = _timed(lambda q: find_question_answer(q, index=qa_index), queries)
+    ranked, bm25_ms = _timed(lambda q: kb.bm25_index().top_k(q, FAQ_ALTERNATES + 1), queries)
+
+    overlap_hits = sum(match is not None and _key(match.get("question")) == target for match, target in zip(overlap, targets))
+    print(f"{len(pairs)} paraphrased queries, {len(OFF_TOPIC)} off-topic, {len(questions)} QA rows")
+    print(f"{'ranker':>8} {'mean ms':>8} {'recall@1':>9} {'answered':>9} {'off-topic answered':>19}")
+    off_overlap = sum(find_question_answer(q, index=qa_index) is not None for q in OFF_TOPIC)
+    print(
+        f"{'overlap':>8} {overlap_ms:>8.3f} {overlap_hits / len(pairs):>9.3f} "
+        f"{sum(m is not None for m in overlap) / len(pairs):>9.3f} {off_overlap:>19}"
+    )
+
+    off_ranked = [kb.bm25_index().top_k(q, 1) for q in OFF_TOPIC]
+    for threshold in sorted(set(args.thresholds) | {BM25_MATCH_THRESHOLD}):
+        answered = [bool(r) and r[0][1] >= threshold for r in ranked]
+        hits = sum(a and question_of(r[0][0]) == t for a, r, t in zip(answered, ranked, targets))
+        off = sum(bool(r) and r[0][1] >= threshold for r in off_ranked)
+        label = f"bm25@{threshold:g}" + ("*" if threshold == BM25_MATCH_THRESHOLD else "")
+        print(f"{label:>8} {bm25_ms:>8.3f} {hits / len(pairs):>9.3f} {sum(answered) / len(pairs):>9.3f} {off:>19}")
+
+    recall_k = sum(any(question_of(row_id) == t for row_id, _ in r) for r, t in zip(ranked, targets))
+    print(f"bm25 recall@{FAQ_ALTERNATES + 1} (answer + alternates, any score): {recall_k / len(pairs):.3f}")
+    print("* current BM25_MATCH_THRESHOLD")
+
+
+if __name__ == "__main__":
+    main()
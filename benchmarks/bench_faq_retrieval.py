@@ -0,0 +1,146 @@
+"""Per-query latency of FAQ retrieval as the QA corpus grows.
+
+Compares the legacy ``iterrows`` scan with the ``QAIndex`` postings lookup on
+synthetic corpora assembled from the shipped ``humanqa.csv``, and checks that
+both pick the same row wherever the scan is run.
+
+Usage::
+
+    python benchmarks/bench_faq_retrieval.py --sizes 20000 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from chatbot import find_question_answer  # noqa: E402
+from chatbot_index import QAIndex  # noqa: E402
+from chatbot_query import SYMPTOM_QUESTION_PATTERNS  # noqa: E402
+
+QUERIES = [
+    "What are the symptoms of malaria?",
+    "What are the symptoms of diabetes?",
+    "how to manage stress",
+    "What is hypertension?",
+    "How can someone reduce risks associated with arthritis pain in adults?",
+    "what causes migraine in children",
+    "treatment for vitamin b12 deficiency",
+    "Why must data corruption under cloud clusters be regularly evaluated?",
+    "explain sleep quality problems",
+    "signs of dehydration",
+]
+
+
+def legacy_find_question_answer(question: str, *qa_sources: Optional[pd.DataFrame]) -> Optional[pd.Series]:
+    """The row-by-row scorer ``find_question_answer`` used before the index."""
+
+    question_clean = question.lower().strip()
+    if not question_clean:
+        return None
+
+    is_symptom_question = any(re.search(pattern, question_clean) for pattern in SYMPTOM_QUESTION_PATTERNS)
+
+    best_match = None
+    best_score = 0.0
+    for dataset in qa_sources:
+        if dataset is None or dataset.empty:
+            continue
+        for _, row in dataset.iterrows():
+            qa_question = str(row.get("question", "")).lower().strip()
+            if not qa_question:
+                continue
+            score = 0.0
+            if is_symptom_question and ("symptom" in qa_question or "sign" in qa_question):
+                score += 0.3
+            question_words = set(question_clean.split())
+            qa_words = set(qa_question.split())
+            if question_words and qa_words:
+                score += len(question_words.intersection(qa_words)) / len(question_words)
+            for term in re.findall(r"[a-zA-Z]+", question_clean):
+                if len(term) > 4 and term in qa_question:
+                    score += 0.2
+            if score > best_score:
+                best_score = score
+                best_match = row
+    return best_match if best_score > 0.4 else None
+
+
+def synthetic_corpus(base: pd.DataFrame, size: int, seed: int = 7) -> pd.DataFrame:
+    """Recombine question stems and tails from ``base`` into ``size`` rows."""
+
+    questions = base["question"].astype(str).tolist()
+    answers = base["answer"].astype(str).tolist()
+    if size <= len(questions):
+        return base.iloc[:size].reset_index(drop=True)
+
+    rng = random.Random(seed)
+    stems = sorted({" ".join(q.split()[:3]) for q in questions})
+    tails = sorted({" ".join(q.split()[3:]) for q in questions})
+    extra = size - len(questions)
+    generated = [f"{rng.choice(stems)} {rng.choice(tails)}" for _ in range(extra)]
+    return pd.DataFrame(
+        {
+            "question": questions + generated,
+            "answer": answers + [rng.choice(answers) for _ in range(extra)],
+        }
+    )
+
+
+def _time_queries(func, queries: List[str], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            func(query)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=str(ROOT / "bot_data" / "humanqa.csv"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000, 300000, 1000000])
+    parser.add_argument("--scan-limit", type=int, default=20000, help="largest corpus to run the legacy scan on")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.data)
+    print(f"{'rows':>9} {'vocab':>8} {'build s':>8} {'index ms':>9} {'scan ms':>9} {'parity':>7}")
+    for size in args.sizes:
+        corpus = synthetic_corpus(base, size)
+        corpus["question_clean"] = corpus["question"].str.lower().str.strip()
+
+        start = time.perf_counter()
+        index = QAIndex((corpus,))
+        build_seconds = time.perf_counter() - start
+
+        index_ms = _time_queries(lambda q: find_question_answer(q, corpus, index=index), QUERIES, args.repeat) * 1000
+
+        scan_ms = parity = "-"
+        if size <= args.scan_limit:
+            scan_ms = f"{_time_queries(lambda q: legacy_find_question_answer(q, corpus), QUERIES, 1) * 1000:9.2f}"
+            agree = 0
+            for query in QUERIES:
+                expected = legacy_find_question_answer(query, corpus)
+                actual = find_question_answer(query, corpus, index=index)
+                agree += (expected is None and actual is None) or (
+                    expected is not None and actual is not None and expected.name == actual.name
+                )
+            parity = f"{agree}/{len(QUERIES)}"
+
+        print(f"{size:>9} {index.vocabulary_size:>8} {build_seconds:>8.2f} {index_ms:>9.3f} {scan_ms:>9} {parity:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Cost and usefulness of follow-up symptom suggestions.
+
+For diseases sampled with a fixed seed, a simulated user starts from one of
+the disease's listed symptoms and answers one question per round: the
+top suggestion is added to the query on a yes and ruled out on a no. A
+session ends when the disease is the unique best candidate (rows listing a
+ruled-out symptom excluded) or after ``--rounds`` questions. Suggestions
+by expected information gain (``SymptomMatrix.follow_up``) are compared
+with asking about the symptom that co-occurs most often with the query.
+Also reports the latency of ``follow_up``.
+
+Usage::
+
+    python benchmarks/bench_follow_up.py --diseases 400
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from chatbot import get_knowledge_base  # noqa: E402
+from chatbot_index import SymptomMatrix  # noqa: E402
+
+Asker = Callable[[List[int], List[int]], Optional[int]]
+
+
+def identified(matrix: SymptomMatrix, columns: List[int], ruled_out: List[int], disease: str) -> bool:
+    weights = matrix.candidate_weights(columns, ruled_out)
+    top = np.argsort(-weights, kind="stable")[:2]
+    return matrix.diseases[matrix._row_disease[top[0]]] == disease and (top.size == 1 or weights[top[1]] < weights[top[0]])
+
+
+def session(matrix: SymptomMatrix, disease: str, listed: Set[int], start: int, rounds: int, ask: Asker) -> Optional[int]:
+    """Questions asked until ``disease`` is identified, or ``None``."""
+
+    columns: List[int] = [start]
+    ruled_out: List[int] = []
+    for question in range(rounds + 1):
+        if identified(matrix, columns, ruled_out, disease):
+            return question
+        column = ask(columns, ruled_out)
+        if column is None:
+            return None
+        (columns if column in listed else ruled_out).append(column)
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--diseases", type=int, default=400)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=17)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    matrix = get_knowledge_base().symptom_matrix
+    if matrix is None:
+        raise SystemExit("No symptom data in bot_data/")
+    column_of = {name: column for column, name in enumerate(matrix.symptoms)}
+    latencies: List[float] = []
+
+    def information_gain(columns: List[int], ruled_out: List[int]) -> Optional[int]:
+        began = time.perf_counter()
+        suggestions = matrix.follow_up(columns, 1, ruled_out)
+        latencies.append(time.perf_counter() - began)
+        return column_of[suggestions[0][0]] if suggestions else None
+
+    def co_occurrence(columns: List[int], ruled_out: List[int]) -> Optional[int]:
+        together = np.asarray(matrix.cooccurrence[columns].sum(axis=0)).ravel()
+        together[[*columns, *ruled_out]] = 0
+        column = int(np.argmax(together))
+        return column if together[column] > 0 else None
+
+    rng = random.Random(args.seed)
+    diseases = rng.sample(matrix.diseases, min(args.diseases, len(matrix.diseases)))
+    print(f"{len(diseases)} diseases, {matrix.shape[0]} rows x {matrix.shape[1]} symptoms, {matrix.cooccurrence.nnz} co-occurring pairs")
+    print(f"{'strategy':>16} {'identified':>11} {'mean questions':>15} {'p90':>5}")
+    for label, ask in (("information gain", information_gain), ("co-occurrence", co_occurrence)):
+        rng = random.Random(args.seed)
+        counts = []
+        for disease in diseases:
+            # Benchmark-only introspection: the symptoms the disease's rows list.
+            rows = np.flatnonzero(matrix._row_disease == matrix.diseases.index(disease))
+            listed = set(matrix._raw[rows].indices.tolist())
+            if listed:
+                counts.append(session(matrix, disease, listed, rng.choice(sorted(listed)), args.rounds, ask))
+        solved = sorted(count for count in counts if count is not None)
+        print(
+            f"{label:>16} {len(solved) / len(counts):>11.3f} {statistics.mean(solved):>15.2f} "
+            f"{solved[int(len(solved) * 0.9)]:>5}"
+        )
+
+    latencies.sort()
+    print(
+        f"follow_up: p50 {latencies[len(latencies) // 2] * 1e6:.1f} us, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us over {len(latencies)} calls"
+    )
+
+
+if __name__ == "__main__":
+    main()
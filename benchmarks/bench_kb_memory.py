@@ -0,0 +1,130 @@
+"""Retained and per-query memory of the chatbot knowledge base (tracemalloc).
+
+Loads the knowledge base the way the app does (``get_knowledge_base``) in a
+fresh interpreter per mode and reports:
+
+* retained: bytes still allocated by Python once loading finished and the
+  garbage collector ran, i.e. what every worker keeps resident
+* RSS delta: growth of the process resident set over the same load
+* query peak: mean tracemalloc peak above the steady state while answering
+  one uncached message
+* pandas calls: Python-level calls into ``pandas`` while answering
+
+Modes are ``csv`` (parse ``bot_data/``) and ``snapshot`` (map a snapshot).
+
+Usage::
+
+    python benchmarks/bench_kb_memory.py
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+MESSAGES = [
+    "What are the symptoms of malaria?",
+    "itching, skin rash, chills",
+    "diabetes",
+    "how to manage stress",
+    "high fever, headache, vomiting",
+    "What is hypertension?",
+    "high blood pressure",
+    "why is sleep quality important?",
+]
+
+
+def _rss_kib() -> int:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(mode: str, snapshot_path: str, repeat: int) -> Dict[str, Any]:
+    import pandas as pd
+
+    import chatbot
+
+    if mode == "snapshot":
+        os.environ[chatbot.SNAPSHOT_ENV_VAR] = snapshot_path
+    gc.collect()
+    rss_before = _rss_kib()
+    tracemalloc.start()
+    knowledge_base = chatbot.get_knowledge_base()
+    for message in MESSAGES:
+        chatbot.analyse_input(message, knowledge_base)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    rss_after = _rss_kib()
+
+    pandas_calls = 0
+
+    def count_pandas(frame, event, arg):  # pragma: no cover - profiling hook
+        nonlocal pandas_calls
+        if event == "call" and frame.f_code.co_filename.startswith(os.path.dirname(pd.__file__)):
+            pandas_calls += 1
+
+    peaks = []
+    for _ in range(repeat):
+        for message in MESSAGES:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            sys.setprofile(count_pandas)
+            chatbot.analyse_input(message, knowledge_base)
+            sys.setprofile(None)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return {
+        "retained_mib": retained / 2**20,
+        "rss_delta_mib": (rss_after - rss_before) / 1024,
+        "query_peak_kib": sum(peaks) / len(peaks) / 1024,
+        "pandas_calls": pandas_calls,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["csv", "snapshot"])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--snapshot", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.child:
+        print(json.dumps(measure(args.child, args.snapshot, args.repeat)))
+        return
+
+    import chatbot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = str(chatbot.build_knowledge_snapshot("bot_data", Path(tmp) / "kb.snapshot"))
+        print(f"{'mode':>9} {'retained MiB':>13} {'RSS delta MiB':>14} {'query peak KiB':>15} {'pandas calls':>13}")
+        for mode in args.modes:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--snapshot", snapshot_path, "--repeat", str(args.repeat)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{mode:>9} {result['retained_mib']:>13.1f} {result['rss_delta_mib']:>14.1f} "
+                f"{result['query_peak_kib']:>15.1f} {result['pandas_calls']:>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
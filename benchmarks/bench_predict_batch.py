@@ -0,0 +1,179 @@
+"""Risk prediction throughput: one model call per record against one per batch.
+
+Loads the shipped models from ``models/`` and scores generated patient
+records (random values in plausible clinical ranges) two ways:
+
+* single: ``parse_<disease>`` and ``score_<disease>`` on a one-row batch per
+  record, as ``/api/<disease>`` does
+* batch: ``predict_records`` over the whole list, as ``/api/<disease>/batch``
+  does (per-record validation, then one scaler and model call)
+
+Single-record scoring is timed on at most ``--single-sample`` records of
+each batch and extrapolated, since slow models would otherwise take minutes
+at 10k records. Reported per disease and batch size: records per second
+both ways, the speed-up, the share of batch time spent validating, and
+the largest probability difference between the two. Diseases whose model
+files are missing from ``models/`` are skipped.
+
+Usage::
+
+    python benchmarks/bench_predict_batch.py --sizes 1 100 10000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import joblib
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from predictions import ANEMIA_FEATURES, FEVER_CATEGORICAL_ENCODERS, PREDICTORS, predict_records  # noqa: E402
+
+MODEL_FILES = {
+    "diabetes": {"diabetes_model": "diabetes_model.pkl", "diabetes_scaler": "diabetes_scaler.pkl"},
+    "heart": {"heart_model": "heart_model.pkl", "heart_scaler": "heart_scaler.pkl"},
+    "fever": {
+        "fever_severity_model": "fever_severity_model.pkl",
+        "fever_risk_model": "fever_risk_model.pkl",
+        "fever_scaler": "fever_scaler.pkl",
+        "fever_target_le": "fever_target_encoder.pkl",
+        "fever_le_dict": "fever_label_encoders.pkl",
+    },
+    "anemia": {
+        "anemia_risk_model": "anemia_risk_model.pkl",
+        "anemia_type_model": "anemia_type_model.pkl",
+        "anemia_scaler": "feature_scaler.pkl",
+        "anemia_label_encoder": "label_encoder.pkl",
+    },
+}
+
+ANEMIA_RANGES = {
+    "rbc": (3.5, 6.0),
+    "hemoglobin": (8.0, 17.0),
+    "mcv": (65.0, 110.0),
+    "mch": (20.0, 35.0),
+    "mchc": (30.0, 36.0),
+    "hematocrit": (28.0, 50.0),
+    "wbc": (4.0, 11.0),
+    "platelets": (150.0, 400.0),
+    "pdw": (9.0, 17.0),
+    "pct": (0.1, 0.4),
+    "lymphocytes": (20.0, 40.0),
+    "neutrophils_pct": (40.0, 75.0),
+    "neutrophils_num": (2.0, 7.0),
+}
+
+
+def diabetes_record(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "gender": rng.choice(["Female", "Male"]),
+        "pregnancies": rng.randint(0, 8),
+        "glucose": rng.uniform(70, 200),
+        "blood_pressure": rng.uniform(60, 110),
+        "skin_thickness": rng.uniform(10, 45),
+        "insulin": rng.uniform(15, 300),
+        "bmi": rng.uniform(18, 42),
+        "diabetes_pedigree_function": rng.uniform(0.1, 1.5),
+        "age": rng.randint(21, 80),
+    }
+
+
+def heart_record(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "gender": rng.choice(["Female", "Male"]),
+        "age": rng.randint(29, 77),
+        "chest_pain_type": rng.randint(1, 4),
+        "resting_bp": rng.uniform(94, 200),
+        "cholesterol": rng.uniform(126, 400),
+        "fasting_bs": rng.choice(["Yes", "No"]),
+        "resting_ecg": rng.randint(0, 2),
+        "max_heart_rate": rng.uniform(71, 202),
+        "exercise_angina": rng.choice(["Yes", "No"]),
+        "st_depression": rng.uniform(0, 4),
+        "slope": rng.randint(1, 3),
+        "major_vessels": rng.randint(0, 3),
+        "thal": rng.choice([3, 6, 7]),
+    }
+
+
+def fever_record(rng: random.Random) -> Dict[str, Any]:
+    record: Dict[str, Any] = {
+        "temperature": rng.uniform(36.5, 40.5),
+        "age": rng.randint(1, 85),
+        "bmi": rng.uniform(16, 35),
+        "humidity": rng.uniform(20, 90),
+        "air_quality": rng.uniform(10, 300),
+        "heart_rate": rng.uniform(55, 130),
+    }
+    record.update({key: rng.choice(["Yes", "No"]) for key in FEVER_CATEGORICAL_ENCODERS})
+    record.update({"gender": rng.choice(["Male", "Female"]), "physical_activity": "Moderate", "diet_type": "Vegetarian"})
+    return record
+
+
+def anemia_record(rng: random.Random) -> Dict[str, Any]:
+    record: Dict[str, Any] = {key: rng.uniform(*ANEMIA_RANGES[key]) for key in ANEMIA_FEATURES}
+    record["gender"] = rng.choice(["Female", "Male"])
+    return record
+
+
+GENERATORS: Dict[str, Callable[[random.Random], Dict[str, Any]]] = {
+    "diabetes": diabetes_record,
+    "heart": heart_record,
+    "fever": fever_record,
+    "anemia": anemia_record,
+}
+
+
+def load(disease: str) -> Dict[str, Any]:
+    return {key: joblib.load(ROOT / "models" / filename) for key, filename in MODEL_FILES[disease].items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--single-sample", type=int, default=1000)
+    parser.add_argument("--diseases", nargs="+", choices=sorted(PREDICTORS), default=list(PREDICTORS))
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    print(f"{'disease':>9} {'records':>8} {'single rec/s':>13} {'batch rec/s':>12} {'speed-up':>9} {'validate':>9} {'max diff':>9}")
+    for disease in args.diseases:
+        missing = [name for name in MODEL_FILES[disease].values() if not (ROOT / "models" / name).exists()]
+        if missing:
+            print(f"{disease:>9} skipped, missing {', '.join(missing)}")
+            continue
+        models = load(disease)
+        _, parse, score = PREDICTORS[disease]
+        for size in args.sizes:
+            rng = random.Random(size)
+            records = [GENERATORS[disease](rng) for _ in range(size)]
+
+            sample = records[: args.single_sample]
+            start = time.perf_counter()
+            single: List[Dict[str, Any]] = [score(models, [parse(record)[0]])[0] for record in sample]
+            single_rate = len(sample) / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for record in records:
+                parse(record)
+            validate_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            batch = predict_records(disease, models, records)
+            batch_seconds = time.perf_counter() - start
+
+            diff = max(abs(one["probability"] - many["probability"]) for one, many in zip(single, batch))
+            print(
+                f"{disease:>9} {size:>8} {single_rate:>13.0f} {size / batch_seconds:>12.0f} "
+                f"{size / batch_seconds / single_rate:>8.1f}x {min(validate_seconds / batch_seconds, 1):>9.1%} {diff:>9.2g}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Size and query speed of the QA index with and without question compaction.
+
+For the shipped QA data and synthetic corpora built from it (see
+``bench_faq_retrieval.py``), builds ``QAIndex`` plain and with
+``compact=True`` and reports:
+
+* rows: indexed rows, and the source rows per indexed row (compression)
+* postings / MiB: posting entries and the size of the index arrays
+* build: seconds to build the index
+* overlap / bm25: median per-query latency of each FAQ ranker
+* same: queries whose best overlap answer and BM25 top-4 agree between the
+  two indexes
+
+Usage::
+
+    python benchmarks/bench_qa_compaction.py --sizes 20000 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bench_faq_retrieval import QUERIES, synthetic_corpus  # noqa: E402
+from bench_replay import MIX, load_corpus  # noqa: E402
+from chatbot_index import BM25Index, QAIndex  # noqa: E402
+from chatbot_query import QueryAnalysis  # noqa: E402
+
+
+def measure(corpus: pd.DataFrame, queries: List[QueryAnalysis], compact: bool) -> Dict[str, Any]:
+    start = time.perf_counter()
+    index = QAIndex((corpus,), compact=compact)
+    build_seconds = time.perf_counter() - start
+    bm25 = BM25Index(index)
+
+    overlap_samples, bm25_samples, answers = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        match = index.search_terms(query.term_set, query.long_terms, query.is_symptom_question)
+        overlap_samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        ranked = bm25.top_k(query.text, 4)
+        bm25_samples.append(time.perf_counter() - start)
+        answers.append(
+            (
+                None if match is None else (index.record(match[0])["answer"], round(match[1], 9)),
+                [(index.question(row), index.record(row)["answer"], round(score, 9)) for row, score in ranked],
+            )
+        )
+    return {
+        "rows": len(index),
+        "postings": index.to_arrays("qa")["qa.postings"].size,
+        "mib": sum(array.nbytes for array in index.to_arrays("qa").values()) / 2**20,
+        "build_seconds": build_seconds,
+        "overlap_us": statistics.median(overlap_samples) * 1e6,
+        "bm25_us": statistics.median(bm25_samples) * 1e6,
+        "answers": answers,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=str(ROOT / "bot_data" / "humanqa.csv"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--queries", type=int, default=1000, help="generated chat messages added to the FAQ queries")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    queries = [QueryAnalysis(text) for text in QUERIES + load_corpus(args.queries, MIX)]
+    base = pd.read_csv(args.data)
+    print(
+        f"{'QA rows':>9} {'index':>8} {'rows':>8} {'ratio':>6} {'postings':>9} {'MiB':>6} "
+        f"{'build s':>8} {'overlap us':>11} {'bm25 us':>8} {'same':>11}"
+    )
+    for size in args.sizes:
+        corpus = synthetic_corpus(base, size)
+        plain = measure(corpus, queries, compact=False)
+        compact = measure(corpus, queries, compact=True)
+        same = sum(a == b for a, b in zip(plain["answers"], compact["answers"]))
+        for name, result in (("plain", plain), ("compact", compact)):
+            print(
+                f"{size:>9} {name:>8} {result['rows']:>8} {size / result['rows']:>6.2f} {result['postings']:>9} "
+                f"{result['mib']:>6.1f} {result['build_seconds']:>8.2f} {result['overlap_us']:>11.1f} "
+                f"{result['bm25_us']:>8.1f} {'' if name == 'plain' else f'{same}/{len(queries)}':>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
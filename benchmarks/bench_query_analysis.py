@@ -0,0 +1,95 @@
+"""Per-message CPU cost of reading a chat message before retrieval.
+
+Compares the legacy front end (``classify_input_type`` with 11 uncompiled
+patterns, the disease-phrase regex, then five more patterns, lowercasing and
+tokenising again in ``find_question_answer``) with one ``QueryAnalysis``.
+
+Usage::
+
+    python benchmarks/bench_query_analysis.py --messages 5000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from chatbot import analyse_input, get_knowledge_base  # noqa: E402
+from chatbot_index import ALPHA_TERM_PATTERN, LONG_TERM_MIN_LENGTH  # noqa: E402
+from chatbot_query import QUESTION_PATTERNS, SYMPTOM_QUESTION_PATTERNS, QueryAnalysis  # noqa: E402
+
+
+def legacy_front_end(user_input: str) -> tuple:
+    """What the pipeline computed from the raw message before ``QueryAnalysis``."""
+
+    user_input_lower = user_input.lower().strip()
+    is_question = any(re.search(pattern, user_input_lower) for pattern in QUESTION_PATTERNS)
+    is_short_phrase = len(user_input.split()) <= 5 and not is_question
+    if "?" in user_input or is_question:
+        intent = "question"
+    elif "," in user_input and is_short_phrase:
+        intent = "symptoms"
+    elif len(user_input.split()) <= 3:
+        intent = "disease"
+    else:
+        intent = "question"
+
+    disease_phrase = None
+    mentions_symptom = False
+    if intent == "question":
+        match = re.search(r"(?:symptoms|signs|causes|treatment|of|for)\s+([^?]+)", user_input.lower())
+        if match:
+            disease_phrase = match.group(1).strip()
+            mentions_symptom = "symptom" in user_input.lower() or "sign" in user_input.lower()
+        question_clean = user_input.lower().strip()
+        is_symptom_question = any(re.search(pattern, question_clean) for pattern in SYMPTOM_QUESTION_PATTERNS)
+        words = set(question_clean.split())
+        long_terms = [term for term in ALPHA_TERM_PATTERN.findall(question_clean) if len(term) >= LONG_TERM_MIN_LENGTH]
+        return intent, disease_phrase, mentions_symptom, is_symptom_question, words, long_terms
+    return intent, disease_phrase, mentions_symptom
+
+
+def _cpu_per_message(func: Callable[[str], object], messages: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        for message in messages:
+            func(message)
+        best = min(best, time.process_time() - start)
+    return best / len(messages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    knowledge_base = get_knowledge_base()
+    _, _, _, _, humanqa_df = knowledge_base.datasets
+    questions = humanqa_df["question"].astype(str).tolist()
+    symptoms = [symptom.replace("_", " ") for symptom in knowledge_base.symptom_matrix.symptoms]
+    rng = random.Random(5)
+    messages = [
+        rng.choice(questions) if rng.random() < 0.6 else ", ".join(rng.sample(symptoms, 3))
+        for _ in range(args.messages)
+    ]
+
+    legacy_us = _cpu_per_message(legacy_front_end, messages, args.repeat) * 1e6
+    query_us = _cpu_per_message(QueryAnalysis, messages, args.repeat) * 1e6
+    pipeline_us = _cpu_per_message(lambda message: analyse_input(message, knowledge_base), messages, 1) * 1e6
+
+    print(f"legacy front end      {legacy_us:8.1f} us/message")
+    print(f"QueryAnalysis         {query_us:8.1f} us/message ({legacy_us / query_us:.1f}x less CPU)")
+    print(f"full analyse_input    {pipeline_us:8.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Replay chat traffic through ``get_chatbot_response`` for speed and answer quality.
+
+The replayed corpus is ``replay_queries.txt`` (a sample of real-looking
+traffic) plus ``--synthetic`` generated messages: FAQ questions from
+``humanqa.csv`` (some with a word dropped or case changed), symptom lists
+(some misspelt), free-text symptom sentences, disease names and "what are
+the symptoms of X" questions, mixed per ``--mix``.
+
+Each QA corpus size in ``--qa-rows`` runs in a fresh interpreter. Sizes
+above the shipped 20k rows are synthesised from it the way
+``bench_faq_retrieval.py`` does. The response cache is off unless
+``--cache`` is given, so every message is analysed. Reported per size:
+
+* build: seconds to build the knowledge base
+* p50/p95/p99: per-message latency
+* msgs/s: single-thread throughput over the whole replay
+* peak MiB: peak RSS growth over the run (build included)
+* agree: share of replies identical to the stored baseline for that size,
+  and of replies whose type (question, symptoms, disease) matches
+
+``--write-baseline`` stores the current replies (as digests) in
+``--baseline`` for the sizes run; commit it alongside the change it
+describes. Replies differ when datasets differ, so a baseline only
+compares runs over the same ``bot_data``.
+
+Usage::
+
+    python benchmarks/bench_replay.py
+    python benchmarks/bench_replay.py --qa-rows 20000 100000 1000000
+    python benchmarks/bench_replay.py --write-baseline
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+SAMPLE_CORPUS = Path(__file__).with_name("replay_queries.txt")
+DEFAULT_BASELINE = Path(__file__).with_name("replay_baseline.json")
+MIX = {"faq": 0.45, "symptoms": 0.25, "free_text": 0.1, "disease": 0.1, "disease_question": 0.1}
+
+SENTENCES = [
+    "I have {0} and {1}",
+    "since yesterday I've had {0}, {1} and some {2}",
+    "my son has {0} with {1}",
+    "feeling {0} and {1} for three days",
+]
+
+
+def _status_kib(field: str) -> int:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _misspell(rng: random.Random, word: str) -> str:
+    if len(word) < 5:
+        return word
+    cut = rng.randrange(1, len(word) - 1)
+    return word[:cut] + word[cut + 1:]
+
+
+def generate_queries(size: int, mix: Dict[str, float], seed: int = 5) -> List[str]:
+    """``size`` synthetic messages drawn from the shipped datasets."""
+
+    import chatbot
+
+    knowledge_base = chatbot.get_knowledge_base()
+    questions = knowledge_base.datasets[4]["question"].astype(str).tolist()
+    symptoms = [symptom.replace("_", " ") for symptom in knowledge_base.symptom_matrix.symptoms]
+    diseases = list(knowledge_base.symptom_matrix.diseases)
+
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    messages = []
+    for kind in rng.choices(kinds, weights, k=size):
+        if kind == "faq":
+            words = rng.choice(questions).split()
+            if len(words) > 4 and rng.random() < 0.3:
+                del words[rng.randrange(len(words))]
+            message = " ".join(words)
+            messages.append(message.lower() if rng.random() < 0.3 else message)
+        elif kind == "symptoms":
+            picked = rng.sample(symptoms, rng.randint(2, 5))
+            if rng.random() < 0.2:
+                picked = [_misspell(rng, symptom) for symptom in picked]
+            messages.append(", ".join(picked))
+        elif kind == "free_text":
+            messages.append(rng.choice(SENTENCES).format(*rng.sample(symptoms, 3)))
+        elif kind == "disease":
+            messages.append(rng.choice(diseases))
+        else:
+            messages.append(f"What are the symptoms of {rng.choice(diseases).lower()}?")
+    return messages
+
+
+def load_corpus(synthetic: int, mix: Dict[str, float]) -> List[str]:
+    sample = [
+        line.strip()
+        for line in SAMPLE_CORPUS.read_text(encoding="utf-8").splitlines()
+        if line.strip() and not line.startswith("#")
+    ]
+    return sample + generate_queries(synthetic, mix)
+
+
+def fingerprint(reply: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(reply, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    return f"{reply['analysis'].get('type')}:{digest}"
+
+
+def replay(qa_rows: int, synthetic: int, mix: Dict[str, float], cache: bool) -> Dict[str, Any]:
+    import chatbot
+    from bench_faq_retrieval import synthetic_corpus
+    from chatbot_cache import ResponseCache
+
+    # The corpus is drawn from the shipped datasets, so it is the same for
+    # every size and replies can be compared.
+    messages = load_corpus(synthetic, mix)
+    datasets = chatbot.load_datasets.__wrapped__()
+    if qa_rows != len(datasets[4]):
+        datasets = (*datasets[:4], synthetic_corpus(datasets[4], qa_rows))
+    if not cache:
+        chatbot._response_cache = ResponseCache(max_entries=0)
+
+    baseline_rss = _status_kib("VmRSS")
+    start = time.perf_counter()
+    chatbot.load_datasets = lambda: datasets
+    chatbot.reload_knowledge_base()
+    build_seconds = time.perf_counter() - start
+
+    chatbot.get_chatbot_response(messages[0])
+    samples = []
+    replies = {}
+    began = time.perf_counter()
+    for message in messages:
+        start = time.perf_counter()
+        reply = chatbot.get_chatbot_response(message)
+        samples.append(time.perf_counter() - start)
+        replies[message] = fingerprint(reply)
+    elapsed = time.perf_counter() - began
+
+    quantiles = statistics.quantiles(samples, n=100)
+    return {
+        "qa_rows": qa_rows,
+        "messages": len(messages),
+        "build_seconds": build_seconds,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "throughput": len(messages) / elapsed,
+        "peak_rss_mib": (_status_kib("VmHWM") - baseline_rss) / 1024,
+        "replies": replies,
+    }
+
+
+def agreement(replies: Dict[str, str], baseline: Dict[str, str]) -> str:
+    shared = [message for message in replies if message in baseline]
+    if not shared:
+        return "-"
+    same = sum(replies[message] == baseline[message] for message in shared)
+    same_type = sum(replies[message].split(":")[0] == baseline[message].split(":")[0] for message in shared)
+    return f"{same / len(shared):.1%} / {same_type / len(shared):.1%}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--qa-rows", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--synthetic", type=int, default=2000, help="generated messages added to the sample")
+    parser.add_argument("--mix", type=json.loads, default=MIX, help="JSON weights per message kind")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.child is not None:
+        print(json.dumps(replay(args.child, args.synthetic, args.mix, args.cache)))
+        return
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    print(
+        f"{'QA rows':>9} {'msgs':>6} {'build s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+        f"{'msgs/s':>7} {'peak MiB':>9} {'agree (reply / type)':>21}"
+    )
+    for qa_rows in args.qa_rows:
+        command = [sys.executable, __file__, "--child", str(qa_rows), "--synthetic", str(args.synthetic), "--mix", json.dumps(args.mix)]
+        if args.cache:
+            command.append("--cache")
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{qa_rows:>9} {result['messages']:>6} {result['build_seconds']:>8.2f} {result['p50_ms']:>7.3f} "
+            f"{result['p95_ms']:>7.3f} {result['p99_ms']:>7.3f} {result['throughput']:>7.0f} "
+            f"{result['peak_rss_mib']:>9.1f} {agreement(result['replies'], baselines.get(str(qa_rows), {})):>21}"
+        )
+        if args.write_baseline:
+            baselines[str(qa_rows)] = result["replies"]
+
+    if args.write_baseline:
+        args.baseline.write_text(json.dumps(baselines, indent=0, sort_keys=True) + "\n")
+        print(f"baseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
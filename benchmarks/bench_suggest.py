@@ -0,0 +1,64 @@
+"""Latency of ``/api/chat/suggest`` completions as a user types.
+
+Replays every prefix of a few symptom and disease names (one call per
+keystroke) against the shipped datasets and reports per-call latency
+percentiles of ``suggest_names``.
+
+Usage::
+
+    python benchmarks/bench_suggest.py
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from chatbot import get_knowledge_base, suggest_names  # noqa: E402
+
+TYPED = [
+    "skin rash",
+    "high fever",
+    "abdominal pain",
+    "diabetes",
+    "hypertension",
+    "itching, skin rash, chills",
+    "loss of appetite",
+    "malaria",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    start = time.perf_counter()
+    suggester = get_knowledge_base().name_suggester
+    print(f"{len(suggester)} names indexed (knowledge base ready in {time.perf_counter() - start:.2f} s)")
+
+    prefixes = [text[:end] for text in TYPED for end in range(1, len(text) + 1)]
+    samples = []
+    for _ in range(args.repeat):
+        for prefix in prefixes:
+            began = time.perf_counter()
+            suggest_names(prefix, args.limit)
+            samples.append(time.perf_counter() - began)
+    samples.sort()
+    quantiles = statistics.quantiles(samples, n=100)
+    print(
+        f"{len(samples)} calls: mean {statistics.mean(samples) * 1e6:.1f} us, "
+        f"p50 {quantiles[49] * 1e6:.1f} us, p99 {quantiles[98] * 1e6:.1f} us, max {samples[-1] * 1e6:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Free-text symptom extraction: the word automaton against phrase scans.
+
+Builds ``SymptomExtractor`` over the shipped symptom names and synonyms and
+finds the mentions in generated messages of ``--words`` words (filler text
+with a few symptom phrases mixed in). Two baselines find the same phrases:
+
+* scan: test every phrase with ``in`` against the space-padded message
+* regex: one alternation of all phrases, longest first, on word boundaries
+
+Reported per message length: median microseconds per message for each
+method, and whether the baselines found the same set of symptoms. Then
+the replay corpus (see ``bench_replay.py``) is classified before and after
+extraction to show how many messages move to the symptom path.
+
+Usage::
+
+    python benchmarks/bench_symptom_extraction.py --words 10 50 200 1000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, List, Set
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bench_replay import MIX, load_corpus  # noqa: E402
+
+FILLER = (
+    "since yesterday i have been feeling really bad and my doctor said it could be something "
+    "but the pharmacy was closed so we waited at home for the whole weekend with some tea"
+).split()
+
+
+def messages(phrases: List[str], words: int, count: int, seed: int = 3) -> List[str]:
+    rng = random.Random(seed)
+    generated = []
+    for _ in range(count):
+        text = [rng.choice(FILLER) for _ in range(words)]
+        for _ in range(max(1, words // 15)):
+            text.insert(rng.randrange(len(text) + 1), rng.choice(phrases))
+        generated.append(" ".join(text))
+    return generated
+
+
+def median_us(extract: Callable[[str], Set[int]], texts: List[str]) -> float:
+    samples = []
+    for text in texts:
+        start = time.perf_counter()
+        extract(text)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, nargs="+", default=[10, 50, 200, 1000])
+    parser.add_argument("--messages", type=int, default=300)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    import chatbot
+    from chatbot_index import EXTRACTION_STOPWORDS, SYMPTOM_SYNONYMS, SymptomExtractor, symptom_phrases
+    from chatbot_query import QueryAnalysis
+
+    knowledge_base = chatbot.get_knowledge_base()
+    symptoms = knowledge_base.symptom_matrix.symptoms
+    columns = {name: column for column, name in enumerate(symptoms)}
+    phrase_columns = {}
+    for column, name in enumerate(symptoms):
+        for phrase in symptom_phrases(name):
+            if phrase not in EXTRACTION_STOPWORDS:
+                phrase_columns.setdefault(phrase, column)
+    for phrase, name in SYMPTOM_SYNONYMS.items():
+        if name in columns:
+            phrase_columns.setdefault(phrase, columns[name])
+
+    start = time.perf_counter()
+    extractor = SymptomExtractor.from_symptoms(symptoms)
+    build_ms = (time.perf_counter() - start) * 1000
+    ordered = sorted(phrase_columns, key=len, reverse=True)
+    alternation = re.compile(r"\b(?:" + "|".join(map(re.escape, ordered)) + r")\b")
+    print(f"{len(phrase_columns)} phrases, automaton of {len(extractor)} states built in {build_ms:.1f} ms")
+
+    def automaton(text: str) -> Set[int]:
+        return {column for _, column, _ in extractor.extract(text)}
+
+    def scan(text: str) -> Set[int]:
+        padded = f" {' '.join(re.findall('[a-z0-9]+', text.lower()))} "
+        found = [phrase for phrase in ordered if f" {phrase} " in padded]
+        # Keep the longest of overlapping phrases, as the automaton does.
+        return {phrase_columns[phrase] for phrase in found if not any(phrase in other and phrase != other for other in found)}
+
+    def regex(text: str) -> Set[int]:
+        return {phrase_columns[match] for match in alternation.findall(" ".join(re.findall("[a-z0-9]+", text.lower())))}
+
+    print(f"{'words':>6} {'automaton us':>13} {'scan us':>9} {'regex us':>9} {'same (scan/regex)':>18}")
+    for words in args.words:
+        texts = messages(list(phrase_columns), words, args.messages)
+        expected = [automaton(text) for text in texts]
+        same_scan = sum(scan(text) == found for text, found in zip(texts, expected))
+        same_regex = sum(regex(text) == found for text, found in zip(texts, expected))
+        print(
+            f"{words:>6} {median_us(automaton, texts):>13.1f} {median_us(scan, texts):>9.1f} "
+            f"{median_us(regex, texts):>9.1f} {f'{same_scan}/{len(texts)} {same_regex}/{len(texts)}':>18}"
+        )
+
+    before: Counter = Counter()
+    after: Counter = Counter()
+    for message in load_corpus(2000, MIX):
+        query = QueryAnalysis(message)
+        before[query.intent] += 1
+        after["symptoms" if chatbot._extract_symptoms(query, knowledge_base) is not None else query.intent] += 1
+    print("replay corpus intents:", " ".join(f"{intent}={before[intent]}->{after[intent]}" for intent in sorted(before | after)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Chat latency right after a restart, with and without a warm-cache file.
+
+Draws two days of traffic from the ``bench_replay.py`` corpus with Zipf-like
+popularity (a few messages are very common, most are rare). Day one is
+written to a query log and mined into a warm cache of the ``--top`` most
+frequent queries. Day two's first ``--requests`` messages are then replayed
+through ``get_chatbot_response`` in a fresh interpreter per mode, starting
+from an empty (``cold``) or warm-loaded (``warm``) response cache.
+Reported: boot time, latency percentiles, and the share of requests
+answered from the cache.
+
+Usage::
+
+    python benchmarks/bench_warm_cache.py --requests 2000 --top 1000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bench_replay import MIX, load_corpus  # noqa: E402
+
+
+def traffic(corpus: List[str], size: int, seed: int) -> List[str]:
+    weights = [1 / (rank + 1) for rank in range(len(corpus))]
+    return random.Random(seed).choices(corpus, weights, k=size)
+
+
+def replay(messages: List[str]) -> Dict[str, Any]:
+    import chatbot
+
+    start = time.perf_counter()
+    chatbot.get_knowledge_base()
+    boot_seconds = time.perf_counter() - start
+    samples = []
+    for message in messages:
+        start = time.perf_counter()
+        chatbot.get_chatbot_response(message)
+        samples.append(time.perf_counter() - start)
+    quantiles = statistics.quantiles(samples, n=100)
+    return {
+        "boot_seconds": boot_seconds,
+        "p50_us": quantiles[49] * 1e6,
+        "p95_us": quantiles[94] * 1e6,
+        "p99_us": quantiles[98] * 1e6,
+        "hit_rate": chatbot.response_cache_stats()["hits"] / len(messages),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--top", type=int, default=1000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.child:
+        print(json.dumps(replay(json.loads(Path(args.child).read_text()))))
+        return
+
+    import chatbot
+    from chatbot_warmup import WARM_CACHE_ENV_VAR, QueryLog
+
+    corpus = load_corpus(5000, MIX)
+    random.Random(1).shuffle(corpus)
+    with tempfile.TemporaryDirectory() as tmp:
+        log = QueryLog(Path(tmp) / "queries.log")
+        for message in traffic(corpus, 20000, seed=1):
+            log.record(message, "overlap")
+        start = time.perf_counter()
+        warm_path, written = chatbot.build_warm_cache([log.path], Path(tmp) / "warm.json", args.top)
+        print(f"warm cache: {written} replies, {warm_path.stat().st_size / 1024:.0f} KiB, built in {time.perf_counter() - start:.2f} s")
+
+        messages_path = Path(tmp) / "day2.json"
+        messages_path.write_text(json.dumps(traffic(corpus, args.requests, seed=2)))
+        print(f"{'mode':>5} {'boot s':>7} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8} {'cache hits':>11}")
+        for mode in ("cold", "warm"):
+            env = dict(os.environ)
+            env.pop(WARM_CACHE_ENV_VAR, None)
+            if mode == "warm":
+                env[WARM_CACHE_ENV_VAR] = str(warm_path)
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", str(messages_path)], check=True, capture_output=True, text=True, env=env
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{mode:>5} {result['boot_seconds']:>7.2f} {result['p50_us']:>8.1f} {result['p95_us']:>8.1f} "
+                f"{result['p99_us']:>8.1f} {result['hit_rate']:>11.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Per-worker memory of the chatbot under a pre-forking server (Linux only).
+
+Forks ``--workers`` children the way gunicorn does and has each answer the
+same chat messages, then reads ``/proc/<pid>/smaps_rollup``. RSS counts
+shared pages in full in every worker; PSS splits them between sharers, so
+the PSS total is the real footprint of the pool. Modes:
+
+* ``lazy``: every worker loads the CSVs itself (no preloading)
+* ``preload``: the parent loads the CSVs and builds the indexes before
+  forking, then calls ``gc.freeze()``, as ``gunicorn.conf.py`` does
+* ``snapshot``: like ``preload`` but from a memory-mapped snapshot
+
+Usage::
+
+    python benchmarks/bench_worker_memory.py --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+MESSAGES = [
+    "What are the symptoms of malaria?",
+    "itching, skin rash, chills",
+    "diabetes",
+    "how to manage stress",
+    "high fever, headache, vomiting",
+    "What is hypertension?",
+]
+
+
+def _smaps_rollup(pid: int) -> Dict[str, int]:
+    values: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+
+def _worker(write_fd: int, ready_fd: int) -> None:
+    import chatbot
+
+    for _ in range(50):
+        for message in MESSAGES:
+            chatbot.get_chatbot_response(message)
+    os.write(write_fd, b"x")
+    # Stay alive until the parent has sampled every worker.
+    os.read(ready_fd, 1)
+    os._exit(0)
+
+
+def measure(mode: str, workers: int, snapshot_path: str) -> List[Dict[str, int]]:
+    import chatbot
+
+    chatbot.load_datasets.cache_clear()
+    chatbot.load_snapshot_knowledge_base.cache_clear()
+    chatbot._knowledge_base = None
+    os.environ.pop(chatbot.SNAPSHOT_ENV_VAR, None)
+    if mode == "snapshot":
+        os.environ[chatbot.SNAPSHOT_ENV_VAR] = snapshot_path
+    if mode in ("preload", "snapshot"):
+        chatbot.preload_knowledge_base()
+        gc.freeze()
+
+    done_read, done_write = os.pipe()
+    ready_read, ready_write = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            _worker(done_write, ready_read)
+        pids.append(pid)
+    for _ in pids:
+        os.read(done_read, 1)
+    samples = [_smaps_rollup(pid) for pid in pids]
+    os.write(ready_write, b"x" * len(pids))
+    for pid in pids:
+        os.waitpid(pid, 0)
+    gc.unfreeze()
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=["lazy", "preload", "snapshot"])
+    parser.add_argument("--json", action="store_true", help="print raw samples as JSON")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    import chatbot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = str(chatbot.build_knowledge_snapshot("bot_data", Path(tmp) / "kb.snapshot"))
+        results = {}
+        for mode in args.modes:
+            # Measure each mode from a fresh interpreter so earlier modes do
+            # not leave their datasets in the parent that forks the workers.
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                os.write(write_fd, json.dumps(measure(mode, args.workers, snapshot_path)).encode())
+                os._exit(0)
+            os.close(write_fd)
+            chunks = []
+            while True:
+                chunk = os.read(read_fd, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            os.waitpid(pid, 0)
+            results[mode] = json.loads(b"".join(chunks))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':>9} {'RSS/worker':>11} {'PSS/worker':>11} {'private/worker':>15} {'PSS total':>10}  (MiB)")
+    for mode, samples in results.items():
+        rss = sum(sample["Rss"] for sample in samples) / len(samples) / 1024
+        pss = sum(sample["Pss"] for sample in samples) / len(samples) / 1024
+        private = sum(sample["Private_Clean"] + sample["Private_Dirty"] for sample in samples) / len(samples) / 1024
+        total = sum(sample["Pss"] for sample in samples) / 1024
+        print(f"{mode:>9} {rss:>11.1f} {pss:>11.1f} {private:>15.1f} {total:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,95 +1,213 @@
 """Rule-based medical chatbot utilities for the Flask UI."""
 from __future__ import annotations
 
+import codecs
+import gzip
+import hashlib
 import io
 import logging
-import re
+import os
+import threading
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import IO, Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
 from zipfile import ZipFile
 
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 
-logger = logging.getLogger(__name__)
+try:  # optional: only needed for ``.csv.zst`` datasets
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+from chatbot_cache import ResponseCache, SingleFlight, normalise_message
+from chatbot_explain import NULL_TRACE, Trace
+from chatbot_query import QueryAnalysis
+from chatbot_index import (
+    BM25_MATCH_THRESHOLD,
+    FAQ_MATCH_THRESHOLD,
+    BM25Index,
+    DiseaseCards,
+    DiseaseIndex,
+    DiseaseRecord,
+    NameSuggester,
+    QAIndex,
+    QARecord,
+    SymptomMatrix,
+    disease_key,
+    name_frequencies,
+    symptom_key,
+    precaution_lists,
+    resolved_columns,
+    symptom_lists,
+)
+from chatbot_session import SessionStore, SymptomSession, parse_answer
+from chatbot_snapshot import Snapshot, SnapshotError, arrays_to_frame, frame_to_arrays, write_snapshot
+from chatbot_updates import UpdateLog, validate_update
+from chatbot_warmup import DEFAULT_TOP_QUERIES, WARM_CACHE_ENV_VAR, most_frequent_queries, read_warm_cache, write_warm_cache
 
+logger = logging.getLogger(__name__)
 
-@lru_cache(maxsize=1)
-def load_datasets(
-    data_dir: str = "bot_data",
-) -> Tuple[
+DIFFERENTIAL_SIZE = 5
+FOLLOW_UP_SYMPTOMS = 3
+FREE_TEXT_MIN_SYMPTOMS = 2
+# Shorter messages are disease lookups unless they speak in the first person.
+FREE_TEXT_MIN_WORDS = 4
+FAQ_SOURCE_ID = 0
+# QA rows added at runtime come after medquad (0) and humanqa (1).
+UPDATE_SOURCE_ID = 2
+FAQ_ALTERNATES = 3
+FAQ_RANKERS = ("overlap", "bm25")
+FAQ_RANKER_ENV_VAR = "CUREHELP_FAQ_RANKER"
+SUGGEST_LIMIT = 8
+
+
+DATASET_NAMES = ("precautions", "symptoms", "faq", "augmented", "humanqa")
+DATASET_FILES = (
+    "Disease precaution.csv",
+    "DiseaseAndSymptoms.csv",
+    "medquad.csv",
+    "Final_Augmented.csv",
+    "humanqa.csv",
+)
+
+# A dataset may also be stored compressed next to (or in the archive
+# instead of) its plain name, e.g. ``humanqa.csv.gz``.
+COMPRESSED_SUFFIXES = ("", ".gz", ".zst")
+DATASET_DECODE_ERRORS = "curehelp-latin-1"
+
+SNAPSHOT_ENV_VAR = "CUREHELP_CHATBOT_SNAPSHOT"
+SNAPSHOT_SCHEMA = 6
+
+DatasetTuple = Tuple[
     Optional[pd.DataFrame],
     Optional[pd.DataFrame],
     Optional[pd.DataFrame],
     Optional[pd.DataFrame],
     Optional[pd.DataFrame],
-]:
-    """Load and preprocess datasets used by the chatbot."""
+]
+
+
+
+def _latin1_fallback(error: UnicodeError) -> Tuple[str, int]:
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    return error.object[error.start:error.end].decode("latin-1"), error.end
+
+
+codecs.register_error(DATASET_DECODE_ERRORS, _latin1_fallback)
+
+
+def _open_dataset_source(data_dir: str) -> Optional[Tuple[Path, Optional[ZipFile]]]:
+    """Resolve ``data_dir`` to a base path plus an open archive when zipped."""
 
     base_path = Path(data_dir)
-    zip_loader: Optional[ZipFile] = None
 
     if base_path.is_file() and base_path.suffix == ".zip":
-        zip_loader = ZipFile(base_path)
-        base_path = Path(base_path.stem)
-    elif not base_path.exists():
+        return Path(base_path.stem), ZipFile(base_path)
+    if not base_path.exists():
         zip_candidate = base_path.with_suffix(".zip")
         if zip_candidate.exists():
-            zip_loader = ZipFile(zip_candidate)
-            base_path = Path(base_path.name)
-        else:
-            logger.error("bot_data dataset not found at %s or %s", base_path, zip_candidate)
-            return None, None, None, None, None
+            return Path(base_path.name), ZipFile(zip_candidate)
+        logger.error("bot_data dataset not found at %s or %s", base_path, zip_candidate)
+        return None
+    return base_path, None
+
+
+@lru_cache(maxsize=1)
+def load_datasets(data_dir: str = "bot_data") -> DatasetTuple:
+    """Load and preprocess datasets used by the chatbot."""
+
+    source = _open_dataset_source(data_dir)
+    if source is None:
+        return None, None, None, None, None
+    base_path, zip_loader = source
 
     try:
-        precautions_df = load_csv_flexible(base_path / "Disease precaution.csv", zip_loader)
-        symptoms_df = load_csv_flexible(base_path / "DiseaseAndSymptoms.csv", zip_loader)
-        faq_df = load_csv_flexible(base_path / "medquad.csv", zip_loader)
-        augmented_df = load_csv_flexible(base_path / "Final_Augmented.csv", zip_loader)
-        humanqa_df = load_csv_flexible(base_path / "humanqa.csv", zip_loader)
+        frames = [load_csv_flexible(base_path / name, zip_loader) for name in DATASET_FILES]
     finally:
         if zip_loader is not None:
             zip_loader.close()
 
-    return preprocess_datasets(precautions_df, symptoms_df, faq_df, augmented_df, humanqa_df)
+    return preprocess_datasets(*frames)
 
 
-def load_csv_flexible(file_path: Path, zip_loader: Optional[ZipFile] = None) -> Optional[pd.DataFrame]:
-    """Load CSV from disk with flexible encoding handling."""
+def dataset_content_hash(data_dir: str = "bot_data") -> Optional[str]:
+    """SHA-256 over the CSVs ``load_datasets`` would read, or ``None`` if absent."""
 
-    if not file_path.exists() and zip_loader is None:
-        logger.warning("Dataset missing: %s", file_path)
+    source = _open_dataset_source(data_dir)
+    if source is None:
         return None
+    base_path, zip_loader = source
+
+    digest = hashlib.sha256()
+    try:
+        for name in DATASET_FILES:
+            digest.update(name.encode("utf-8") + b"\0")
+            member = _open_dataset_member(base_path / name, zip_loader)
+            if member is None:
+                digest.update(b"<missing>")
+                continue
+            member_name, handle = member
+            digest.update(member_name[member_name.rindex(name) + len(name):].encode("utf-8") + b"\0")
+            with handle:
+                for chunk in iter(lambda: handle.read(1 << 20), b""):
+                    digest.update(chunk)
+    finally:
+        if zip_loader is not None:
+            zip_loader.close()
+    return digest.hexdigest()
+
+
+def _open_dataset_member(file_path: Path, zip_loader: Optional[ZipFile] = None) -> Optional[Tuple[str, IO[bytes]]]:
+    """Open the stored bytes of ``file_path`` or of a compressed copy (see ``COMPRESSED_SUFFIXES``)."""
 
-    encodings = ("utf-8", "latin-1")
-    for encoding in encodings:
+    for suffix in COMPRESSED_SUFFIXES:
+        name = str(file_path).replace("\\", "/") + suffix
         try:
-            if zip_loader is None:
-                df = pd.read_csv(file_path, encoding=encoding, on_bad_lines="skip")
-            else:
-                relative_path = str(file_path).replace("\\", "/")
-                try:
-                    data = zip_loader.read(relative_path)
-                except KeyError:
-                    continue
-                df = pd.read_csv(io.BytesIO(data), encoding=encoding, on_bad_lines="skip")
-            return clean_dataframe(df)
-        except Exception:
+            handle = open(name, "rb") if zip_loader is None else zip_loader.open(name)
+        except (FileNotFoundError, KeyError):
             continue
+        return name, handle
+    return None
+
+
+def _decompressed(name: str, handle: IO[bytes]) -> IO[bytes]:
+    if name.endswith(".gz"):
+        return gzip.GzipFile(fileobj=handle)
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{name} needs the optional 'zstandard' package")
+        return zstandard.ZstdDecompressor().stream_reader(handle)
+    return handle
+
+
+def load_csv_flexible(file_path: Path, zip_loader: Optional[ZipFile] = None) -> Optional[pd.DataFrame]:
+    """Stream a dataset CSV into a DataFrame, from disk or ``zip_loader``.
+
+    ``file_path`` may also be stored as ``.gz`` or ``.zst`` (the latter needs
+    ``zstandard``). The bytes are decompressed and decoded as they are
+    parsed, so apart from the frame itself only pandas' read buffer is held.
+    Text is UTF-8. Any byte sequence that is not valid UTF-8 is read as
+    Latin-1 instead, which is how Latin-1 files used to be loaded on a
+    second full pass.
+    """
+
+    member = _open_dataset_member(file_path, zip_loader)
+    if member is None:
+        logger.warning("Dataset missing: %s", file_path)
+        return None
+    name, handle = member
 
     try:
-        if zip_loader is None:
-            df = pd.read_csv(file_path, encoding="utf-8", error_bad_lines=False, warn_bad_lines=False)
-        else:
-            relative_path = str(file_path).replace("\\", "/")
-            data = zip_loader.read(relative_path)
-            df = pd.read_csv(io.BytesIO(data), encoding="utf-8", error_bad_lines=False, warn_bad_lines=False)
-        return clean_dataframe(df)
-    except Exception as exc:  # pragma: no cover - defensive logging
-        logger.warning("Could not load %s: %s", file_path, exc)
+        with handle, _decompressed(name, handle) as stream:
+            text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors=DATASET_DECODE_ERRORS, newline="")
+            df = pd.read_csv(text, on_bad_lines="skip")
+    except Exception as exc:
+        logger.warning("Could not load %s: %s", name, exc)
         return None
+    return clean_dataframe(df)
 
 
 def clean_dataframe(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
@@ -130,13 +248,7 @@ def preprocess_datasets(
     faq_df: Optional[pd.DataFrame],
     augmented_df: Optional[pd.DataFrame],
     humanqa_df: Optional[pd.DataFrame],
-) -> Tuple[
-    Optional[pd.DataFrame],
-    Optional[pd.DataFrame],
-    Optional[pd.DataFrame],
-    Optional[pd.DataFrame],
-    Optional[pd.DataFrame],
-]:
+) -> DatasetTuple:
     """Preprocess datasets for better matching."""
 
     try:
@@ -161,152 +273,500 @@ def preprocess_datasets(
     return precautions_df, symptoms_df, faq_df, augmented_df, humanqa_df
 
 
-def find_question_answer(question: str, *qa_sources: Optional[pd.DataFrame]) -> Optional[pd.Series]:
-    if not qa_sources:
-        return None
+class KnowledgeBase:
+    """Search indexes and reply tables derived from the chatbot datasets.
+
+    Everything a chat reply reads lives in numpy arrays, string tables and
+    ``__slots__`` records, so answering never touches pandas. Given a
+    ``loader`` (how ``get_knowledge_base`` builds it), the instance keeps no
+    reference to the DataFrames it was built from and :attr:`datasets`
+    parses them again on every access, so nothing on the reply or update
+    path reads it.
+
+    :meth:`apply_update` changes QA entries and diseases in place by
+    swapping in updated copies of the affected indexes, then replaces
+    :attr:`generation` so cached replies are dropped. :attr:`datasets`
+    still returns the source data without those updates.
+    """
+
+    def __init__(
+        self,
+        datasets: DatasetTuple,
+        content_hash: Optional[str] = None,
+        loader: Optional[Callable[[], DatasetTuple]] = None,
+    ) -> None:
+        self.loader = loader
+        self._datasets: Optional[DatasetTuple] = datasets if loader is None else None
+        self._snapshot: Optional[Snapshot] = None
+        self._lazy_lock = threading.Lock()
+        self.content_hash = content_hash
+        self._bm25: Optional[BM25Index] = None
+        self.generation = object()
+        self.update_offset = 0
+        self.prewarmed = False
+        precautions_df, symptoms_df, faq_df, augmented_df, humanqa_df = datasets
+        # Repeated questions are folded into their first occurrence, which
+        # is the only one that could ever be served.
+        self.qa_index = QAIndex((faq_df, humanqa_df), compact=True)
+        self.symptom_matrix = SymptomMatrix.from_frames(augmented_df, symptoms_df)
+        self.disease_index = DiseaseIndex.from_frames(
+            precautions_df,
+            symptoms_df,
+            augmented_df,
+            description_row=lambda key: self.qa_index.first_row_containing(key, FAQ_SOURCE_ID),
+        )
+        self.disease_cards = self._build_disease_cards()
+        self.name_suggester = NameSuggester.from_counts(*name_frequencies(precautions_df, symptoms_df, augmented_df))
+
+    @property
+    def datasets(self) -> DatasetTuple:
+        """The cleaned DataFrames: re-read through ``loader``, or rebuilt once from a snapshot."""
+
+        if self._datasets is None and self.loader is not None:
+            return self.loader()
+        if self._datasets is None:
+            with self._lazy_lock:
+                if self._datasets is None:
+                    frames = self._snapshot.meta["datasets"]
+                    self._datasets = tuple(  # type: ignore[assignment]
+                        arrays_to_frame(name, self._snapshot, frames.get(name)) for name in DATASET_NAMES
+                    )
+        return self._datasets  # type: ignore[return-value]
+
+    def bm25_index(self) -> BM25Index:
+        """BM25 ranker over the QA questions, built on first use."""
+
+        if self._bm25 is None:
+            with self._lazy_lock:
+                if self._bm25 is None:
+                    self._bm25 = BM25Index(self.qa_index)
+        return self._bm25
+
+    def disease_description(self, disease_name: str) -> Optional[str]:
+        """Answer of the first FAQ question mentioning ``disease_name``."""
+
+        record = self.disease_index.get(disease_name)
+        if record is not None:
+            row_id: Optional[int] = record.description_row if record.description_row >= 0 else None
+        else:
+            row_id = self.qa_index.first_row_containing(disease_key(disease_name), FAQ_SOURCE_ID)
+        return None if row_id is None else self.qa_index.record(row_id).get("answer")
+
+    def disease_details(self, disease_name: str) -> Dict[str, Any]:
+        """Symptoms, precautions and description fields of a disease reply.
+
+        Known diseases and their aliases are served from the precomputed
+        answer cards; other names only get an FAQ description, if any.
+        """
+
+        card = self.disease_cards.get(disease_name)
+        if card is not None:
+            return card.fields
+        return {"symptoms": [], "precautions": [], "description": self.disease_description(disease_name)}
+
+    def apply_update(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply one validated update (see :mod:`chatbot_updates`) and report what changed."""
+
+        op = update["op"]
+        if op == "put_qa":
+            result = self._put_qa(update["question"], update["answer"])
+        elif op == "remove_qa":
+            result = self._remove_qa(update["question"])
+        elif op == "put_disease":
+            result = self._put_disease(update)
+        else:
+            result = self._remove_disease(update["name"])
+        if any(result.values()):
+            self.disease_cards = self._build_disease_cards()
+            self.generation = object()
+        return {"op": op, **result}
+
+    def _put_qa(self, question: str, answer: str) -> Dict[str, int]:
+        # A question differing only in case, spacing or word order scores
+        # like the existing row and would never win a tie against it.
+        row_id = self.qa_index.row_for_question(question)
+        if row_id is not None:
+            self.qa_index = self.qa_index.with_answer([row_id], answer)
+            return {"added": 0, "updated": 1}
+        self.qa_index = self.qa_index.appended(question, answer, UPDATE_SOURCE_ID)
+        self._bm25 = None
+        return {"added": 1, "updated": 0}
+
+    def _remove_qa(self, question: str) -> Dict[str, int]:
+        # Matched like put_qa, so every spelling folded into the row goes too.
+        self.qa_index, rows, removed = self.qa_index.without_question(question)
+        if not removed:
+            return {"removed": 0}
+        self._bm25 = None
+        # Diseases described by a removed FAQ row fall back to the next one.
+        disease_index = self.disease_index
+        for key, record in disease_index.records():
+            if record.description_row in rows:
+                row_id = self.qa_index.first_row_containing(key, FAQ_SOURCE_ID)
+                disease_index = disease_index.with_record(
+                    DiseaseRecord(
+                        record.name, record.symptoms, record.precautions, -1 if row_id is None else row_id, record.description
+                    )
+                )
+        self.disease_index = disease_index
+        return {"removed": removed}
+
+    def _put_disease(self, update: Dict[str, Any]) -> Dict[str, int]:
+        existing = self.disease_index.get(update["name"])
+        if existing is None:
+            row_id = self.qa_index.first_row_containing(disease_key(update["name"]), FAQ_SOURCE_ID)
+            existing = DiseaseRecord(update["name"], description_row=-1 if row_id is None else row_id)
+            added = 1
+        else:
+            added = 0
+        symptoms = update.get("symptoms", existing.symptoms)
+        record = DiseaseRecord(
+            existing.name,
+            symptoms,
+            update.get("precautions", existing.precautions),
+            existing.description_row,
+            update.get("description", existing.description),
+        )
+        self.disease_index = self.disease_index.with_record(record)
+        if "symptoms" in update:
+            self.symptom_matrix = (self.symptom_matrix or SymptomMatrix.empty()).with_disease(record.name, symptoms)
+        self.name_suggester = self.name_suggester.updated(
+            [(record.name, 1), *((symptom_key(symptom).replace("_", " "), 0) for symptom in symptoms)]
+        )
+        return {"added": added, "updated": 1 - added}
+
+    def _remove_disease(self, name: str) -> Dict[str, int]:
+        record = self.disease_index.get(name)
+        if record is None:
+            return {"removed": 0}
+        self.disease_index = self.disease_index.without(name)
+        if self.symptom_matrix is not None:
+            self.symptom_matrix = self.symptom_matrix.without_disease(name)
+        self.name_suggester = self.name_suggester.updated(removed=[record.name])
+        return {"removed": 1}
+
+    def _build_disease_cards(self) -> DiseaseCards:
+        def description(record: DiseaseRecord) -> Optional[str]:
+            if record.description is not None:
+                return record.description
+            if record.description_row < 0:
+                return None
+            return self.qa_index.record(record.description_row).get("answer")
+
+        return DiseaseCards(self.disease_index, description)
+
+    def save_snapshot(self, path: os.PathLike) -> Path:
+        arrays: Dict[str, np.ndarray] = {}
+        frames: Dict[str, Any] = {}
+        for name, df in zip(DATASET_NAMES, self.datasets):
+            frame_arrays, frames[name] = frame_to_arrays(name, df)
+            arrays.update(frame_arrays)
+        arrays.update(self.qa_index.to_arrays("qa"))
+        if self.symptom_matrix is not None:
+            arrays.update(self.symptom_matrix.to_arrays("symptom_matrix"))
+        arrays.update(self.disease_index.to_arrays("diseases"))
+        arrays.update(self.name_suggester.to_arrays("suggest"))
+
+        meta = {
+            "schema": SNAPSHOT_SCHEMA,
+            "content_hash": self.content_hash,
+            "datasets": frames,
+            "symptom_matrix": self.symptom_matrix is not None,
+        }
+        return write_snapshot(path, arrays, meta)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> "KnowledgeBase":
+        if snapshot.meta.get("schema") != SNAPSHOT_SCHEMA:
+            raise SnapshotError(f"Snapshot {snapshot.path} was built for another knowledge base schema")
+
+        knowledge_base = cls.__new__(cls)
+        knowledge_base.loader = None
+        knowledge_base._datasets = None
+        knowledge_base._lazy_lock = threading.Lock()
+        knowledge_base._snapshot = snapshot
+        knowledge_base.content_hash = snapshot.meta.get("content_hash")
+        knowledge_base._bm25 = None
+        knowledge_base.generation = object()
+        knowledge_base.update_offset = 0
+        knowledge_base.prewarmed = False
+
+        knowledge_base.qa_index = QAIndex.from_arrays(snapshot.arrays, "qa")
+        knowledge_base.symptom_matrix = (
+            SymptomMatrix.from_arrays(snapshot.arrays, "symptom_matrix") if snapshot.meta.get("symptom_matrix") else None
+        )
+        knowledge_base.disease_index = DiseaseIndex.from_arrays(snapshot.arrays, "diseases")
+        knowledge_base.disease_cards = knowledge_base._build_disease_cards()
+        knowledge_base.name_suggester = NameSuggester.from_arrays(snapshot.arrays, "suggest")
+        return knowledge_base
 
-    question_clean = question.lower().strip()
-    if not question_clean:
-        return None
 
-    question_patterns = [
-        r"what (are|is) (the )?(symptoms|signs) of",
-        r"what (are|is) (the )?(causes|reason) of",
-        r"what (are|is) (the )?(treatment|remedy) for",
-        r"how (to|do) (treat|handle|manage)",
-        r"what (is|are)",
-    ]
+def build_knowledge_snapshot(data_dir: str = "bot_data", output: os.PathLike = "bot_data.snapshot") -> Path:
+    """Compile the datasets in ``data_dir`` into a snapshot file at ``output``."""
+
+    datasets = load_datasets(data_dir)
+    if not datasets or all(df is None for df in datasets):
+        raise RuntimeError(f"No chatbot datasets found in {data_dir}")
+    return KnowledgeBase(datasets, content_hash=dataset_content_hash(data_dir)).save_snapshot(output)
 
-    is_symptom_question = any(re.search(pattern, question_clean) for pattern in question_patterns)
 
-    best_match: Optional[pd.Series] = None
-    best_score = 0.0
+@lru_cache(maxsize=4)
+def load_snapshot_knowledge_base(path: str, data_dir: str = "bot_data") -> Optional[KnowledgeBase]:
+    """Map the snapshot at ``path`` if it is still current for ``data_dir``.
 
-    for dataset in qa_sources:
-        if dataset is None or dataset.empty:
-            continue
+    A snapshot is rejected when the content hash of the source CSVs no longer
+    matches the one it was built from; callers then fall back to the CSVs.
+    """
+
+    try:
+        snapshot = Snapshot.open(path)
+        current_hash = dataset_content_hash(data_dir)
+        if current_hash is not None and current_hash != snapshot.meta.get("content_hash"):
+            logger.warning("Chatbot snapshot %s is stale for %s; loading CSVs instead", path, data_dir)
+            return None
+        return KnowledgeBase.from_snapshot(snapshot)
+    except (SnapshotError, KeyError) as exc:
+        logger.warning("Ignoring chatbot snapshot %s: %s", path, exc)
+        return None
 
-        for _, row in dataset.iterrows():
-            qa_question = str(row.get("question", "")).lower().strip()
-            if not qa_question:
-                continue
 
-            score = 0.0
+_knowledge_base_lock = threading.Lock()
+_knowledge_base: Optional[KnowledgeBase] = None
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """Return the indexes for the currently loaded datasets, building them once.
+
+    When ``CUREHELP_CHATBOT_SNAPSHOT`` names a current snapshot it is used
+    directly. Otherwise the knowledge base is built from ``load_datasets``,
+    whose cached DataFrames are then released; it is rebuilt after
+    :func:`reload_knowledge_base`.
+    Updates appended to ``CUREHELP_KB_UPDATE_LOG`` since the last call are
+    applied before returning. A new knowledge base first fills the response
+    cache from ``CUREHELP_CHAT_WARM_CACHE`` if that file matches it.
+    """
+
+    global _knowledge_base
+
+    snapshot_path = os.environ.get(SNAPSHOT_ENV_VAR)
+    if snapshot_path:
+        knowledge_base = load_snapshot_knowledge_base(snapshot_path)
+        if knowledge_base is not None:
+            _sync_updates(knowledge_base)
+            _prewarm(knowledge_base)
+            return knowledge_base
+
+    knowledge_base = _knowledge_base
+    if knowledge_base is None:
+        with _knowledge_base_lock:
+            knowledge_base = _knowledge_base
+            if knowledge_base is None:
+                loader = load_datasets
+                datasets = loader()
+                if not datasets or all(df is None for df in datasets):
+                    raise RuntimeError("Chatbot currently on the upgradation/maintenance")
+                knowledge_base = KnowledgeBase(datasets, loader=loader)
+                _knowledge_base = knowledge_base
+                # The knowledge base holds compact copies of everything it
+                # serves, so the DataFrames need not stay resident.
+                cache_clear = getattr(loader, "cache_clear", None)
+                if cache_clear is not None:
+                    cache_clear()
+    _sync_updates(knowledge_base)
+    _prewarm(knowledge_base)
+    return knowledge_base
+
+
+def reload_knowledge_base() -> KnowledgeBase:
+    """Re-read the datasets (or snapshot) and rebuild the knowledge base."""
+
+    global _knowledge_base
+
+    with _knowledge_base_lock:
+        _knowledge_base = None
+        cache_clear = getattr(load_datasets, "cache_clear", None)
+        if cache_clear is not None:
+            cache_clear()
+        load_snapshot_knowledge_base.cache_clear()
+    return get_knowledge_base()
+
+
+_update_lock = threading.Lock()
+
+
+def update_knowledge_base(update: Mapping[str, Any]) -> Dict[str, Any]:
+    """Validate, log and apply one update to the live knowledge base.
+
+    The update is appended to ``CUREHELP_KB_UPDATE_LOG`` (when set) before it
+    is applied, together with any lines other processes appended meanwhile.
+    Raises :class:`chatbot_updates.UpdateError` for a malformed update.
+    """
+
+    update = validate_update(update)
+    knowledge_base = get_knowledge_base()
+    log = UpdateLog.from_env()
+    with _update_lock:
+        if log is None:
+            return knowledge_base.apply_update(update)
+        end = log.append(update)
+        results = dict(_apply_logged(knowledge_base, log))
+    if results.get(end) is None:
+        raise RuntimeError(f"Logged {update['op']} update could not be applied")
+    return results[end]
+
+
+def _sync_updates(knowledge_base: KnowledgeBase) -> None:
+    log = UpdateLog.from_env()
+    if log is None or log.size() == knowledge_base.update_offset:
+        return
+    with _update_lock:
+        _apply_logged(knowledge_base, log)
+
+
+def _apply_logged(knowledge_base: KnowledgeBase, log: UpdateLog) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+    """Apply the log lines ``knowledge_base`` has not seen yet; call with ``_update_lock`` held."""
+
+    if log.size() < knowledge_base.update_offset:
+        logger.warning("Knowledge-base update log %s shrank; reading it from the start", log.path)
+        knowledge_base.update_offset = 0
+    updates, offset = log.read(knowledge_base.update_offset)
+    results: List[Tuple[int, Optional[Dict[str, Any]]]] = []
+    for end, update in updates:
+        try:
+            results.append((end, knowledge_base.apply_update(update)))
+        except Exception:  # pragma: no cover - defensive: one bad entry must not block the rest
+            logger.exception("Could not apply knowledge-base update %s from %s", update, log.path)
+            results.append((end, None))
+    knowledge_base.update_offset = offset
+    return results
 
-            if is_symptom_question and ("symptom" in qa_question or "sign" in qa_question):
-                score += 0.3
 
-            question_words = set(question_clean.split())
-            qa_words = set(qa_question.split())
-            if question_words and qa_words:
-                overlap = len(question_words.intersection(qa_words))
-                score += overlap / len(question_words)
+def preload_knowledge_base() -> Optional[KnowledgeBase]:
+    """Build the knowledge base now, before a pre-forking server forks.
 
-            disease_terms = re.findall(r"[a-zA-Z]+", question_clean)
-            for term in disease_terms:
-                if len(term) > 4 and term in qa_question:
-                    score += 0.2
+    Workers forked afterwards inherit the indexes (and the snapshot mapping,
+    if one is configured) copy-on-write instead of each loading a private
+    copy. Returns ``None`` when the datasets are unavailable; workers then
+    report maintenance as usual.
+    """
 
-            if score > best_score:
-                best_score = score
-                best_match = row
+    try:
+        knowledge_base = get_knowledge_base()
+    except RuntimeError as exc:
+        logger.warning("Chatbot knowledge base not preloaded: %s", exc)
+        return None
+    logger.info(
+        "Preloaded chatbot knowledge base: %d QA rows (%d repeated questions folded in), %d diseases",
+        len(knowledge_base.qa_index),
+        knowledge_base.qa_index.alias_count,
+        len(knowledge_base.disease_index),
+    )
+    return knowledge_base
+
+
+def resolve_faq_ranker(name: Optional[str] = None) -> str:
+    """Validate a FAQ ranker name; ``None`` means ``CUREHELP_FAQ_RANKER`` or ``"overlap"``."""
+
+    ranker = (name or os.environ.get(FAQ_RANKER_ENV_VAR) or FAQ_RANKERS[0]).strip().lower()
+    if ranker not in FAQ_RANKERS:
+        raise ValueError(f"Unknown FAQ ranker {name!r}; expected one of {', '.join(FAQ_RANKERS)}.")
+    return ranker
+
+
+def find_question_answer(
+    question: str,
+    *qa_sources: Optional[pd.DataFrame],
+    index: Optional[QAIndex] = None,
+    query: Optional[QueryAnalysis] = None,
+) -> Optional[QARecord]:
+    """Return the best-scoring QA row for ``question`` or ``None``.
+
+    ``index`` should be the prebuilt :class:`QAIndex` for ``qa_sources``; when
+    omitted a temporary one is built, which costs as much as the old scan.
+    ``query`` is the message's :class:`QueryAnalysis` if the caller has one.
+    """
+
+    if not qa_sources and index is None:
+        return None
 
-    return best_match if best_score > 0.4 else None
+    if query is None:
+        query = QueryAnalysis(question)
+    if not query.lowered:
+        return None
 
+    if index is None:
+        index = QAIndex(qa_sources)
 
-def predict_disease_from_symptoms(
-    symptoms_list: List[str], augmented_df: Optional[pd.DataFrame]
-) -> Optional[Tuple[str, float, np.ndarray]]:
-    if augmented_df is None:
+    match = index.search_terms(query.term_set, query.long_terms, query.is_symptom_question)
+    if match is None:
         return None
 
-    try:
-        symptom_columns = [col for col in augmented_df.columns if col not in ("diseases", "diseases_clean")]
-        query_vector = np.zeros(len(symptom_columns))
+    row_id, best_score = match
+    return index.record(row_id) if best_score > FAQ_MATCH_THRESHOLD else None
 
-        for symptom in symptoms_list:
-            symptom_clean = symptom.lower().strip().replace(" ", "_")
-            if symptom_clean in symptom_columns:
-                idx = symptom_columns.index(symptom_clean)
-                query_vector[idx] = 1
 
-        similarities = []
-        for _, row in augmented_df.iterrows():
-            try:
-                disease_vector = row[symptom_columns].values.astype(float)
-                similarity = cosine_similarity([query_vector], [disease_vector])[0][0]
-                similarities.append((row["diseases"], similarity, disease_vector))
-            except Exception:
-                continue
+def predict_disease_from_symptoms(
+    symptoms_list: List[str],
+    augmented_df: Optional[pd.DataFrame],
+    matrix: Optional[SymptomMatrix] = None,
+) -> Optional[Tuple[str, float, np.ndarray]]:
+    """Return ``(disease, cosine similarity, disease vector)`` for the closest row.
 
-        if similarities:
-            return max(similarities, key=lambda item: item[1])
-        return None
+    ``matrix`` is the prebuilt :class:`SymptomMatrix`; without it one is built
+    from ``augmented_df``. Returns ``None`` when no symptom is recognised.
+    """
+
+    try:
+        if matrix is None:
+            if augmented_df is None:
+                return None
+            matrix = SymptomMatrix.from_augmented(augmented_df)
+        return matrix.best_row(symptoms_list)
     except Exception as exc:
         logger.warning("Disease prediction failed: %s", exc)
         return None
 
 
+def rank_diseases_from_symptoms(
+    symptoms_list: List[str], matrix: Optional[SymptomMatrix], k: int = DIFFERENTIAL_SIZE
+) -> List[Dict[str, Any]]:
+    """Top-``k`` differential for ``symptoms_list`` as serialisable dicts."""
+
+    if matrix is None:
+        return []
+    return [{"disease": disease, "score": score} for disease, score in matrix.top_k(symptoms_list, k)]
+
+
 def get_disease_symptoms(
     disease_name: Optional[str],
     symptoms_df: Optional[pd.DataFrame],
     augmented_df: Optional[pd.DataFrame],
 ) -> List[str]:
-    if not disease_name:
-        return []
+    """Symptoms for one disease straight from the frames.
 
-    disease_clean = disease_name.lower().strip()
-    symptoms: List[str] = []
-
-    if augmented_df is not None and "diseases_clean" in augmented_df.columns:
-        try:
-            aug_match = augmented_df[augmented_df["diseases_clean"] == disease_clean]
-            if not aug_match.empty:
-                symptom_columns = [col for col in augmented_df.columns if col not in ("diseases", "diseases_clean")]
-                for col in symptom_columns:
-                    if col in aug_match.columns and not aug_match.empty and aug_match[col].values[0] == 1:
-                        symptoms.append(col.replace("_", " "))
-        except Exception as exc:
-            logger.debug("Augmented dataset symptom lookup failed: %s", exc)
+    The chat path uses the prebuilt ``KnowledgeBase.disease_index`` instead;
+    this helper builds the same lists on the fly.
+    """
 
-    if not symptoms and symptoms_df is not None and "Disease_clean" in symptoms_df.columns:
-        try:
-            symptom_match = symptoms_df[symptoms_df["Disease_clean"] == disease_clean]
-            if not symptom_match.empty:
-                for col in symptom_match.columns:
-                    if col.startswith("Symptom_"):
-                        value = symptom_match[col].values[0]
-                        if pd.notna(value):
-                            symptom = str(value).strip()
-                            if symptom and symptom.lower() != "nan":
-                                symptoms.append(symptom)
-        except Exception as exc:
-            logger.debug("Symptoms dataset lookup failed: %s", exc)
+    if not disease_name:
+        return []
 
-    return symptoms
+    try:
+        return symptom_lists(symptoms_df, augmented_df).get(disease_key(disease_name), [])
+    except Exception as exc:
+        logger.debug("Symptoms dataset lookup failed: %s", exc)
+        return []
 
 
 def get_disease_precautions(disease_name: Optional[str], precautions_df: Optional[pd.DataFrame]) -> List[str]:
     if precautions_df is None or not disease_name:
         return []
 
-    disease_clean = disease_name.lower().strip()
-    precautions: List[str] = []
-
     try:
-        if "Disease_clean" in precautions_df.columns:
-            match = precautions_df[precautions_df["Disease_clean"] == disease_clean]
-            if not match.empty:
-                for col in ["Precaution_1", "Precaution_2", "Precaution_3", "Precaution_4"]:
-                    value = match[col].values[0] if col in match.columns else None
-                    if pd.notna(value):
-                        precaution = str(value).strip()
-                        if precaution and precaution.lower() != "nan":
-                            precautions.append(precaution)
+        return precaution_lists(precautions_df).get(disease_key(disease_name), [])
     except Exception as exc:
         logger.debug("Precaution lookup failed: %s", exc)
-
-    return precautions
+        return []
 
 
 def get_disease_description(disease_name: Optional[str], faq_df: Optional[pd.DataFrame]) -> Optional[str]:
@@ -316,7 +776,7 @@ def get_disease_description(disease_name: Optional[str], faq_df: Optional[pd.Dat
     disease_clean = disease_name.lower().strip()
     try:
         if "question_clean" in faq_df.columns:
-            relevant = faq_df[faq_df["question_clean"].str.contains(disease_clean, na=False)]
+            relevant = faq_df[faq_df["question_clean"].str.contains(disease_clean, na=False, regex=False)]
             if not relevant.empty:
                 return relevant.iloc[0]["answer"]
     except Exception as exc:
@@ -325,37 +785,7 @@ def get_disease_description(disease_name: Optional[str], faq_df: Optional[pd.Dat
 
 
 def classify_input_type(user_input: str) -> str:
-    if not user_input:
-        return "question"
-
-    user_input_lower = user_input.lower().strip()
-
-    question_patterns = [
-        r"what (are|is)",
-        r"how (to|do|can)",
-        r"why (is|are)",
-        r"when (should|do)",
-        r"where (can|do)",
-        r"who (should|can)",
-        r"can you",
-        r"could you",
-        r"would you",
-        r"explain",
-        r"tell me about",
-    ]
-
-    is_question = any(re.search(pattern, user_input_lower) for pattern in question_patterns)
-    has_question_mark = "?" in user_input
-    has_commas = "," in user_input
-    is_short_phrase = len(user_input.split()) <= 5 and not is_question
-
-    if has_question_mark or is_question:
-        return "question"
-    if has_commas and is_short_phrase:
-        return "symptoms"
-    if not is_question and len(user_input.split()) <= 3:
-        return "disease"
-    return "question"
+    return QueryAnalysis(user_input).intent
 
 
 def process_user_input(
@@ -365,8 +795,228 @@ def process_user_input(
     faq_df: Optional[pd.DataFrame],
     augmented_df: Optional[pd.DataFrame],
     humanqa_df: Optional[pd.DataFrame],
+    knowledge_base: Optional[KnowledgeBase] = None,
 ) -> Dict[str, Any]:
-    response: Dict[str, Any] = {
+    """Analyse ``user_input`` against the given frames.
+
+    Pass the prebuilt ``knowledge_base`` for these frames to avoid indexing
+    them on every call; :func:`analyse_input` is the frame-free equivalent.
+    """
+
+    if knowledge_base is None and user_input:
+        knowledge_base = KnowledgeBase((precautions_df, symptoms_df, faq_df, augmented_df, humanqa_df))
+    return analyse_input(user_input, knowledge_base)
+
+
+def analyse_input(
+    user_input: str,
+    knowledge_base: Optional[KnowledgeBase],
+    ranker: Optional[str] = None,
+    trace: Trace = NULL_TRACE,
+) -> Dict[str, Any]:
+    """Analyse one message; ``ranker`` picks the FAQ engine (see :func:`resolve_faq_ranker`).
+
+    ``trace`` times each stage for :func:`explain_input`. The default
+    records nothing, and every counter or score breakdown is only computed
+    when ``trace.enabled`` is set.
+    """
+
+    response = _empty_analysis()
+    if not user_input or knowledge_base is None:
+        return response
+
+    ranker = resolve_faq_ranker(ranker)
+    if trace.enabled:
+        trace.details["ranker"] = ranker
+    with trace.stage("classify") as stage:
+        query = QueryAnalysis(user_input)
+        if trace.enabled:
+            stage["intent"] = query.intent
+    with trace.stage("symptom_extract") as stage:
+        mentions = _extract_symptoms(query, knowledge_base)
+        if trace.enabled:
+            stage["mentions"] = len(mentions) if mentions is not None else 0
+    response["type"] = input_type = "symptoms" if mentions is not None else query.intent
+
+    try:
+        if input_type == "question":
+            with trace.stage("disease_lookup") as stage:
+                answered = _answer_disease_question(response, query, knowledge_base)
+                if trace.enabled:
+                    stage["disease_phrase"] = query.disease_phrase
+            if not answered:
+                with trace.stage("faq_scan"):
+                    _answer_faq(response, query, knowledge_base, ranker)
+                if trace.enabled:
+                    trace.details["faq"] = _explain_faq(query, knowledge_base, ranker)
+        elif input_type == "symptoms":
+            matrix = knowledge_base.symptom_matrix
+            with trace.stage("symptom_resolve") as stage:
+                columns = _resolve_symptoms(response, query, matrix, mentions)
+                if trace.enabled:
+                    stage["terms"] = len(mentions) if mentions is not None else len(query.symptom_terms)
+                    stage["resolved"] = len(columns)
+            with trace.stage("symptom_scoring") as stage:
+                ranked = matrix.rank(columns, DIFFERENTIAL_SIZE) if matrix is not None else []
+                if trace.enabled:
+                    stage["rows_scored"] = matrix.shape[0] if matrix is not None and columns else 0
+            with trace.stage("description_lookup"):
+                _answer_symptoms(response, ranked, knowledge_base)
+            with trace.stage("follow_up") as stage:
+                _suggest_follow_up(response, matrix, columns, _denied_columns(mentions))
+                if trace.enabled:
+                    stage["suggested"] = len(response["follow_up_symptoms"])
+            if trace.enabled and matrix is not None and columns:
+                trace.details["symptoms"] = matrix.explain(columns, [disease for disease, _ in ranked[:2]])
+        elif input_type == "disease":
+            with trace.stage("description_lookup"):
+                _answer_disease(response, user_input, knowledge_base)
+    except Exception as exc:
+        logger.exception("Error processing chatbot input: %s", exc)
+
+    return response
+
+
+def explain_input(
+    user_input: str, knowledge_base: Optional[KnowledgeBase], ranker: Optional[str] = None
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """:func:`analyse_input` instrumented for ``explain=true`` replies.
+
+    Returns the same analysis plus a report of each stage's wall and CPU
+    time, how many rows or candidates it scored, and the score components
+    of the winning and runner-up matches. The ``classify`` stage covers
+    tokenising and all the message regexes, including the disease-phrase
+    extraction; ``symptom_extract`` is the free-text symptom scan that may
+    turn the message into a symptom query.
+    """
+
+    trace = Trace()
+    return analyse_input(user_input, knowledge_base, ranker, trace), trace.report()
+
+
+def _explain_faq(query: QueryAnalysis, knowledge_base: KnowledgeBase, ranker: str) -> Dict[str, Any]:
+    if ranker == "bm25":
+        bm25 = knowledge_base.bm25_index()
+        rows = [row_id for row_id, _ in bm25.top_k(query.text, 2)]
+        return {"threshold": BM25_MATCH_THRESHOLD, **bm25.explain(query.text, rows)}
+    return {
+        "threshold": FAQ_MATCH_THRESHOLD,
+        **knowledge_base.qa_index.explain_terms(query.term_set, query.long_terms, query.is_symptom_question),
+    }
+
+
+def analyse_inputs(
+    user_inputs: Sequence[str], knowledge_base: KnowledgeBase, ranker: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """:func:`analyse_input` for a batch of messages, in input order.
+
+    Repeated messages are analysed once and every symptom list in the batch
+    is ranked by one :meth:`SymptomMatrix.rank_batch` call. FAQ questions
+    still go through :meth:`QAIndex.search` one by one: its per-query dense
+    scoring beat a batched sparse product on the shipped corpus.
+    """
+
+    ranker = resolve_faq_ranker(ranker)
+    positions: Dict[str, int] = {}
+    for user_input in user_inputs:
+        positions.setdefault(user_input, len(positions))
+    messages = list(positions)
+    analyses = [_empty_analysis() for _ in messages]
+
+    matrix = knowledge_base.symptom_matrix
+    symptom_positions: List[int] = []
+    symptom_queries: List[List[int]] = []
+    symptom_denied: List[List[int]] = []
+    for position, message in enumerate(messages):
+        if not message:
+            continue
+        response = analyses[position]
+        query = QueryAnalysis(message)
+        mentions = _extract_symptoms(query, knowledge_base)
+        response["type"] = input_type = "symptoms" if mentions is not None else query.intent
+        try:
+            if input_type == "question":
+                _answer_question(response, query, knowledge_base, ranker)
+            elif input_type == "symptoms":
+                symptom_queries.append(_resolve_symptoms(response, query, matrix, mentions))
+                symptom_denied.append(_denied_columns(mentions))
+                symptom_positions.append(position)
+            elif input_type == "disease":
+                _answer_disease(response, message, knowledge_base)
+        except Exception as exc:
+            logger.exception("Error processing chatbot input: %s", exc)
+
+    if symptom_queries and matrix is not None:
+        try:
+            ranked = matrix.rank_batch(symptom_queries, DIFFERENTIAL_SIZE)
+        except Exception as exc:
+            logger.exception("Batch symptom ranking failed: %s", exc)
+            ranked = [[] for _ in symptom_queries]
+        for position, columns, denied, pairs in zip(symptom_positions, symptom_queries, symptom_denied, ranked):
+            try:
+                _answer_symptoms(analyses[position], pairs, knowledge_base)
+                _suggest_follow_up(analyses[position], matrix, columns, denied)
+            except Exception as exc:
+                logger.exception("Error processing chatbot input: %s", exc)
+
+    return [dict(analyses[positions[user_input]]) for user_input in user_inputs]
+
+
+def analyse_session_input(
+    user_input: str, knowledge_base: KnowledgeBase, session: SymptomSession
+) -> Optional[Dict[str, Any]]:
+    """:func:`analyse_input` for one message of a multi-turn symptom ``session``.
+
+    Symptoms the message names (as a list, in free text, or as a plain
+    yes/no to the previous reply's first follow-up question) are added to
+    or ruled out of the session, and the reply ranks diseases on
+    everything confirmed so far. Returns ``None``, leaving the session as
+    it was, for messages naming no symptom: their reply does not depend
+    on the session, so the caller answers them like any other message.
+    The caller holds ``session.lock``.
+    """
+
+    matrix = knowledge_base.symptom_matrix
+    if matrix is None:
+        return None
+    if session.matrix is not matrix:
+        session.rebase(matrix)
+
+    response = _empty_analysis()
+    query = QueryAnalysis(user_input)
+    answer = parse_answer(user_input) if session.asked is not None else None
+    if answer is not None:
+        asked = session.asked
+        confirmed, denied = ([asked], []) if answer else ([], [asked])
+        response["resolved_symptoms"] = [
+            {"input": user_input, "symptom": matrix.symptoms[asked].replace("_", " "), "similarity": 1.0}
+        ]
+    else:
+        mentions = _extract_symptoms(query, knowledge_base, in_session=True)
+        if query.intent != "symptoms" and mentions is None:
+            return None
+        confirmed = _resolve_symptoms(response, query, matrix, mentions)
+        denied = _denied_columns(mentions)
+
+    response["type"] = "symptoms"
+    try:
+        session.rule_out(denied)
+        session.confirm(confirmed)
+        weights = session.weights()
+        _answer_symptoms(response, matrix.rank_scores(weights, DIFFERENTIAL_SIZE), knowledge_base)
+        _suggest_follow_up(response, matrix, session.confirmed, session.ruled_out, weights)
+        follow_up = response["follow_up_symptoms"]
+        session.asked = matrix.column(follow_up[0]["symptom"]) if follow_up else None
+        response["session_symptoms"] = [matrix.symptoms[column].replace("_", " ") for column in session.confirmed]
+        response["ruled_out_symptoms"] = [matrix.symptoms[column].replace("_", " ") for column in session.ruled_out]
+    except Exception as exc:
+        logger.exception("Error processing chatbot input: %s", exc)
+
+    return response
+
+
+def _empty_analysis() -> Dict[str, Any]:
+    return {
         "type": None,
         "disease": None,
         "confidence": 0.0,
@@ -375,68 +1025,171 @@ def process_user_input(
         "description": None,
         "faq_question": None,
         "faq_answer": None,
+        "differential": [],
+        "resolved_symptoms": [],
+        "alternates": [],
+        "follow_up_symptoms": [],
     }
 
-    if not user_input:
-        return response
 
-    input_type = classify_input_type(user_input)
-    response["type"] = input_type
+def _extract_symptoms(
+    query: QueryAnalysis, knowledge_base: KnowledgeBase, in_session: bool = False
+) -> Optional[List[Tuple[str, int, bool]]]:
+    """Symptom mentions of a free-text message that should be answered as a symptom query.
+
+    Comma-separated symptom lists, questions (including ones without a
+    question mark, and anything asking about symptoms or signs) keep their
+    own paths, and so do messages of fewer than
+    :data:`FREE_TEXT_MIN_WORDS` words ("headache", "fever cough") unless
+    they are in the first person. Any other message becomes a symptom
+    query when it mentions at least :data:`FREE_TEXT_MIN_SYMPTOMS`
+    symptoms it does not deny, or one in a first-person sentence ("I have
+    a cough"). Within a symptom session any mention counts, denied ones
+    included, and only a known disease name stays a disease lookup.
+    Returns ``None`` when the message is not turned into a symptom query.
+    """
+
+    matrix = knowledge_base.symptom_matrix
+    if matrix is None or query.intent == "symptoms":
+        return None
+    if query.is_question or query.opens_question or query.mentions_symptom or "?" in query.text:
+        return None
+    if not in_session and len(query.tokens) < FREE_TEXT_MIN_WORDS and not query.first_person:
+        return None
+    if query.intent == "disease" and knowledge_base.disease_cards.get(query.text) is not None:
+        return None
+    mentions = matrix.extract(query.text)
+    if in_session:
+        return mentions or None
+    present = sum(not negated for _, _, negated in mentions)
+    if present >= FREE_TEXT_MIN_SYMPTOMS or (present and query.first_person):
+        return mentions
+    return None
 
-    try:
-        if input_type == "question":
-            disease_match = re.search(r"(?:symptoms|signs|causes|treatment|of|for)\s+([^?]+)", user_input.lower())
-            if disease_match:
-                potential_disease = disease_match.group(1).strip()
-                if "symptom" in user_input.lower() or "sign" in user_input.lower():
-                    symptoms = get_disease_symptoms(potential_disease, symptoms_df, augmented_df)
-                    if symptoms:
-                        response.update(
-                            {
-                                "type": "disease",
-                                "disease": potential_disease,
-                                "confidence": 0.95,
-                                "symptoms": symptoms,
-                                "precautions": get_disease_precautions(potential_disease, precautions_df),
-                                "description": get_disease_description(potential_disease, faq_df),
-                            }
-                        )
-                        return response
-
-            faq_match = find_question_answer(user_input, faq_df, humanqa_df)
-            if faq_match is not None:
-                response["faq_question"] = faq_match.get("question")
-                response["faq_answer"] = faq_match.get("answer")
 
-        elif input_type == "symptoms":
-            symptoms_list = [symptom.strip() for symptom in user_input.split(",")]
-            prediction = predict_disease_from_symptoms(symptoms_list, augmented_df)
-            if prediction:
-                disease_name, confidence, _ = prediction
-                response.update(
-                    {
-                        "disease": disease_name,
-                        "confidence": confidence,
-                        "symptoms": get_disease_symptoms(disease_name, symptoms_df, augmented_df),
-                        "precautions": get_disease_precautions(disease_name, precautions_df),
-                        "description": get_disease_description(disease_name, faq_df),
-                    }
-                )
+def _denied_columns(mentions: Optional[List[Tuple[str, int, bool]]]) -> List[int]:
+    return [column for _, column, negated in mentions or () if negated]
 
-        elif input_type == "disease":
+
+def _resolve_symptoms(
+    response: Dict[str, Any],
+    query: QueryAnalysis,
+    matrix: Optional[SymptomMatrix],
+    mentions: Optional[List[Tuple[str, int, bool]]] = None,
+) -> List[int]:
+    """Record which known symptom each typed term resolved to; return the columns.
+
+    With ``mentions`` from :func:`_extract_symptoms` the terms are the
+    extracted phrases the user did not deny, already matched exactly.
+    """
+
+    if matrix is None:
+        return []
+    if mentions is not None:
+        resolved = [(words, column, 1.0) for words, column, negated in mentions if not negated]
+    else:
+        resolved = matrix.resolve(query.symptom_terms)
+    response["resolved_symptoms"] = [
+        {
+            "input": term,
+            "symptom": matrix.symptoms[column].replace("_", " ") if column is not None else None,
+            "similarity": round(similarity, 3),
+        }
+        for term, column, similarity in resolved
+    ]
+    return resolved_columns(resolved)
+
+
+def _suggest_follow_up(
+    response: Dict[str, Any],
+    matrix: Optional[SymptomMatrix],
+    columns: List[int],
+    ruled_out: Sequence[int] = (),
+    weights: Optional[np.ndarray] = None,
+) -> None:
+    """Symptoms worth asking about next to narrow down the differential."""
+
+    if matrix is None:
+        return
+    response["follow_up_symptoms"] = [
+        {"symptom": symptom.replace("_", " "), "gain": round(gain, 3), "share": round(share, 3)}
+        for symptom, gain, share in matrix.follow_up(columns, FOLLOW_UP_SYMPTOMS, ruled_out, weights)
+    ]
+
+
+def _answer_question(
+    response: Dict[str, Any], query: QueryAnalysis, knowledge_base: KnowledgeBase, ranker: str
+) -> None:
+    if not _answer_disease_question(response, query, knowledge_base):
+        _answer_faq(response, query, knowledge_base, ranker)
+
+
+def _answer_disease_question(response: Dict[str, Any], query: QueryAnalysis, knowledge_base: KnowledgeBase) -> bool:
+    """Answer "symptoms of <disease>" from the disease tables; ``False`` if they cannot."""
+
+    if query.disease_phrase and query.mentions_symptom:
+        record = knowledge_base.disease_index.get(query.disease_phrase)
+        if record is not None and record.symptoms:
             response.update(
                 {
-                    "disease": user_input,
+                    "type": "disease",
+                    "disease": query.disease_phrase,
                     "confidence": 0.95,
-                    "symptoms": get_disease_symptoms(user_input, symptoms_df, augmented_df),
-                    "precautions": get_disease_precautions(user_input, precautions_df),
-                    "description": get_disease_description(user_input, faq_df),
+                    **knowledge_base.disease_details(query.disease_phrase),
                 }
             )
-    except Exception as exc:
-        logger.exception("Error processing chatbot input: %s", exc)
+            return True
+    return False
+
+
+def _answer_faq(response: Dict[str, Any], query: QueryAnalysis, knowledge_base: KnowledgeBase, ranker: str) -> None:
+    if ranker == "bm25":
+        _answer_question_bm25(response, query, knowledge_base)
+        return
+
+    faq_match = find_question_answer(query.text, index=knowledge_base.qa_index, query=query)
+    if faq_match is not None:
+        response["faq_question"] = faq_match.get("question")
+        response["faq_answer"] = faq_match.get("answer")
+
+
+def _answer_question_bm25(response: Dict[str, Any], query: QueryAnalysis, knowledge_base: KnowledgeBase) -> None:
+    ranked = knowledge_base.bm25_index().top_k(query.text, FAQ_ALTERNATES + 1)
+    if ranked and ranked[0][1] >= BM25_MATCH_THRESHOLD:
+        record = knowledge_base.qa_index.record(ranked[0][0])
+        response["faq_question"] = record.get("question")
+        response["faq_answer"] = record.get("answer")
+        ranked = ranked[1:]
+    response["alternates"] = [
+        {"question": knowledge_base.qa_index.record(row_id).get("question"), "score": round(score, 4)}
+        for row_id, score in ranked[:FAQ_ALTERNATES]
+    ]
 
-    return response
+
+def _answer_symptoms(
+    response: Dict[str, Any], ranked: List[Tuple[str, float]], knowledge_base: KnowledgeBase
+) -> None:
+    differential = [{"disease": disease, "score": score} for disease, score in ranked]
+    if differential:
+        disease_name = differential[0]["disease"]
+        response.update(
+            {
+                "disease": disease_name,
+                "confidence": differential[0]["score"],
+                **knowledge_base.disease_details(disease_name),
+                "differential": differential,
+            }
+        )
+
+
+def _answer_disease(response: Dict[str, Any], user_input: str, knowledge_base: KnowledgeBase) -> None:
+    response.update(
+        {
+            "disease": user_input,
+            "confidence": 0.95,
+            **knowledge_base.disease_details(user_input),
+        }
+    )
 
 
 def format_chatbot_reply(user_input: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
@@ -461,19 +1214,223 @@ def format_chatbot_reply(user_input: str, analysis: Dict[str, Any]) -> Dict[str,
     return payload
 
 
-def get_chatbot_response(user_input: str) -> Dict[str, Any]:
-    """Public entry-point used by the Flask routes."""
+_response_cache = ResponseCache.from_env()
+_in_flight = SingleFlight()
+_sessions = SessionStore.from_env()
 
-    datasets = load_datasets()
-    if not datasets or all(df is None for df in datasets):
-        raise RuntimeError("Chatbot currently on the upgradation/maintenance")
 
-    precautions_df, symptoms_df, faq_df, augmented_df, humanqa_df = datasets
-    analysis = process_user_input(user_input, precautions_df, symptoms_df, faq_df, augmented_df, humanqa_df)
-    return format_chatbot_reply(user_input, analysis)
+def response_cache_stats() -> Dict[str, Any]:
+    """Counters and occupancy of the chat response cache."""
+
+    return _response_cache.stats()
+
+
+def coalescing_stats() -> Dict[str, Any]:
+    """How many uncached messages were analysed, and how many waited on an identical one instead."""
+
+    return _in_flight.stats()
+
+
+def session_stats() -> Dict[str, Any]:
+    return _sessions.stats()
+
+
+def end_session(session_id: str) -> bool:
+    """Forget a chat session; ``False`` if it was unknown or had expired."""
+
+    return _sessions.discard(session_id)
+
+
+def _cache_key(user_input: str, ranker: str) -> str:
+    return f"{ranker}:{normalise_message(user_input)}"
+
+
+def _cached_analysis(user_input: str, generation: object, ranker: str) -> Optional[Dict[str, Any]]:
+    entry = _response_cache.get(_cache_key(user_input, ranker), generation)
+    if entry is None:
+        return None
+    source_input, analysis = entry
+    return _shared_analysis(source_input, analysis, user_input)
+
+
+def _shared_analysis(source_input: str, analysis: Dict[str, Any], user_input: str) -> Dict[str, Any]:
+    analysis = dict(analysis)
+    # Disease-name replies echo the caller's own spelling of the name.
+    if analysis.get("type") == "disease" and analysis.get("disease") == source_input:
+        analysis["disease"] = user_input
+    return analysis
+
 
+def _store_analysis(user_input: str, generation: object, ranker: str, analysis: Dict[str, Any]) -> None:
+    _response_cache.put(_cache_key(user_input, ranker), generation, (user_input, analysis))
 
-__all__ = ["get_chatbot_response", "load_datasets"]
+
+def _coalesced_analysis(user_input: str, knowledge_base: KnowledgeBase, generation: object, ranker: str) -> Dict[str, Any]:
+    """Analyse ``user_input`` and cache it, or wait for an identical message already being analysed."""
+
+    def analyse() -> Tuple[str, Dict[str, Any]]:
+        analysis = analyse_input(user_input, knowledge_base, ranker)
+        _store_analysis(user_input, generation, ranker, analysis)
+        return user_input, analysis
+
+    source_input, analysis = _in_flight.do((_cache_key(user_input, ranker), generation), analyse)
+    if source_input is user_input:
+        return analysis
+    return _shared_analysis(source_input, analysis, user_input)
+
+
+_prewarm_lock = threading.Lock()
+
+
+def _knowledge_base_hash(knowledge_base: KnowledgeBase) -> Optional[str]:
+    return knowledge_base.content_hash or dataset_content_hash()
+
+
+def build_warm_cache(
+    query_logs: Sequence[os.PathLike], output: os.PathLike, top: int = DEFAULT_TOP_QUERIES
+) -> Tuple[Path, int]:
+    """Answer the ``top`` most frequent queries in ``query_logs`` into a warm-cache file.
+
+    Replies come from the knowledge base the app would serve (snapshot,
+    datasets and update log as configured). Returns the path and the
+    number of replies written.
+    """
+
+    knowledge_base = get_knowledge_base()
+    queries = [(ranker, message) for ranker, message, _ in most_frequent_queries(query_logs, top) if ranker in FAQ_RANKERS]
+    analyses: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for ranker in FAQ_RANKERS:
+        messages = [message for query_ranker, message in queries if query_ranker == ranker]
+        analyses.update(zip(((ranker, message) for message in messages), analyse_inputs(messages, knowledge_base, ranker)))
+    entries = [{"ranker": ranker, "message": message, "analysis": analyses[ranker, message]} for ranker, message in queries]
+    path = write_warm_cache(output, _knowledge_base_hash(knowledge_base), knowledge_base.update_offset, entries)
+    return path, len(entries)
+
+
+def _prewarm(knowledge_base: KnowledgeBase) -> None:
+    path = os.environ.get(WARM_CACHE_ENV_VAR)
+    if not path or knowledge_base.prewarmed:
+        return
+    with _prewarm_lock:
+        if knowledge_base.prewarmed:
+            return
+        knowledge_base.prewarmed = True
+        entries = read_warm_cache(path, _knowledge_base_hash(knowledge_base), knowledge_base.update_offset)
+        if entries is None:
+            logger.warning("Ignoring chat warm cache %s: missing, unreadable or built for other data", path)
+            return
+        generation = knowledge_base.generation
+        # Least frequent first, so a cache too small for the file keeps the
+        # most frequent replies.
+        for entry in reversed(entries):
+            _store_analysis(entry["message"], generation, entry["ranker"], entry["analysis"])
+        logger.info("Loaded %d chat replies from warm cache %s", len(entries), path)
+
+
+def suggest_names(prefix: str, limit: int = SUGGEST_LIMIT) -> List[Dict[str, Any]]:
+    """Symptom and disease names completing ``prefix``, most frequent first.
+
+    Only the last comma-separated part of ``prefix`` is completed, so a
+    symptom list being typed gets suggestions for its current entry.
+    """
+
+    return get_knowledge_base().name_suggester.suggest(prefix.rsplit(",", 1)[-1], limit)
+
+
+def get_chatbot_response(user_input: str, ranker: Optional[str] = None, explain: bool = False) -> Dict[str, Any]:
+    """Public entry-point used by the Flask routes.
+
+    With ``explain`` the reply also carries an ``explain`` report (see
+    :func:`explain_input`); such replies are always computed afresh.
+    """
+
+    ranker = resolve_faq_ranker(ranker)
+    knowledge_base = get_knowledge_base()
+    if explain:
+        analysis, report = explain_input(user_input, knowledge_base, ranker)
+        return {**format_chatbot_reply(user_input, analysis), "explain": report}
+    return format_chatbot_reply(user_input, _shared_or_fresh_analysis(user_input, knowledge_base, ranker))
+
+
+def _shared_or_fresh_analysis(user_input: str, knowledge_base: KnowledgeBase, ranker: str) -> Dict[str, Any]:
+    """The cached reply to ``user_input``, or one computed (once across concurrent callers) and cached."""
+
+    # Read before analysing: replies computed while an update lands are
+    # filed under the generation they started from.
+    generation = knowledge_base.generation
+    analysis = _cached_analysis(user_input, generation, ranker)
+    if analysis is None:
+        analysis = _coalesced_analysis(user_input, knowledge_base, generation, ranker)
+    return analysis
+
+
+def get_session_response(
+    user_input: str, session_id: Optional[str] = None, ranker: Optional[str] = None
+) -> Dict[str, Any]:
+    """:func:`get_chatbot_response` within a multi-turn symptom session.
+
+    The reply carries the ``session_id`` to send with the next message; a
+    missing, unknown or expired id starts a new session (see
+    :func:`analyse_session_input`). Replies built from the session depend
+    on earlier messages, so they are never cached; messages that do not
+    touch the session go through the shared response cache as usual.
+    """
+
+    ranker = resolve_faq_ranker(ranker)
+    knowledge_base = get_knowledge_base()
+    matrix = knowledge_base.symptom_matrix
+    if matrix is None:
+        return {**get_chatbot_response(user_input, ranker), "session_id": None}
+    session_id, session = _sessions.open(session_id, lambda: SymptomSession(matrix))
+    with session.lock:
+        rebased = session.matrix is not matrix
+        analysis = analyse_session_input(user_input, knowledge_base, session)
+    if rebased:
+        _sessions.resize(session_id)
+    if analysis is None:
+        analysis = _shared_or_fresh_analysis(user_input, knowledge_base, ranker)
+    return {**format_chatbot_reply(user_input, analysis), "session_id": session_id}
+
+
+def get_chatbot_responses(user_inputs: Sequence[str], ranker: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Batch counterpart of :func:`get_chatbot_response`, one reply per input."""
+
+    ranker = resolve_faq_ranker(ranker)
+    knowledge_base = get_knowledge_base()
+    generation = knowledge_base.generation
+    analyses = [_cached_analysis(user_input, generation, ranker) for user_input in user_inputs]
+    missing = [position for position, analysis in enumerate(analyses) if analysis is None]
+    if missing:
+        fresh = analyse_inputs([user_inputs[position] for position in missing], knowledge_base, ranker)
+        for position, analysis in zip(missing, fresh):
+            analyses[position] = analysis
+            _store_analysis(user_inputs[position], generation, ranker, analysis)
+    return [format_chatbot_reply(user_input, analysis) for user_input, analysis in zip(user_inputs, analyses)]
+
+
+__all__ = [
+    "KnowledgeBase",
+    "analyse_input",
+    "analyse_inputs",
+    "analyse_session_input",
+    "build_knowledge_snapshot",
+    "build_warm_cache",
+    "coalescing_stats",
+    "end_session",
+    "explain_input",
+    "get_chatbot_response",
+    "get_chatbot_responses",
+    "get_knowledge_base",
+    "get_session_response",
+    "load_datasets",
+    "preload_knowledge_base",
+    "reload_knowledge_base",
+    "resolve_faq_ranker",
+    "response_cache_stats",
+    "session_stats",
+    "suggest_names",
+    "update_knowledge_base",
+]
 
 
 if __name__ == "__main__":  # pragma: no cover - manual smoke test
@@ -0,0 +1,235 @@
+"""Bounded response cache and request coalescing for the chatbot entry points."""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+CACHE_SIZE_ENV_VAR = "CUREHELP_CHAT_CACHE_SIZE"
+CACHE_TTL_ENV_VAR = "CUREHELP_CHAT_CACHE_TTL"
+CACHE_BYTES_ENV_VAR = "CUREHELP_CHAT_CACHE_BYTES"
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 600.0
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+RETIRED_GENERATIONS = 8
+
+
+def normalise_message(message: str) -> str:
+    """Cache key for a chat message: lowercase with whitespace collapsed."""
+
+    return " ".join(message.lower().split())
+
+
+def estimate_size(key: str, value: Any) -> int:
+    """Approximate footprint of an entry, measured as its JSON encoding."""
+
+    return len(key) + len(json.dumps(value, default=str))
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a per-entry TTL and a total byte budget.
+
+    Entries belong to a *generation*, any object identifying the data they
+    were computed from (the chatbot passes its knowledge base's
+    ``generation`` token, replaced on every reload or update). Looking up
+    or storing under a new generation drops every entry first, so a
+    reloaded knowledge base never serves stale replies. A reply stored
+    or looked up under a generation the cache has already moved on from,
+    by a request that started before an update, is discarded or missed
+    instead, so late requests cannot make the cache flip back and forth.
+    ``max_entries=0`` disables caching.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._generation: Optional[object] = None
+        self._retired: "deque[object]" = deque(maxlen=RETIRED_GENERATIONS)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            max_entries=int(os.environ.get(CACHE_SIZE_ENV_VAR, DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(os.environ.get(CACHE_TTL_ENV_VAR, DEFAULT_TTL_SECONDS)),
+            max_bytes=int(os.environ.get(CACHE_BYTES_ENV_VAR, DEFAULT_MAX_BYTES)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, generation: object) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._is_retired(generation):
+                self.misses += 1
+                return None
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at <= self._clock():
+                self._remove(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, generation: object, value: Any) -> None:
+        if not self.enabled:
+            return
+        size = estimate_size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._is_retired(generation):
+                self.stale_puts += 1
+                return
+            self._check_generation(generation)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (self._clock() + self.ttl_seconds, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest, (_, oldest_size, _) = next(iter(self._entries.items()))
+                self._remove(oldest, oldest_size)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts,
+            }
+
+    def _is_retired(self, generation: object) -> bool:
+        return generation is not self._generation and any(generation is old for old in self._retired)
+
+    def _check_generation(self, generation: object) -> None:
+        if generation is self._generation:
+            return
+        if self._entries:
+            self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+        if self._generation is not None:
+            self._retired.append(self._generation)
+        self._generation = generation
+
+    def _remove(self, key: str, size: int) -> None:
+        del self._entries[key]
+        self._bytes -= size
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one computation.
+
+    The first caller for a key (the leader) runs the function. Callers that
+    arrive with the same key before it finishes wait for it and get the
+    same result, or the same exception. Nothing is kept once the leader
+    finishes; remembering results is the cache's job.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leading = True
+            else:
+                self.coalesced += 1
+                leading = False
+
+        if not leading:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is not None:
+                    self.errors += 1
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+            }
+
+
+__all__ = ["ResponseCache", "SingleFlight", "normalise_message"]
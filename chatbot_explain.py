@@ -0,0 +1,75 @@
+"""Per-stage timing of one chat message for ``explain=true`` replies."""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+
+class Trace:
+    """Wall and CPU time of each stage an analysed message went through.
+
+    CPU time is the calling thread's (:func:`time.thread_time`), so time a
+    stage spent waiting for the GIL shows up as wall time only. ``details``
+    collects whatever else the report should carry, such as score
+    breakdowns; callers only compute those when :attr:`enabled` is set.
+    """
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.stages: List[Dict[str, Any]] = []
+        self.details: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Time the ``with`` body as stage ``name``; counters may be added to the yielded dict."""
+
+        entry: Dict[str, Any] = {"stage": name, "wall_ms": 0.0, "cpu_ms": 0.0}
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield entry
+        finally:
+            entry["wall_ms"] = round((time.perf_counter() - wall) * 1000, 4)
+            entry["cpu_ms"] = round((time.thread_time() - cpu) * 1000, 4)
+            self.stages.append(entry)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "stages": self.stages,
+            "total_wall_ms": round(sum(entry["wall_ms"] for entry in self.stages), 4),
+            "total_cpu_ms": round(sum(entry["cpu_ms"] for entry in self.stages), 4),
+            **self.details,
+        }
+
+
+class _NullStage:
+    """Context manager standing in for :meth:`Trace.stage` when nothing is traced."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> Any:
+        # Callers only write counters when the trace is enabled.
+        return None
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+class NullTrace(Trace):
+    """A :class:`Trace` that records nothing: its stages allocate nothing and yield ``None``."""
+
+    enabled = False
+    _STAGE = _NullStage()
+
+    def stage(self, name: str) -> _NullStage:  # type: ignore[override]
+        return self._STAGE
+
+    def report(self) -> Dict[str, Any]:
+        return {}
+
+
+NULL_TRACE = NullTrace()
+
+
+__all__ = ["NULL_TRACE", "NullTrace", "Trace"]
@@ -0,0 +1,1786 @@
+"""Precomputed search structures backing the chatbot retrieval paths."""
+from __future__ import annotations
+
+import bisect
+import re
+import sys
+import threading
+from collections import OrderedDict, deque
+from typing import AbstractSet, Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from chatbot_snapshot import StringTable
+
+ALPHA_TERM_PATTERN = re.compile(r"[a-zA-Z]+")
+_SYMPTOM_SEPARATORS = re.compile(r"[\s_]+")
+_ALIAS_TERMS = re.compile(r"[a-z0-9]+")
+_PARENTHESISED = re.compile(r"\(([^()]*)\)?")
+
+SYMPTOM_QUESTION_BONUS = 0.3
+LONG_TERM_BONUS = 0.2
+LONG_TERM_MIN_LENGTH = 5
+FAQ_MATCH_THRESHOLD = 0.4
+SYMPTOM_MATCH_THRESHOLD = 0.7
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_MATCH_THRESHOLD = 0.7
+BM25_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Parenthesised aliases shorter than this, or that are everyday words once
+# lowercased (e.g. "ALL" for acute lymphoblastic leukemia), are not served.
+ALIAS_MIN_LENGTH = 3
+ALIAS_STOPWORDS = frozenset({"all", "ten", "can", "its"})
+
+# Lay phrasings mapped onto the symptom names they mean, for the free-text
+# extractor. Entries whose target is not a known symptom are ignored.
+SYMPTOM_SYNONYMS = {
+    "tired": "fatigue",
+    "tiredness": "fatigue",
+    "exhausted": "exhaustion",
+    "weak": "weakness",
+    "thirsty": "thirst",
+    "nauseous": "nausea",
+    "nauseated": "nausea",
+    "throwing up": "vomiting",
+    "threw up": "vomiting",
+    "puking": "vomiting",
+    "feverish": "fever",
+    "dizzy": "dizziness",
+    "sleepy": "sleepiness",
+    "drowsy": "drowsiness",
+    "confused": "confusion",
+    "anxious": "anxiety",
+    "depressed": "depression",
+    "sweaty": "sweating",
+    "short of breath": "breathlessness",
+    "out of breath": "breathlessness",
+    "stuffy nose": "congestion",
+    "blocked nose": "congestion",
+    "stomach ache": "stomach_pain",
+    "stomachache": "stomach_pain",
+    "tummy ache": "stomach_pain",
+    "belly pain": "abdominal_pain",
+    "loose motions": "diarrhoea",
+    "body ache": "muscle_pain",
+    "body aches": "muscle_pain",
+    "yellow skin": "yellowish_skin",
+    "cant sleep": "insomnia",
+}
+# Single-word symptom names that are mostly everyday words in a sentence
+# ("I was lying down", "counting the days"); the extractor skips them.
+EXTRACTION_STOPWORDS = frozenset(
+    {"aura", "barking", "bullying", "checking", "counting", "craving", "doubting", "lying", "mannerism",
+     "posturing", "sniffing", "stealing", "tender", "tia", "tolerance", "warmth", "withdrawal", "yelling"}
+)
+# A mention is negated when one of these words is among the few before it,
+# with no earlier mention or contrast word in between ("no fever but chills").
+NEGATION_WORDS = frozenset(
+    {"no", "not", "without", "never", "dont", "didnt", "doesnt", "havent", "hasnt", "arent", "isnt", "wasnt"}
+)
+NEGATION_BREAKS = frozenset({"but", "however", "although", "though"})
+NEGATION_WINDOW = 3
+
+# Upper bound on the cells of the dense (rows x queries) score block built by
+# SymptomMatrix.top_k_batch; larger batches are scored in column chunks.
+BATCH_SCORE_CELLS = 1 << 23
+MAX_BATCH_CHUNK = 256
+
+_EMPTY_ROWS = np.empty(0, dtype=np.int32)
+
+
+
+class _TextColumn:
+    """Per-row strings: an interned :class:`StringTable`, plus strings added since."""
+
+    __slots__ = ("table", "codes", "extra")
+
+    def __init__(self, table: StringTable, codes: np.ndarray, extra: Tuple[str, ...] = ()) -> None:
+        self.table = table
+        self.codes = codes
+        self.extra = extra
+
+    @classmethod
+    def from_strings(cls, values: Sequence[str]) -> "_TextColumn":
+        return cls(*StringTable.interned(values))
+
+    def __getitem__(self, row_id: int) -> str:
+        code = int(self.codes[row_id])
+        size = len(self.table)
+        return self.table[code] if code < size else self.extra[code - size]
+
+    def appended(self, text: str) -> "_TextColumn":
+        code = len(self.table) + len(self.extra)
+        return _TextColumn(self.table, np.append(self.codes, np.int32(code)), self.extra + (text,))
+
+    def replaced(self, row_ids: Sequence[int], text: str) -> "_TextColumn":
+        codes = self.codes.copy()
+        codes[list(row_ids)] = len(self.table) + len(self.extra)
+        return _TextColumn(self.table, codes, self.extra + (text,))
+
+    def to_arrays(self, table_name: str, codes_name: str) -> Dict[str, np.ndarray]:
+        column = _TextColumn.from_strings([self[row_id] for row_id in range(self.codes.size)]) if self.extra else self
+        return {**column.table.to_arrays(table_name), codes_name: column.codes}
+
+
+class QARecord:
+    """One QA row: its position in the source dataset, question and answer.
+
+    Supports ``record["answer"]`` and ``record.get("question")`` so callers
+    written against DataFrame rows keep working.
+    """
+
+    __slots__ = ("name", "question", "answer")
+
+    FIELDS = ("question", "answer")
+
+    def __init__(self, name: int, question: str, answer: str) -> None:
+        self.name = name
+        self.question = question
+        self.answer = answer
+
+    def __getitem__(self, key: str) -> str:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __repr__(self) -> str:
+        return f"QARecord({self.name!r}, {self.question!r}, {self.answer!r})"
+
+
+class QAIndex:
+    """Token postings over the QA questions used by ``find_question_answer``.
+
+    Rows are numbered in the order the legacy scorer visited them (source by
+    source, top to bottom) so ties still resolve to the earliest row. Each
+    question is indexed on its lowercase whitespace tokens; because the
+    long-term bonus only looks for alphabetic terms, every substring hit sits
+    inside one of those tokens and can be found through the vocabulary alone.
+
+    With ``compact`` a question whose token set an earlier row already has
+    is not indexed but recorded as an alias of that row (see
+    :meth:`aliases`). Such a row scores exactly like the earlier one and
+    loses every tie to it, so compaction never changes which row wins.
+    Updates address questions by that same token set (see
+    :meth:`rows_for_question`), so removing a row removes its aliases too.
+
+    An index is never modified in place. :meth:`appended`,
+    :meth:`without_rows` and :meth:`with_answer` return updated copies that
+    share the unchanged arrays, so readers holding the old index are safe.
+    """
+
+    TERM_CACHE_SIZE = 2048
+
+    def __init__(self, sources: Sequence[Optional[pd.DataFrame]], compact: bool = False) -> None:
+        source_ids: List[int] = []
+        positions: List[int] = []
+        questions: List[str] = []
+        answers: List[str] = []
+        token_ids: Dict[str, int] = {}
+        pair_tokens: List[int] = []
+        pair_rows: List[int] = []
+        canonical_rows: Dict[str, int] = {}
+        aliases: Dict[int, List[Tuple[int, int]]] = {}
+
+        for source_id, dataset in enumerate(sources):
+            if dataset is None or dataset.empty or "question" not in dataset.columns:
+                continue
+            source_answers = dataset["answer"].tolist() if "answer" in dataset.columns else [""] * len(dataset)
+            for position, (value, answer) in enumerate(zip(dataset["question"].tolist(), source_answers)):
+                tokens = set(str(value).lower().split())
+                if not tokens:
+                    continue
+                row_id = len(positions)
+                if compact:
+                    canonical = canonical_rows.setdefault(_token_key(tokens), row_id)
+                    if canonical != row_id:
+                        aliases.setdefault(canonical, []).append((source_id, position))
+                        continue
+                source_ids.append(source_id)
+                positions.append(position)
+                questions.append(str(value))
+                answers.append(answer if isinstance(answer, str) else "")
+                for token in tokens:
+                    token_id = token_ids.setdefault(token, len(token_ids))
+                    pair_tokens.append(token_id)
+                    pair_rows.append(row_id)
+
+        del canonical_rows
+        indptr, postings = _build_postings(pair_tokens, pair_rows, len(token_ids))
+        self._setup(
+            np.asarray(source_ids, dtype=np.int32),
+            np.asarray(positions, dtype=np.int64),
+            sorted(token_ids, key=token_ids.__getitem__),
+            indptr,
+            postings,
+            (_TextColumn.from_strings(questions), _TextColumn.from_strings(answers)),
+        )
+        self._symptom_mask = np.zeros(len(positions), dtype=bool)
+        self._symptom_mask[self.rows_containing("symptom")] = True
+        self._symptom_mask[self.rows_containing("sign")] = True
+
+        counts = np.zeros(len(positions), dtype=np.int64)
+        counts[list(aliases)] = [len(rows) for rows in aliases.values()]
+        alias_indptr = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(counts, out=alias_indptr[1:])
+        ordered = [pair for row_id in sorted(aliases) for pair in aliases[row_id]]
+        self._aliases = (
+            alias_indptr,
+            np.asarray([source_id for source_id, _ in ordered], dtype=np.int32),
+            np.asarray([position for _, position in ordered], dtype=np.int64),
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray], prefix: str) -> "QAIndex":
+        """Rebuild an index saved with :meth:`to_arrays` without re-tokenising."""
+
+        index = cls.__new__(cls)
+        index._setup(
+            arrays[f"{prefix}.source_ids"],
+            arrays[f"{prefix}.positions"],
+            StringTable.from_arrays(arrays, f"{prefix}.vocabulary").tolist(),
+            arrays[f"{prefix}.indptr"],
+            arrays[f"{prefix}.postings"],
+            (
+                _TextColumn(StringTable.from_arrays(arrays, f"{prefix}.questions"), arrays[f"{prefix}.question_codes"]),
+                _TextColumn(StringTable.from_arrays(arrays, f"{prefix}.answers"), arrays[f"{prefix}.answer_codes"]),
+            ),
+        )
+        index._symptom_mask = arrays[f"{prefix}.symptom_mask"].view(bool)
+        index._aliases = (arrays[f"{prefix}.alias_indptr"], arrays[f"{prefix}.alias_sources"], arrays[f"{prefix}.alias_positions"])
+        if f"{prefix}.removed_sources" in arrays:
+            index._removed_sources = int(arrays[f"{prefix}.removed_sources"][0])
+        return index
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        vocabulary = sorted(self._token_ids, key=self._token_ids.__getitem__)
+        return {
+            f"{prefix}.source_ids": self._source_ids,
+            f"{prefix}.positions": self._positions,
+            f"{prefix}.indptr": self._indptr,
+            f"{prefix}.postings": self._postings,
+            f"{prefix}.symptom_mask": self._symptom_mask.view(np.uint8),
+            f"{prefix}.alias_indptr": self._aliases[0],
+            f"{prefix}.alias_sources": self._aliases[1],
+            f"{prefix}.alias_positions": self._aliases[2],
+            f"{prefix}.removed_sources": np.asarray([self._removed_sources], dtype=np.int64),
+            **StringTable.from_strings(vocabulary).to_arrays(f"{prefix}.vocabulary"),
+            **self._questions.to_arrays(f"{prefix}.questions", f"{prefix}.question_codes"),
+            **self._answers.to_arrays(f"{prefix}.answers", f"{prefix}.answer_codes"),
+        }
+
+    def appended(self, question: str, answer: str, source_id: int) -> "QAIndex":
+        """Copy of the index with one more row at the end; ``self`` is unchanged.
+
+        The new row's id is ``len(self)``. Its postings are spliced into the
+        existing arrays, so nothing else is re-tokenised.
+        """
+
+        row_id = len(self)
+        question_clean = question.lower().strip()
+        vocabulary = self.vocabulary()
+        token_ids = dict(self._token_ids)
+        for token in sorted(set(question_clean.split())):
+            if token_ids.setdefault(token, len(token_ids)) == len(vocabulary):
+                vocabulary.append(token)
+        ids = np.asarray(sorted(token_ids[token] for token in set(question_clean.split())), dtype=np.int64)
+
+        old_size = self.vocabulary_size
+        counts = np.zeros(len(vocabulary), dtype=np.int64)
+        counts[:old_size] = np.diff(self._indptr)
+        counts[ids] += 1
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        # Each posting list gains the new (largest) row id at its end.
+        ends = np.where(ids < old_size, self._indptr[np.minimum(ids, old_size - 1) + 1], self._postings.size)
+        postings = np.insert(self._postings, ends, row_id)
+
+        position = int(np.count_nonzero(self._source_ids == source_id))
+        index = self._derived(
+            np.append(self._source_ids, np.int32(source_id)),
+            np.append(self._positions, np.int64(position)),
+            vocabulary,
+            indptr,
+            postings,
+            (self._questions.appended(question), self._answers.appended(answer)),
+        )
+        index._symptom_mask = np.append(self._symptom_mask, "symptom" in question_clean or "sign" in question_clean)
+        alias_indptr, alias_sources, alias_positions = self._aliases
+        index._aliases = (np.append(alias_indptr, alias_indptr[-1]), alias_sources, alias_positions)
+        return index
+
+    def without_rows(self, row_ids: Sequence[int]) -> "QAIndex":
+        """Copy of the index in which ``row_ids`` can no longer be found.
+
+        Row ids stay stable: the rows keep their slot but lose their postings.
+        """
+
+        rows = np.asarray(row_ids, dtype=np.int32)
+        token_of_entry = np.repeat(np.arange(self.vocabulary_size), np.diff(self._indptr))
+        keep = ~np.isin(self._postings, rows)
+        indptr = np.zeros(self.vocabulary_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(token_of_entry[keep], minlength=self.vocabulary_size), out=indptr[1:])
+        index = self._derived(
+            self._source_ids, self._positions, self.vocabulary(), indptr, self._postings[keep], (self._questions, self._answers)
+        )
+        index._symptom_mask = self._symptom_mask.copy()
+        index._symptom_mask[rows] = False
+        index._aliases = self._aliases
+        return index
+
+    def without_question(self, question: str) -> Tuple["QAIndex", List[int], int]:
+        """Copy of the index without the rows matching ``question`` and their aliases.
+
+        Rows match as in :meth:`rows_for_question`. Returns the copy, the
+        removed row ids and the number of source rows they stood for.
+        """
+
+        rows = self.rows_for_question(question)
+        if not rows:
+            return self, rows, 0
+        removed = int(self.multiplicities()[rows].sum())
+        index = self.without_rows(rows)
+        if removed > len(rows):
+            indptr, sources, positions = self._aliases
+            counts = np.diff(indptr)
+            keep = np.repeat(~np.isin(np.arange(len(self)), rows), counts)
+            counts[rows] = 0
+            alias_indptr = np.zeros_like(indptr)
+            np.cumsum(counts, out=alias_indptr[1:])
+            index._aliases = (alias_indptr, sources[keep], positions[keep])
+            # The aliases no longer have a slot of their own, but BM25 still
+            # counts them as empty documents, as it does removed rows.
+            index._removed_sources += removed - len(rows)
+        return index, rows, removed
+
+    def row_for_question(self, question: str) -> Optional[int]:
+        """The searchable row serving ``question``: the first of :meth:`rows_for_question`."""
+
+        rows = self.rows_for_question(question)
+        return rows[0] if rows else None
+
+    def with_answer(self, row_ids: Sequence[int], answer: str) -> "QAIndex":
+        """Copy of the index with ``answer`` as the answer of ``row_ids``."""
+
+        index = self._derived(
+            self._source_ids,
+            self._positions,
+            self.vocabulary(),
+            self._indptr,
+            self._postings,
+            (self._questions, self._answers.replaced(row_ids, answer)),
+        )
+        index._symptom_mask = self._symptom_mask
+        index._aliases = self._aliases
+        return index
+
+    def rows_for_question(self, question: str) -> List[int]:
+        """Searchable rows whose question has the same lowercase tokens as ``question``.
+
+        This is the key compaction folds questions on, so questions that
+        differ only in case, spacing or word order name the same rows.
+        """
+
+        tokens = set(question.lower().split())
+        if not tokens:
+            return []
+        rows = min((self.postings(token) for token in tokens), key=len)
+        key = _token_key(tokens)
+        return [row_id for row_id in rows.tolist() if _token_key(self.question(row_id).lower().split()) == key]
+
+    def _derived(self, *parts: Any) -> "QAIndex":
+        index = type(self).__new__(type(self))
+        index._setup(*parts)
+        index._removed_sources = self._removed_sources
+        return index
+
+    def _setup(
+        self,
+        source_ids: np.ndarray,
+        positions: np.ndarray,
+        vocabulary: List[str],
+        indptr: np.ndarray,
+        postings: np.ndarray,
+        texts: Tuple[_TextColumn, _TextColumn],
+    ) -> None:
+        self._source_ids = source_ids
+        self._positions = positions
+        self._token_ids = {token: token_id for token_id, token in enumerate(vocabulary)}
+        self._indptr = indptr
+        self._postings = postings
+        self._questions, self._answers = texts
+
+        self._vocab_blob = "\n" + "\n".join(vocabulary) + "\n"
+        starts = np.fromiter((len(token) + 1 for token in vocabulary), dtype=np.int64, count=len(vocabulary))
+        self._vocab_starts = np.concatenate(([1], 1 + np.cumsum(starts)[:-1])) if len(vocabulary) else _EMPTY_ROWS
+        self._term_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._term_cache_lock = threading.Lock()
+        self._removed_sources = 0
+
+    def __len__(self) -> int:
+        return int(self._positions.size)
+
+    @property
+    def removed_sources(self) -> int:
+        """Removed source rows that no row slot stands for any more (see :meth:`without_question`)."""
+
+        return self._removed_sources
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._token_ids)
+
+    def postings(self, token: str) -> np.ndarray:
+        token_id = self._token_ids.get(token)
+        if token_id is None:
+            return _EMPTY_ROWS
+        return self.postings_by_id(token_id)
+
+    def rows_containing(self, term: str) -> np.ndarray:
+        """Return the sorted row ids whose question contains ``term`` as a substring.
+
+        ``term`` must not contain whitespace; results are cached per term.
+        The cache is shared by request threads; the lookup itself runs
+        outside its lock.
+        """
+
+        with self._term_cache_lock:
+            cached = self._term_cache.get(term)
+            if cached is not None:
+                self._term_cache.move_to_end(term)
+                return cached
+
+        token_ids = _matching_token_ids(self._vocab_blob, self._vocab_starts, term)
+        if token_ids.size == 0:
+            rows = _EMPTY_ROWS
+        elif token_ids.size == 1:
+            rows = self.postings_by_id(int(token_ids[0]))
+        else:
+            rows = np.unique(np.concatenate([self.postings_by_id(int(token_id)) for token_id in token_ids]))
+
+        with self._term_cache_lock:
+            self._term_cache[term] = rows
+            if len(self._term_cache) > self.TERM_CACHE_SIZE:
+                self._term_cache.popitem(last=False)
+        return rows
+
+    def postings_by_id(self, token_id: int) -> np.ndarray:
+        return self._postings[self._indptr[token_id]:self._indptr[token_id + 1]]
+
+    def vocabulary(self) -> List[str]:
+        return sorted(self._token_ids, key=self._token_ids.__getitem__)
+
+    def incidence_matrix(self) -> sparse.csr_matrix:
+        """Row x token matrix with a one wherever a question contains a token."""
+
+        token_major = sparse.csr_matrix(
+            (np.ones(self._postings.size), self._postings, self._indptr), shape=(len(self._token_ids), len(self))
+        )
+        return token_major.T.tocsr()
+
+    def search(self, question_clean: str, is_symptom_question: bool) -> Optional[Tuple[int, float]]:
+        """Score candidate rows exactly as the legacy full scan did.
+
+        Returns ``(row_id, score)`` for the best row or ``None`` when no row
+        shares a token or a long term with the question. The caller applies
+        ``FAQ_MATCH_THRESHOLD``.
+        """
+
+        long_terms = [term for term in ALPHA_TERM_PATTERN.findall(question_clean) if len(term) >= LONG_TERM_MIN_LENGTH]
+        return self.search_terms(set(question_clean.split()), long_terms, is_symptom_question)
+
+    def search_terms(
+        self, words: AbstractSet[str], long_terms: Sequence[str], is_symptom_question: bool
+    ) -> Optional[Tuple[int, float]]:
+        """:meth:`search` for a question already split into words and long terms."""
+
+        if not words or not len(self):
+            return None
+
+        word_rows = [rows for rows in (self.postings(word) for word in words) if rows.size]
+        term_rows = [self.rows_containing(term) for term in long_terms]
+
+        if sum(rows.size for rows in word_rows) * 8 >= len(self):
+            return self._search_dense(word_rows, term_rows, len(words), is_symptom_question)
+
+        candidates, overlap = self._sparse_candidates(word_rows, [rows for rows in term_rows if rows.size])
+        if candidates.size == 0:
+            return None
+
+        if is_symptom_question:
+            scores = np.where(self._symptom_mask[candidates], SYMPTOM_QUESTION_BONUS, 0.0)
+        else:
+            scores = np.zeros(candidates.size)
+        scores = scores + overlap / len(words)
+
+        for rows in term_rows:
+            if rows.size:
+                scores[np.searchsorted(candidates, rows)] += LONG_TERM_BONUS
+
+        best = int(np.argmax(scores))
+        return int(candidates[best]), float(scores[best])
+
+    def explain_terms(
+        self, words: AbstractSet[str], long_terms: Sequence[str], is_symptom_question: bool, top: int = 2
+    ) -> Dict[str, Any]:
+        """Score components of the ``top`` rows :meth:`search_terms` ranks first.
+
+        Recomputes every row's score densely, so it costs more than the search
+        it explains; only ``explain=true`` replies call it.
+        """
+
+        if not words or not len(self):
+            return {"strategy": None, "rows_scored": 0, "matches": []}
+        word_rows = [(word, self.postings(word)) for word in sorted(words)]
+        term_rows = [(term, self.rows_containing(term)) for term in long_terms]
+        hit_rows = [rows for _, rows in word_rows if rows.size]
+        dense = sum(rows.size for rows in hit_rows) * 8 >= len(self)
+
+        overlap = np.bincount(np.concatenate(hit_rows), minlength=len(self)) if hit_rows else np.zeros(len(self), dtype=np.int64)
+        term_hits = np.zeros(len(self), dtype=np.int64)
+        for _, rows in term_rows:
+            term_hits[rows] += 1
+        scores = overlap / len(words) + term_hits * LONG_TERM_BONUS
+        if is_symptom_question:
+            scores[self._symptom_mask] += SYMPTOM_QUESTION_BONUS
+        if not dense:
+            scores[(overlap == 0) & (term_hits == 0)] = -np.inf
+
+        matches = []
+        for row_id in np.argsort(-scores, kind="stable")[:top].tolist():
+            if not np.isfinite(scores[row_id]):
+                break
+            matches.append(
+                {
+                    "row": row_id,
+                    "question": self.question(row_id),
+                    "score": round(float(scores[row_id]), 4),
+                    "word_overlap": round(float(overlap[row_id]) / len(words), 4),
+                    "matched_words": [word for word, rows in word_rows if row_id in rows],
+                    "long_term_bonus": round(float(term_hits[row_id]) * LONG_TERM_BONUS, 4),
+                    "long_terms": [term for term, rows in term_rows if row_id in rows],
+                    "symptom_bonus": SYMPTOM_QUESTION_BONUS if is_symptom_question and self._symptom_mask[row_id] else 0.0,
+                    "aliases": int(self._aliases[0][row_id + 1] - self._aliases[0][row_id]),
+                }
+            )
+        rows_scored = len(self) if dense else int(np.count_nonzero(np.isfinite(scores)))
+        return {"strategy": "dense" if dense else "sparse", "rows_scored": rows_scored, "matches": matches}
+
+    def _search_dense(
+        self,
+        word_rows: List[np.ndarray],
+        term_rows: List[np.ndarray],
+        word_count: int,
+        is_symptom_question: bool,
+    ) -> Tuple[int, float]:
+        # Scoring every row is cheaper than gathering a candidate set that
+        # covers most of the corpus. Rows outside the candidate set score at
+        # most the symptom bonus, which is below the match threshold.
+        scores = np.bincount(np.concatenate(word_rows), minlength=len(self)) / word_count
+        if is_symptom_question:
+            scores[self._symptom_mask] += SYMPTOM_QUESTION_BONUS
+
+        for rows in term_rows:
+            scores[rows] += LONG_TERM_BONUS
+
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def _sparse_candidates(
+        self, word_rows: List[np.ndarray], term_rows: List[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if word_rows:
+            candidates, counts = np.unique(np.concatenate(word_rows), return_counts=True)
+        else:
+            candidates, counts = _EMPTY_ROWS, _EMPTY_ROWS
+        if term_rows:
+            merged = np.union1d(candidates, np.concatenate(term_rows))
+            if merged.size != candidates.size:
+                expanded = np.zeros(merged.size, dtype=np.int64)
+                expanded[np.searchsorted(merged, candidates)] = counts
+                candidates, counts = merged, expanded
+        return candidates, counts
+
+    def question(self, row_id: int) -> str:
+        return self._questions[row_id]
+
+    def record(self, row_id: int) -> QARecord:
+        return QARecord(int(self._positions[row_id]), self._questions[row_id], self._answers[row_id])
+
+    @property
+    def alias_count(self) -> int:
+        """Number of source rows folded into earlier rows by compaction."""
+
+        return int(self._aliases[2].size)
+
+    def multiplicities(self) -> np.ndarray:
+        """Source rows each row stands for: itself plus its aliases."""
+
+        return 1 + np.diff(self._aliases[0])
+
+    def aliases(self, row_id: int) -> List[Tuple[int, int]]:
+        """``(source id, position)`` of the source rows folded into ``row_id``."""
+
+        indptr, sources, positions = self._aliases
+        start, end = indptr[row_id], indptr[row_id + 1]
+        return list(zip(sources[start:end].tolist(), positions[start:end].tolist()))
+
+    def first_row_containing(self, phrase: str, source_id: int) -> Optional[int]:
+        """First row of ``source_id`` whose lowercase question contains ``phrase`` literally."""
+
+        pieces = phrase.split()
+        if not pieces:
+            return None
+        rows = self.rows_containing(max(pieces, key=len))
+        rows = rows[self._source_ids[rows] == source_id]
+        if len(pieces) == 1:
+            return int(rows[0]) if rows.size else None
+        for row_id in rows.tolist():
+            if phrase in self.question(row_id).lower().strip():
+                return row_id
+        return None
+
+
+class BM25Index:
+    """Okapi BM25 ranking over the questions of a :class:`QAIndex`.
+
+    Questions are re-read as alphanumeric terms (``"malaria?"`` counts as
+    ``"malaria"``) by mapping each index token to its terms, so the row x
+    term frequency matrix is one sparse product with the existing postings.
+    The BM25 weights are stored column-major: scoring a query sums the
+    columns of its terms, which yields every row's score in one pass.
+    """
+
+    def __init__(self, qa_index: QAIndex, k1: float = BM25_K1, b: float = BM25_B) -> None:
+        self.qa_index = qa_index
+        self.k1 = k1
+        self._term_ids: Dict[str, int] = {}
+        token_rows: List[int] = []
+        term_columns: List[int] = []
+        for token_id, token in enumerate(qa_index.vocabulary()):
+            for term in BM25_TERM_PATTERN.findall(token):
+                token_rows.append(token_id)
+                term_columns.append(self._term_ids.setdefault(term, len(self._term_ids)))
+        token_terms = sparse.csr_matrix(
+            (np.ones(len(token_rows)), (token_rows, term_columns)),
+            shape=(qa_index.vocabulary_size, len(self._term_ids)),
+        )
+        incidence = qa_index.incidence_matrix()
+        frequencies = (incidence @ token_terms).tocsr()
+
+        rows = frequencies.shape[0]
+        row_of_entry = np.repeat(np.arange(rows), np.diff(frequencies.indptr))
+        # Corpus statistics count a compacted row once per source row it
+        # stands for, so compaction leaves every score unchanged.
+        multiplicity = qa_index.multiplicities()
+        documents = int(multiplicity.sum()) + qa_index.removed_sources
+        lengths = np.asarray(frequencies.sum(axis=1)).ravel()
+        average = float(lengths @ multiplicity) / documents if rows else 0.0
+        document_frequency = np.bincount(frequencies.indices, weights=multiplicity[row_of_entry], minlength=len(self._term_ids))
+        self.idf = np.log1p((documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        length_norm = k1 * (1 - b + b * lengths / average) if average else np.full(rows, k1)
+        tf = frequencies.data
+        weights = self.idf[frequencies.indices] * tf * (k1 + 1) / (tf + length_norm[row_of_entry])
+        # Repeated questions (same token set) would crowd out the
+        # alternatives; only the first copy of each keeps its weights.
+        weights[~_first_occurrences(incidence)[row_of_entry]] = 0.0
+        self._weights = sparse.csr_matrix((weights, frequencies.indices, frequencies.indptr), shape=frequencies.shape).tocsc()
+        self._weights.eliminate_zeros()
+
+    def __len__(self) -> int:
+        return self._weights.shape[0]
+
+    def scores(self, text: str) -> Optional[np.ndarray]:
+        """Every row's BM25 score for ``text`` divided by the query's best case.
+
+        The divisor ``sum(idf)`` over the query terms is what an average-length
+        row containing each term once scores, so scores are comparable across
+        queries and near 1 for a full match. ``None`` when no query term is
+        known.
+        """
+
+        counts: Dict[int, int] = {}
+        for term in BM25_TERM_PATTERN.findall(text.lower()):
+            term_id = self._term_ids.get(term)
+            if term_id is not None:
+                counts[term_id] = counts.get(term_id, 0) + 1
+        if not counts or not len(self):
+            return None
+        columns = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        scores = self._weights[:, columns] @ weights
+        return scores / float(self.idf[columns] @ weights)
+
+    def top_k(self, text: str, k: int) -> List[Tuple[int, float]]:
+        """Best ``k`` ``(row_id, score)`` pairs with a positive score, best first.
+
+        Only the first copy of a repeated question is ranked, so the
+        alternatives offered to a user are all different questions.
+        """
+
+        scores = self.scores(text)
+        if scores is None or k <= 0:
+            return []
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        # argpartition splits ties arbitrarily; take every row tied with the
+        # k-th best so the earliest rows win, as with the overlap ranker.
+        top = np.flatnonzero(scores >= scores[top].min())
+        top = top[np.lexsort((top, -scores[top]))][:k]
+        return [(int(row_id), float(scores[row_id])) for row_id in top.tolist() if scores[row_id] > 0]
+
+    def explain(self, text: str, row_ids: Sequence[int]) -> Dict[str, Any]:
+        """Per-term share of the normalised score of each of ``row_ids`` (for ``explain=true``)."""
+
+        counts: Dict[str, int] = {}
+        for term in BM25_TERM_PATTERN.findall(text.lower()):
+            if term in self._term_ids:
+                counts[term] = counts.get(term, 0) + 1
+        if not counts:
+            return {"rows_scored": 0, "unknown_terms": BM25_TERM_PATTERN.findall(text.lower()), "matches": []}
+        columns = [self._term_ids[term] for term in counts]
+        weights = self._weights[:, columns]
+        divisor = float(self.idf[columns] @ np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+        contributions = weights[list(row_ids)].toarray() * np.fromiter(counts.values(), dtype=np.float64) / divisor
+        return {
+            "rows_scored": int(np.count_nonzero(np.diff(weights.tocsr().indptr))),
+            "unknown_terms": [term for term in BM25_TERM_PATTERN.findall(text.lower()) if term not in self._term_ids],
+            "matches": [
+                {
+                    "row": int(row_id),
+                    "question": self.qa_index.question(row_id),
+                    "score": round(float(row.sum()), 4),
+                    "terms": {term: round(float(value), 4) for term, value in zip(counts, row.tolist()) if value},
+                }
+                for row_id, row in zip(row_ids, contributions)
+            ],
+        }
+
+
+class SymptomResolver:
+    """Character trigram index mapping user-typed symptoms onto known names.
+
+    Exact matches on the canonical key are a dict hit. Anything else is
+    scored against every known name at once: the trigram postings give the
+    number of shared trigrams per name, and the Dice coefficient
+    ``2 * shared / (query trigrams + name trigrams)`` picks the closest one,
+    earliest name first on ties.
+    """
+
+    def __init__(self, names: Sequence[str], threshold: float = SYMPTOM_MATCH_THRESHOLD) -> None:
+        self.threshold = threshold
+        self._exact: Dict[str, int] = {}
+        gram_ids: Dict[str, int] = {}
+        pair_grams: List[int] = []
+        pair_names: List[int] = []
+        sizes = np.zeros(len(names))
+        for position, name in enumerate(names):
+            self._exact.setdefault(name, position)
+            grams = _trigrams(name)
+            sizes[position] = len(grams)
+            for gram in grams:
+                pair_grams.append(gram_ids.setdefault(gram, len(gram_ids)))
+                pair_names.append(position)
+        self._gram_ids = gram_ids
+        self._sizes = sizes
+        self._indptr, self._postings = _build_postings(pair_grams, pair_names, len(gram_ids))
+
+    def resolve(self, text: str) -> Optional[Tuple[int, float]]:
+        """``(name position, similarity)`` of the closest name, or ``None``."""
+
+        key = symptom_key(text)
+        if not key:
+            return None
+        position = self._exact.get(key)
+        if position is not None:
+            return position, 1.0
+
+        grams = _trigrams(key)
+        known = [self._gram_ids[gram] for gram in grams if gram in self._gram_ids]
+        if not known:
+            return None
+        shared = np.bincount(
+            np.concatenate([self._postings[self._indptr[gram]:self._indptr[gram + 1]] for gram in known]),
+            minlength=self._sizes.size,
+        )
+        scores = 2.0 * shared / (len(grams) + self._sizes)
+        best = int(np.argmax(scores))
+        return (best, float(scores[best])) if scores[best] >= self.threshold else None
+
+
+class SymptomExtractor:
+    """Aho-Corasick automaton over the word sequences of known symptom phrases.
+
+    Phrases are symptom names (``"high_fever"`` is the words ``high fever``),
+    their parenthesised parts and :data:`SYMPTOM_SYNONYMS`. The automaton
+    steps once per word of the message, so :meth:`extract` finds every
+    phrase in a single left-to-right pass however many phrases there are.
+    Matching whole words means ``ache`` never fires inside ``headache``.
+    Where matches overlap, the leftmost and then longest one wins, so
+    "sudden high fever" is one mention rather than three.
+    """
+
+    def __init__(self, phrases: Sequence[Tuple[str, int]]) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        own: List[Optional[Tuple[int, int]]] = [None]
+        for phrase, column in phrases:
+            node = 0
+            words = phrase.split()
+            for word in words:
+                child = goto[node].get(word)
+                if child is None:
+                    child = goto[node][word] = len(goto)
+                    goto.append({})
+                    own.append(None)
+                node = child
+            if words and own[node] is None:
+                own[node] = (column, len(words))
+
+        # Breadth-first, so a node's failure target is final before its
+        # children are linked. ``outputs`` holds every phrase ending at a
+        # node: its own plus those of its failure chain.
+        fail = [0] * len(goto)
+        outputs: List[Tuple[Tuple[int, int], ...]] = [()] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            outputs[node] = ((own[node],) if own[node] is not None else ()) + outputs[fail[node]]
+            for word, child in goto[node].items():
+                target = fail[node]
+                while target and word not in goto[target]:
+                    target = fail[target]
+                fail[child] = goto[target].get(word, 0) if node else 0
+                queue.append(child)
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+
+    @classmethod
+    def from_symptoms(cls, symptoms: Sequence[str]) -> "SymptomExtractor":
+        phrases: List[Tuple[str, int]] = []
+        for column, name in enumerate(symptoms):
+            for phrase in symptom_phrases(name):
+                if phrase not in EXTRACTION_STOPWORDS:
+                    phrases.append((phrase, column))
+        columns = {name: column for column, name in enumerate(symptoms)}
+        for phrase, name in SYMPTOM_SYNONYMS.items():
+            if name in columns:
+                phrases.append((phrase, columns[name]))
+        return cls(phrases)
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def extract(self, text: str) -> List[Tuple[str, int, bool]]:
+        """``(matched words, column, negated)`` per symptom mentioned in ``text``, in order.
+
+        Each column is reported once, at its first mention. ``negated`` is
+        set when a :data:`NEGATION_WORDS` word is among the
+        :data:`NEGATION_WINDOW` words before the mention ("no fever"), not
+        counting words before the previous mention or a
+        :data:`NEGATION_BREAKS` word.
+        """
+
+        words = _ALIAS_TERMS.findall(str(text).lower().replace("'", ""))
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found: List[Tuple[int, int, int]] = []
+        node = 0
+        for end, word in enumerate(words, 1):
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            for column, length in outputs[node]:
+                found.append((end - length, end, column))
+
+        mentions: List[Tuple[str, int, bool]] = []
+        seen: Set[int] = set()
+        covered = 0
+        negated = False
+        for start, end, column in sorted(found, key=lambda match: (match[0], -match[1])):
+            if start < covered:
+                continue
+            preceding = words[max(covered, start - NEGATION_WINDOW):start]
+            # "no fever or chills": the negation carries over a list joined by "or".
+            negated = _negated(preceding) or (negated and covered > 0 and set(words[covered:start]) <= {"or", "nor"})
+            covered = end
+            if column in seen:
+                continue
+            seen.add(column)
+            mentions.append((" ".join(words[start:end]), column, negated))
+        return mentions
+
+
+class SymptomMatrix:
+    """L2-normalised sparse matrix of disease rows over symptom columns.
+
+    Rows come either from ``Final_Augmented.csv`` (one row per sample, several
+    rows may share a disease) or from ``DiseaseAndSymptoms.csv`` (one row per
+    disease holding the union of its listed symptoms). Scoring a query is one
+    sparse mat-vec, which yields the cosine similarity of every row at once.
+
+    ``cooccurrence`` counts, for every pair of symptoms, the rows listing
+    both (its diagonal is each symptom's row count); :meth:`follow_up` uses
+    it to pick the next symptoms worth asking about.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        symptoms: Sequence[str],
+        matrix: sparse.spmatrix,
+        resolver: Optional[SymptomResolver] = None,
+        extractor: Optional[SymptomExtractor] = None,
+    ) -> None:
+        self.symptoms: List[str] = list(symptoms)
+        self._columns: Dict[str, int] = {name: column for column, name in enumerate(self.symptoms)}
+
+        self.diseases: List[str] = []
+        disease_codes: Dict[str, int] = {}
+        codes = np.empty(len(labels), dtype=np.int32)
+        for row, label in enumerate(labels):
+            codes[row] = disease_codes.setdefault(label, len(disease_codes))
+            if codes[row] == len(self.diseases):
+                self.diseases.append(label)
+        self._row_disease = codes
+        self._one_row_per_disease = len(self.diseases) == len(labels)
+
+        self.resolver = resolver if resolver is not None else SymptomResolver(self.symptoms)
+        self.extractor = extractor if extractor is not None else SymptomExtractor.from_symptoms(self.symptoms)
+
+        self._raw = sparse.csr_matrix(matrix, dtype=np.float64)
+        norms = np.sqrt(np.asarray(self._raw.multiply(self._raw).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self._normalised = sparse.csr_matrix(sparse.diags(1.0 / norms) @ self._raw)
+        self._normalised_t = self._normalised.T.tocsr()
+
+        presence = self._raw.copy()
+        presence.data = (presence.data > 0).astype(np.float64)
+        presence.eliminate_zeros()
+        self._presence_t = presence.T.tocsr()
+        self.cooccurrence: sparse.csr_matrix = (self._presence_t @ presence).tocsr()
+
+    @classmethod
+    def empty(cls) -> "SymptomMatrix":
+        return cls([], [], sparse.csr_matrix((0, 0)))
+
+    @classmethod
+    def from_augmented(cls, augmented_df: pd.DataFrame) -> "SymptomMatrix":
+        columns = [col for col in augmented_df.columns if col not in ("diseases", "diseases_clean")]
+        values = augmented_df[columns].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        labels = augmented_df["diseases"].astype(str).tolist()
+        return cls(labels, [symptom_key(col) for col in columns], sparse.csr_matrix(values))
+
+    @classmethod
+    def from_symptom_table(cls, symptoms_df: pd.DataFrame) -> "SymptomMatrix":
+        symptom_columns = [col for col in symptoms_df.columns if str(col).startswith("Symptom_")]
+        per_disease: Dict[str, Dict[int, None]] = {}
+        columns: Dict[str, int] = {}
+        for record in symptoms_df[["Disease", *symptom_columns]].itertuples(index=False):
+            disease = str(record[0]).strip()
+            if not disease or disease.lower() == "nan":
+                continue
+            entries = per_disease.setdefault(disease, {})
+            for value in record[1:]:
+                if not isinstance(value, str):
+                    continue
+                key = symptom_key(value)
+                if key and key != "nan":
+                    entries[columns.setdefault(key, len(columns))] = None
+
+        indptr = [0]
+        indices: List[int] = []
+        for entries in per_disease.values():
+            indices.extend(entries)
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices)), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(per_disease), len(columns)),
+        )
+        return cls(list(per_disease), list(columns), matrix)
+
+    @classmethod
+    def from_frames(
+        cls, augmented_df: Optional[pd.DataFrame], symptoms_df: Optional[pd.DataFrame]
+    ) -> Optional["SymptomMatrix"]:
+        """Prefer the augmented dataset, falling back to ``DiseaseAndSymptoms.csv``."""
+
+        if augmented_df is not None and not augmented_df.empty and "diseases" in augmented_df.columns:
+            return cls.from_augmented(augmented_df)
+        if symptoms_df is not None and not symptoms_df.empty and "Disease" in symptoms_df.columns:
+            return cls.from_symptom_table(symptoms_df)
+        return None
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray], prefix: str) -> "SymptomMatrix":
+        labels = StringTable.from_arrays(arrays, f"{prefix}.diseases").tolist()
+        codes = arrays[f"{prefix}.row_disease"]
+        raw = sparse.csr_matrix(
+            (arrays[f"{prefix}.data"], arrays[f"{prefix}.indices"], arrays[f"{prefix}.indptr"]),
+            shape=(codes.size, int(arrays[f"{prefix}.symptom_count"][0])),
+        )
+        return cls([labels[code] for code in codes.tolist()], StringTable.from_arrays(arrays, f"{prefix}.symptoms").tolist(), raw)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}.data": self._raw.data,
+            f"{prefix}.indices": self._raw.indices,
+            f"{prefix}.indptr": self._raw.indptr,
+            f"{prefix}.row_disease": self._row_disease,
+            f"{prefix}.symptom_count": np.asarray([len(self.symptoms)], dtype=np.int64),
+            **StringTable.from_strings(self.diseases).to_arrays(f"{prefix}.diseases"),
+            **StringTable.from_strings(self.symptoms).to_arrays(f"{prefix}.symptoms"),
+        }
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._raw.shape
+
+    def with_disease(self, name: str, symptoms: Sequence[str]) -> "SymptomMatrix":
+        """Copy in which every row of ``name`` is replaced by one row of ``symptoms``.
+
+        Symptoms without a column get a new one; the resolver and extractor
+        are only rebuilt then.
+        """
+
+        keep = self._rows_except(name)
+        lookup = dict(self._columns)
+        row_columns = sorted({lookup.setdefault(key, len(lookup)) for key in map(symptom_key, symptoms) if key})
+        kept = self._raw[keep]
+        kept = sparse.csr_matrix((kept.data, kept.indices, kept.indptr), shape=(kept.shape[0], len(lookup)))
+        added = sparse.csr_matrix(
+            (np.ones(len(row_columns)), (np.zeros(len(row_columns), dtype=np.int32), row_columns)),
+            shape=(1, len(lookup)),
+        )
+        unchanged = len(lookup) == len(self.symptoms)
+        return SymptomMatrix(
+            [*self._labels(keep), name],
+            list(lookup),
+            sparse.vstack([kept, added], format="csr"),
+            self.resolver if unchanged else None,
+            self.extractor if unchanged else None,
+        )
+
+    def without_disease(self, name: str) -> "SymptomMatrix":
+        """Copy without the rows of ``name``; the symptom columns are kept."""
+
+        keep = self._rows_except(name)
+        return SymptomMatrix(self._labels(keep), self.symptoms, self._raw[keep], self.resolver, self.extractor)
+
+    def _rows_except(self, name: str) -> np.ndarray:
+        key = disease_key(name)
+        dropped = [code for code, disease in enumerate(self.diseases) if disease_key(disease) == key]
+        return np.flatnonzero(~np.isin(self._row_disease, dropped))
+
+    def _labels(self, rows: np.ndarray) -> List[str]:
+        return [self.diseases[code] for code in self._row_disease[rows].tolist()]
+
+    def resolve(self, symptoms: Sequence[str]) -> List[Tuple[str, Optional[int], float]]:
+        """Match each non-empty term to a symptom column, tolerating typos.
+
+        Returns ``(term, column, similarity)`` per term; ``column`` is ``None``
+        when no known symptom is within the resolver's threshold.
+        """
+
+        resolved: List[Tuple[str, Optional[int], float]] = []
+        for symptom in symptoms:
+            if not symptom_key(symptom):
+                continue
+            match = self.resolver.resolve(symptom)
+            resolved.append((symptom, None, 0.0) if match is None else (symptom, match[0], match[1]))
+        return resolved
+
+    def extract(self, text: str) -> List[Tuple[str, int, bool]]:
+        """Symptoms mentioned anywhere in free text; see :meth:`SymptomExtractor.extract`."""
+
+        return self.extractor.extract(text)
+
+    def query_columns(self, symptoms: Sequence[str]) -> List[int]:
+        return resolved_columns(self.resolve(symptoms))
+
+    def column(self, name: str) -> Optional[int]:
+        """Column of a known symptom name in any case or spacing, or ``None``."""
+
+        return self._columns.get(symptom_key(name))
+
+    def add_symptom(self, totals: np.ndarray, column: int) -> None:
+        """Add one symptom to a running query in place: one sparse column of the normalised rows.
+
+        ``totals`` holds every row's dot product with a binary query, so
+        :meth:`row_scores` of the query is ``totals / sqrt(symptom count)``.
+        """
+
+        start, end = self._normalised_t.indptr[column], self._normalised_t.indptr[column + 1]
+        totals[self._normalised_t.indices[start:end]] += self._normalised_t.data[start:end]
+
+    def rows_listing(self, column: int) -> np.ndarray:
+        """Rows that list the symptom in ``column``."""
+
+        return self._presence_t.indices[self._presence_t.indptr[column]:self._presence_t.indptr[column + 1]]
+
+    def row_scores(self, columns: Sequence[int]) -> np.ndarray:
+        """Cosine similarity of every row with the binary query over ``columns``."""
+
+        query = np.zeros(len(self.symptoms))
+        query[list(columns)] = 1.0
+        return self._normalised @ query / np.sqrt(len(columns))
+
+    def best_row(self, symptoms: Sequence[str]) -> Optional[Tuple[str, float, np.ndarray]]:
+        columns = self.query_columns(symptoms)
+        if not columns:
+            return None
+        scores = self.row_scores(columns)
+        row = int(np.argmax(scores))
+        return self.diseases[self._row_disease[row]], float(scores[row]), self._raw[row].toarray().ravel()
+
+    def top_k(self, symptoms: Sequence[str], k: int) -> List[Tuple[str, float]]:
+        """Return up to ``k`` ``(disease, score)`` pairs with a positive score, best first."""
+
+        return self.rank(self.query_columns(symptoms), k)
+
+    def top_k_batch(self, queries: Sequence[Sequence[str]], k: int) -> List[List[Tuple[str, float]]]:
+        return self.rank_batch([self.query_columns(symptoms) for symptoms in queries], k)
+
+    def rank(self, columns: Sequence[int], k: int) -> List[Tuple[str, float]]:
+        """:meth:`top_k` for a query already resolved to symptom columns."""
+
+        if not columns or k <= 0:
+            return []
+        return self.rank_scores(self.row_scores(columns), k)
+
+    def rank_scores(self, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """:meth:`rank` for row scores already computed, e.g. by a running session."""
+
+        if k <= 0 or not scores.size:
+            return []
+        if not self._one_row_per_disease:
+            disease_scores = np.zeros(len(self.diseases))
+            np.maximum.at(disease_scores, self._row_disease, scores)
+            scores = disease_scores
+        return self._ranked(scores, k)
+
+    def rank_batch(self, query_columns: Sequence[Sequence[int]], k: int) -> List[List[Tuple[str, float]]]:
+        """:meth:`rank` for many queries with one sparse x dense product per chunk."""
+
+        results: List[List[Tuple[str, float]]] = [[] for _ in query_columns]
+        scored = [position for position, columns in enumerate(query_columns) if columns]
+        if not scored or k <= 0:
+            return results
+
+        chunk = max(1, min(MAX_BATCH_CHUNK, BATCH_SCORE_CELLS // max(self._raw.shape[0], 1)))
+        for start in range(0, len(scored), chunk):
+            positions = scored[start:start + chunk]
+            block = np.zeros((len(self.symptoms), len(positions)))
+            for column, position in enumerate(positions):
+                block[list(query_columns[position]), column] = 1.0
+            scores = self._normalised @ block / np.sqrt(block.sum(axis=0))
+            if not self._one_row_per_disease:
+                disease_scores = np.zeros((len(self.diseases), len(positions)))
+                np.maximum.at(disease_scores, self._row_disease, scores)
+                scores = disease_scores
+            for column, position in enumerate(positions):
+                results[position] = self._ranked(scores[:, column], k)
+        return results
+
+    def candidate_weights(self, columns: Sequence[int], ruled_out: Sequence[int] = ()) -> np.ndarray:
+        """Row scores for ``columns`` with every row listing a ``ruled_out`` symptom zeroed."""
+
+        weights = self.row_scores(columns)
+        for column in ruled_out:
+            weights[self.rows_listing(column)] = 0.0
+        return weights
+
+    def follow_up(
+        self, columns: Sequence[int], k: int, ruled_out: Sequence[int] = (), weights: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float, float]]:
+        """Up to ``k`` unasked symptoms that best tell apart the rows ``columns`` match.
+
+        Rows scoring above zero are the candidates, weighted by their score;
+        rows listing a ``ruled_out`` symptom (one the user said they do not
+        have) are dropped. A symptom listed by a weighted share ``p`` of the
+        candidates gets a yes with probability ``p``, and because a row either
+        lists it or not, the expected information gain of asking is the
+        binary entropy of ``p``: symptoms near ``p = 0.5`` split the
+        candidates best. Ties go to the symptom that co-occurs most often
+        with ``columns``. Returns ``(symptom, gain in bits, p)`` triples,
+        best first. Pass ``weights`` when :meth:`candidate_weights` of
+        ``columns`` and ``ruled_out`` is already known.
+        """
+
+        if not columns or k <= 0:
+            return []
+        if weights is None:
+            weights = self.candidate_weights(columns, ruled_out)
+        total = float(weights.sum())
+        if total <= 0:
+            return []
+        share = self._presence_t @ (weights / total)
+        share[[*columns, *ruled_out]] = 0.0
+        candidates = np.flatnonzero((share > 1e-9) & (share < 1 - 1e-9))
+        if not candidates.size:
+            return []
+        p = share[candidates]
+        gain = -(p * np.log2(p) + (1 - p) * np.log2(1 - p))
+
+        indptr, indices, data = self.cooccurrence.indptr, self.cooccurrence.indices, self.cooccurrence.data
+        entries = np.concatenate([np.arange(indptr[column], indptr[column + 1]) for column in columns])
+        together = np.bincount(indices[entries], weights=data[entries], minlength=len(self.symptoms))[candidates]
+
+        order = np.lexsort((candidates, -together, -np.round(gain, 9)))[:k]
+        return [(self.symptoms[candidates[i]], float(gain[i]), float(p[i])) for i in order.tolist()]
+
+    def explain(self, columns: Sequence[int], diseases: Sequence[str]) -> Dict[str, Any]:
+        """Which query symptoms each of ``diseases`` matched on its best row (for ``explain=true``)."""
+
+        scores = self.row_scores(columns)
+        matches = []
+        for disease in diseases:
+            rows = np.flatnonzero(self._row_disease == self.diseases.index(disease))
+            row = int(rows[np.argmax(scores[rows])])
+            listed = set(self._raw.indices[self._raw.indptr[row]:self._raw.indptr[row + 1]].tolist())
+            matches.append(
+                {
+                    "disease": disease,
+                    "score": round(float(scores[row]), 4),
+                    "matched_symptoms": [self.symptoms[column] for column in columns if column in listed],
+                    "row_symptoms": len(listed),
+                    "rows": int(rows.size),
+                }
+            )
+        return {
+            "rows_scored": int(self._raw.shape[0]),
+            "query_symptoms": [self.symptoms[column] for column in columns],
+            "matches": matches,
+        }
+
+    def _ranked(self, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(self.diseases[row], float(scores[row])) for row in top if scores[row] > 0]
+
+
+class DiseaseRecord:
+    """Precomputed reply material for one disease.
+
+    Symptom and precaution strings are interned: the same few hundred
+    values recur across diseases and are stored once.
+    """
+
+    __slots__ = ("name", "symptoms", "precautions", "description_row", "description")
+
+    def __init__(
+        self,
+        name: str,
+        symptoms: Sequence[str] = (),
+        precautions: Sequence[str] = (),
+        description_row: int = -1,
+        description: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.symptoms: Tuple[str, ...] = tuple(map(sys.intern, symptoms))
+        self.precautions: Tuple[str, ...] = tuple(map(sys.intern, precautions))
+        self.description_row = description_row
+        # Set by knowledge-base updates; overrides the FAQ answer at description_row.
+        self.description = description
+
+
+class DiseaseIndex:
+    """Hash lookup from a normalised disease name to its :class:`DiseaseRecord`.
+
+    Symptom lists follow the legacy precedence: the first matching row of the
+    augmented dataset when it lists any symptom, otherwise the first row of
+    ``DiseaseAndSymptoms.csv``. ``description_row`` is the QA row id of the
+    first FAQ question mentioning the disease, or ``-1``.
+
+    The index is treated as immutable: :meth:`with_record` and
+    :meth:`without` return updated copies.
+    """
+
+    def __init__(self, records: Mapping[str, DiseaseRecord]) -> None:
+        self._records: Dict[str, DiseaseRecord] = dict(records)
+
+    @classmethod
+    def from_frames(
+        cls,
+        precautions_df: Optional[pd.DataFrame],
+        symptoms_df: Optional[pd.DataFrame],
+        augmented_df: Optional[pd.DataFrame],
+        description_row: Optional[Callable[[str], Optional[int]]] = None,
+    ) -> "DiseaseIndex":
+        names: Dict[str, str] = {}
+        symptoms = symptom_lists(symptoms_df, augmented_df, names)
+        precautions = precaution_lists(precautions_df, names)
+
+        records: Dict[str, DiseaseRecord] = {}
+        for key, name in names.items():
+            row = description_row(key) if description_row is not None else None
+            records[key] = DiseaseRecord(
+                name,
+                symptoms.get(key, ()),
+                precautions.get(key, ()),
+                -1 if row is None else row,
+            )
+        return cls(records)
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray], prefix: str) -> "DiseaseIndex":
+        keys = StringTable.from_arrays(arrays, f"{prefix}.keys").tolist()
+        names = StringTable.from_arrays(arrays, f"{prefix}.names").tolist()
+        symptoms = _unflatten(arrays, f"{prefix}.symptoms")
+        precautions = _unflatten(arrays, f"{prefix}.precautions")
+        rows = arrays[f"{prefix}.description_rows"].tolist()
+        descriptions = _unflatten(arrays, f"{prefix}.descriptions")
+        return cls(
+            {
+                key: DiseaseRecord(name, symptom_list, precaution_list, row, description[0] if description else None)
+                for key, name, symptom_list, precaution_list, row, description in zip(
+                    keys, names, symptoms, precautions, rows, descriptions
+                )
+            }
+        )
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        records = list(self._records.values())
+        return {
+            **StringTable.from_strings(list(self._records)).to_arrays(f"{prefix}.keys"),
+            **StringTable.from_strings([record.name for record in records]).to_arrays(f"{prefix}.names"),
+            **_flatten([record.symptoms for record in records], f"{prefix}.symptoms"),
+            **_flatten([record.precautions for record in records], f"{prefix}.precautions"),
+            f"{prefix}.description_rows": np.asarray([record.description_row for record in records], dtype=np.int64),
+            **_flatten(
+                [() if record.description is None else (record.description,) for record in records],
+                f"{prefix}.descriptions",
+            ),
+        }
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, disease_name: Optional[str]) -> Optional[DiseaseRecord]:
+        if not disease_name:
+            return None
+        return self._records.get(disease_key(disease_name))
+
+    def records(self) -> List[Tuple[str, DiseaseRecord]]:
+        return list(self._records.items())
+
+    def with_record(self, record: DiseaseRecord) -> "DiseaseIndex":
+        return DiseaseIndex({**self._records, disease_key(record.name): record})
+
+    def without(self, disease_name: str) -> "DiseaseIndex":
+        key = disease_key(disease_name)
+        return DiseaseIndex({other: record for other, record in self._records.items() if other != key})
+
+
+class DiseaseCard:
+    """The finished disease fields of a chat reply.
+
+    ``fields`` is built once and merged into every reply for the disease,
+    so its lists are shared and must be treated as read-only.
+    """
+
+    __slots__ = ("name", "fields")
+
+    def __init__(self, record: DiseaseRecord, description: Optional[str]) -> None:
+        self.name = record.name
+        self.fields: Dict[str, Any] = {
+            "symptoms": list(record.symptoms),
+            "precautions": list(record.precautions),
+            "description": description,
+        }
+
+
+class DiseaseCards:
+    """Answer cards for every known disease, reachable by name or alias.
+
+    A disease's own name is found by its :func:`disease_key` with one dict
+    hit. Anything else is looked up by :func:`alias_key`, which also ignores
+    punctuation, so ``"Iron deficiency anemia"`` finds
+    ``"Iron-Deficiency Anemia"``. Besides its own name a disease answers to
+    the name without its parenthesised part and to the parenthesised part
+    itself (``"COPD"``, ``"high blood pressure"``). A disease's own name
+    always wins over another disease's alias; an alias claimed by two
+    diseases is dropped.
+    """
+
+    def __init__(self, disease_index: DiseaseIndex, description: Callable[[DiseaseRecord], Optional[str]]) -> None:
+        self._exact: Dict[str, DiseaseCard] = {}
+        self._aliases: Dict[str, DiseaseCard] = {}
+        for key, record in disease_index.records():
+            card = DiseaseCard(record, description(record))
+            self._exact[key] = card
+            self._aliases.setdefault(alias_key(record.name), card)
+
+        claimed: Dict[str, Optional[DiseaseCard]] = {}
+        for card in self._exact.values():
+            for alias in disease_aliases(card.name):
+                if alias in self._aliases:
+                    continue
+                if claimed.setdefault(alias, card) is not card:
+                    claimed[alias] = None
+        self._aliases.update((alias, card) for alias, card in claimed.items() if card is not None)
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def get(self, text: Optional[str]) -> Optional[DiseaseCard]:
+        if not text:
+            return None
+        card = self._exact.get(disease_key(text))
+        return card if card is not None else self._aliases.get(alias_key(text))
+
+
+class NameSuggester:
+    """Prefix completion over symptom and disease names, most frequent first.
+
+    Every word start of every name is a key in one sorted list, so
+    ``"ras"`` completes ``"skin rash"`` as well as ``"rash"``. A prefix is the
+    slice between two ``bisect`` probes; the slice's names are ranked by how
+    often the datasets list them, then by length and spelling.
+    """
+
+    KINDS = ("symptom", "disease")
+
+    def __init__(self, names: Sequence[str], kinds: Sequence[int], counts: Sequence[int]) -> None:
+        self.names: List[str] = list(names)
+        self._kinds = np.asarray(kinds, dtype=np.uint8)
+        self._counts = np.asarray(counts, dtype=np.int64)
+        keyed: List[Tuple[str, int]] = []
+        for entry, name in enumerate(self.names):
+            words = suggestion_key(name).split(" ")
+            keyed.extend((" ".join(words[start:]), entry) for start in range(len(words)))
+        keyed.sort()
+        self._keys = [key for key, _ in keyed]
+        self._entries = np.asarray([entry for _, entry in keyed], dtype=np.int32)
+        # Rank of each entry in the final ordering, so a slice sorts by one key.
+        order = sorted(range(len(self.names)), key=lambda entry: (-self._counts[entry], len(self.names[entry]), self.names[entry]))
+        self._rank = np.empty(len(self.names), dtype=np.int32)
+        self._rank[order] = np.arange(len(order), dtype=np.int32)
+
+    @classmethod
+    def from_counts(cls, symptom_counts: Mapping[str, int], disease_counts: Mapping[str, int]) -> "NameSuggester":
+        names = [*symptom_counts, *disease_counts]
+        kinds = [0] * len(symptom_counts) + [1] * len(disease_counts)
+        return cls(names, kinds, [*symptom_counts.values(), *disease_counts.values()])
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray], prefix: str) -> "NameSuggester":
+        return cls(StringTable.from_arrays(arrays, f"{prefix}.names").tolist(), arrays[f"{prefix}.kinds"], arrays[f"{prefix}.counts"])
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            **StringTable.from_strings(self.names).to_arrays(f"{prefix}.names"),
+            f"{prefix}.kinds": self._kinds,
+            f"{prefix}.counts": self._counts,
+        }
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def updated(self, added: Sequence[Tuple[str, int]] = (), removed: Sequence[str] = ()) -> "NameSuggester":
+        """Copy with ``(name, kind)`` pairs added (count 1) and ``removed`` names dropped.
+
+        Names are compared by :func:`suggestion_key`; adding a known name is a no-op.
+        """
+
+        dropped = {suggestion_key(name) for name in removed}
+        entries = [entry for entry, name in enumerate(self.names) if suggestion_key(name) not in dropped]
+        names = [self.names[entry] for entry in entries]
+        kinds = self._kinds[entries].tolist()
+        counts = self._counts[entries].tolist()
+        known = {suggestion_key(name) for name in names}
+        for name, kind in added:
+            key = suggestion_key(name)
+            if key and key not in known:
+                known.add(key)
+                names.append(name)
+                kinds.append(kind)
+                counts.append(1)
+        return NameSuggester(names, kinds, counts)
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit`` ``{"text", "type", "count"}`` completions of ``prefix``."""
+
+        key = suggestion_key(prefix)
+        if not key or limit <= 0:
+            return []
+        start = bisect.bisect_left(self._keys, key)
+        stop = bisect.bisect_left(self._keys, key + "\uffff", start)
+        if start == stop:
+            return []
+        entries = np.unique(self._entries[start:stop])
+        ranks = self._rank[entries]
+        if entries.size > limit:
+            keep = np.argpartition(ranks, limit - 1)[:limit]
+            entries, ranks = entries[keep], ranks[keep]
+        return [
+            {"text": self.names[entry], "type": self.KINDS[self._kinds[entry]], "count": int(self._counts[entry])}
+            for entry in entries[np.argsort(ranks)].tolist()
+        ]
+
+
+def name_frequencies(
+    precautions_df: Optional[pd.DataFrame],
+    symptoms_df: Optional[pd.DataFrame],
+    augmented_df: Optional[pd.DataFrame],
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """How many dataset rows list each symptom, and name each disease.
+
+    Symptoms are reported in their readable form (``"skin rash"``); diseases
+    under the first spelling seen.
+    """
+
+    symptoms: Dict[str, int] = {}
+    diseases: Dict[str, int] = {}
+    names: Dict[str, str] = {}
+
+    def count_disease(value: Any) -> None:
+        key = disease_key(value) if isinstance(value, str) else ""
+        if key and key != "nan":
+            name = names.setdefault(key, value.strip())
+            diseases[name] = diseases.get(name, 0) + 1
+
+    if augmented_df is not None and not augmented_df.empty and "diseases" in augmented_df.columns:
+        columns = [col for col in augmented_df.columns if col not in ("diseases", "diseases_clean")]
+        present = augmented_df[columns].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy() > 0
+        for column, count in zip(columns, present.sum(axis=0).tolist()):
+            if count:
+                name = symptom_key(column).replace("_", " ")
+                symptoms[name] = symptoms.get(name, 0) + int(count)
+        for value in augmented_df["diseases"].tolist():
+            count_disease(value)
+
+    if symptoms_df is not None and not symptoms_df.empty and "Disease" in symptoms_df.columns:
+        columns = [col for col in symptoms_df.columns if str(col).startswith("Symptom_")]
+        for record in symptoms_df[["Disease", *columns]].itertuples(index=False):
+            count_disease(record[0])
+            for value in set(symptom_key(value) for value in record[1:] if isinstance(value, str)):
+                if value and value != "nan":
+                    name = value.replace("_", " ")
+                    symptoms[name] = symptoms.get(name, 0) + 1
+
+    if precautions_df is not None and not precautions_df.empty and "Disease" in precautions_df.columns:
+        for value in precautions_df["Disease"].tolist():
+            count_disease(value)
+
+    return symptoms, diseases
+
+
+def symptom_lists(
+    symptoms_df: Optional[pd.DataFrame],
+    augmented_df: Optional[pd.DataFrame],
+    names: Optional[Dict[str, str]] = None,
+) -> Dict[str, List[str]]:
+    """Symptom list per disease key, taken from the first row of each disease."""
+
+    names = {} if names is None else names
+    lists: Dict[str, List[str]] = {}
+
+    if augmented_df is not None and not augmented_df.empty and "diseases" in augmented_df.columns:
+        columns = [col for col in augmented_df.columns if col not in ("diseases", "diseases_clean")]
+        first_rows = augmented_df.assign(_key=augmented_df["diseases"].map(disease_key)).drop_duplicates("_key")
+        flags = first_rows[columns].to_numpy() == 1
+        for key, name, row_flags in zip(first_rows["_key"].tolist(), first_rows["diseases"].tolist(), flags):
+            present = [columns[column].replace("_", " ") for column in np.flatnonzero(row_flags)]
+            if present:
+                lists[key] = present
+            names.setdefault(key, str(name).strip())
+
+    if symptoms_df is not None and not symptoms_df.empty and "Disease" in symptoms_df.columns:
+        columns = [col for col in symptoms_df.columns if str(col).startswith("Symptom_")]
+        for record in symptoms_df[["Disease", *columns]].itertuples(index=False):
+            key = disease_key(record[0])
+            if not key or key in lists:
+                continue
+            names.setdefault(key, str(record[0]).strip())
+            lists[key] = _clean_values(record[1:])
+
+    return lists
+
+
+def precaution_lists(
+    precautions_df: Optional[pd.DataFrame], names: Optional[Dict[str, str]] = None
+) -> Dict[str, List[str]]:
+    """Precaution list per disease key, taken from the first row of each disease."""
+
+    names = {} if names is None else names
+    lists: Dict[str, List[str]] = {}
+    if precautions_df is None or precautions_df.empty or "Disease" not in precautions_df.columns:
+        return lists
+
+    columns = [col for col in ("Precaution_1", "Precaution_2", "Precaution_3", "Precaution_4") if col in precautions_df.columns]
+    for record in precautions_df[["Disease", *columns]].itertuples(index=False):
+        key = disease_key(record[0])
+        if not key or key in lists:
+            continue
+        names.setdefault(key, str(record[0]).strip())
+        lists[key] = _clean_values(record[1:])
+    return lists
+
+
+def disease_key(name: Any) -> str:
+    """Normalised lookup key for a disease name: lowercase, single-spaced."""
+
+    return " ".join(str(name).lower().split())
+
+
+def alias_key(text: Any) -> str:
+    """Disease lookup key that also ignores punctuation, e.g. ``"COVID-19"`` -> ``"covid 19"``."""
+
+    return " ".join(_ALIAS_TERMS.findall(str(text).lower().replace("'", "")))
+
+
+def disease_aliases(name: str) -> List[str]:
+    """Alias keys of a disease name taken from its parenthesised parts."""
+
+    aliases = [alias_key(_PARENTHESISED.sub(" ", name))]
+    for part in _PARENTHESISED.findall(name):
+        key = alias_key(part)
+        if len(key) >= ALIAS_MIN_LENGTH and key not in ALIAS_STOPWORDS:
+            aliases.append(key)
+    return [alias for alias in aliases if alias and alias != alias_key(name)]
+
+
+def symptom_phrases(name: str) -> List[str]:
+    """Word sequences a symptom name is written as in text.
+
+    ``"toxic_look_(typhos)"`` gives ``"toxic look typhos"``, ``"toxic look"``
+    and ``"typhos"``.
+    """
+
+    text = str(name).replace("_", " ")
+    phrases = [alias_key(text), alias_key(_PARENTHESISED.sub(" ", text))]
+    phrases.extend(alias_key(part) for part in _PARENTHESISED.findall(text) if len(alias_key(part)) >= ALIAS_MIN_LENGTH)
+    return [phrase for phrase in dict.fromkeys(phrases) if phrase]
+
+
+def suggestion_key(text: str) -> str:
+    """Lowercase, single-spaced form names are matched in, with ``_`` read as a space."""
+
+    return " ".join(str(text).lower().replace("_", " ").split())
+
+
+def symptom_key(text: str) -> str:
+    """Canonical column form of a symptom name, e.g. ``" Skin  rash"`` -> ``"skin_rash"``."""
+
+    return _SYMPTOM_SEPARATORS.sub("_", str(text).strip().lower()).strip("_")
+
+
+def resolved_columns(resolved: Sequence[Tuple[str, Optional[int], float]]) -> List[int]:
+    """Distinct matched columns of a :meth:`SymptomMatrix.resolve` result, in order."""
+
+    columns: Dict[int, None] = {}
+    for _, column, _ in resolved:
+        if column is not None:
+            columns[column] = None
+    return list(columns)
+
+
+def _clean_values(values: Sequence[Any]) -> List[str]:
+    cleaned: List[str] = []
+    for value in values:
+        if pd.notna(value):
+            text = str(value).strip()
+            if text and text.lower() != "nan":
+                cleaned.append(text)
+    return cleaned
+
+
+def _flatten(lists: Sequence[Sequence[str]], name: str) -> Dict[str, np.ndarray]:
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(items) for items in lists], out=indptr[1:])
+    flat = [item for items in lists for item in items]
+    return {**StringTable.from_strings(flat).to_arrays(f"{name}.values"), f"{name}.indptr": indptr}
+
+
+def _unflatten(arrays: Mapping[str, np.ndarray], name: str) -> List[List[str]]:
+    flat = StringTable.from_arrays(arrays, f"{name}.values").tolist()
+    indptr = arrays[f"{name}.indptr"].tolist()
+    return [flat[indptr[i]:indptr[i + 1]] for i in range(len(indptr) - 1)]
+
+
+def _token_key(tokens: Iterable[str]) -> str:
+    """Key shared by questions with the same set of tokens."""
+
+    return " ".join(sorted(set(tokens)))
+
+
+def _first_occurrences(matrix: sparse.csr_matrix) -> np.ndarray:
+    """Mask of the rows whose sparsity pattern no earlier row shares."""
+
+    first = np.zeros(matrix.shape[0], dtype=bool)
+    seen: Set[bytes] = set()
+    indices, indptr = matrix.indices, matrix.indptr
+    for row in range(matrix.shape[0]):
+        signature = indices[indptr[row]:indptr[row + 1]].tobytes()
+        if signature not in seen:
+            seen.add(signature)
+            first[row] = True
+    return first
+
+
+def _negated(preceding: Sequence[str]) -> bool:
+    for word in reversed(preceding):
+        if word in NEGATION_BREAKS:
+            return False
+        if word in NEGATION_WORDS:
+            return True
+    return False
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key.replace('_', ' ')} "
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def _build_postings(pair_tokens: List[int], pair_rows: List[int], vocabulary_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    tokens = np.asarray(pair_tokens, dtype=np.int64)
+    rows = np.asarray(pair_rows, dtype=np.int32)
+    order = np.argsort(tokens, kind="stable")
+    indptr = np.zeros(vocabulary_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tokens, minlength=vocabulary_size), out=indptr[1:])
+    return indptr, rows[order]
+
+
+def _matching_token_ids(blob: str, starts: np.ndarray, term: str) -> np.ndarray:
+    if not term or not starts.size:
+        return _EMPTY_ROWS
+    hits = [match.start() for match in re.finditer(re.escape(term), blob)]
+    if not hits:
+        return _EMPTY_ROWS
+    return np.unique(np.searchsorted(starts, np.asarray(hits, dtype=np.int64), side="right") - 1)
+
+
+__all__ = [
+    "BM25_MATCH_THRESHOLD",
+    "FAQ_MATCH_THRESHOLD",
+    "SYMPTOM_MATCH_THRESHOLD",
+    "BM25Index",
+    "DiseaseCard",
+    "DiseaseCards",
+    "DiseaseIndex",
+    "DiseaseRecord",
+    "NameSuggester",
+    "QAIndex",
+    "QARecord",
+    "SymptomExtractor",
+    "SymptomMatrix",
+    "SymptomResolver",
+    "alias_key",
+    "disease_aliases",
+    "disease_key",
+    "name_frequencies",
+    "precaution_lists",
+    "resolved_columns",
+    "suggestion_key",
+    "symptom_key",
+    "symptom_lists",
+    "symptom_phrases",
+]
@@ -0,0 +1,106 @@
+"""One-pass analysis of a chat message shared by the chatbot stages."""
+from __future__ import annotations
+
+import re
+from typing import FrozenSet, List, Optional
+
+from chatbot_index import ALPHA_TERM_PATTERN, LONG_TERM_MIN_LENGTH
+
+QUESTION_PATTERNS = [
+    r"what (are|is)",
+    r"how (to|do|can)",
+    r"why (is|are)",
+    r"when (should|do)",
+    r"where (can|do)",
+    r"who (should|can)",
+    r"can you",
+    r"could you",
+    r"would you",
+    r"explain",
+    r"tell me about",
+]
+
+SYMPTOM_QUESTION_PATTERNS = [
+    r"what (are|is) (the )?(symptoms|signs) of",
+    r"what (are|is) (the )?(causes|reason) of",
+    r"what (are|is) (the )?(treatment|remedy) for",
+    r"how (to|do) (treat|handle|manage)",
+    r"what (is|are)",
+]
+
+DISEASE_PHRASE_PATTERN = re.compile(r"(?:symptoms|signs|causes|treatment|of|for)\s+([^?]+)")
+# First words of a question typed without a question mark ("is jaundice contagious").
+QUESTION_OPENERS = frozenset(
+    {"what", "how", "why", "when", "where", "who", "which", "is", "are", "does", "do", "can", "could", "should", "would"}
+)
+FIRST_PERSON_PATTERN = re.compile(r"\b(?:i|i'm|im|i've|ive|me|my|we|our)\b")
+
+
+def _any_of(patterns: List[str]) -> "re.Pattern[str]":
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+
+_QUESTION_RE = _any_of(QUESTION_PATTERNS)
+_SYMPTOM_QUESTION_RE = _any_of(SYMPTOM_QUESTION_PATTERNS)
+
+
+class QueryAnalysis:
+    """Everything the chatbot stages read from one message, computed once.
+
+    ``lowered`` is the lowercased, stripped message that the classifier, the
+    disease-phrase extraction and the FAQ scorer all used to recompute.
+    """
+
+    __slots__ = (
+        "text",
+        "lowered",
+        "tokens",
+        "term_set",
+        "long_terms",
+        "is_question",
+        "is_symptom_question",
+        "mentions_symptom",
+        "opens_question",
+        "first_person",
+        "intent",
+        "disease_phrase",
+    )
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.lowered = text.lower().strip()
+        self.tokens: List[str] = self.lowered.split()
+        self.term_set: FrozenSet[str] = frozenset(self.tokens)
+        self.long_terms: List[str] = [
+            term for term in ALPHA_TERM_PATTERN.findall(self.lowered) if len(term) >= LONG_TERM_MIN_LENGTH
+        ]
+        self.is_question = _QUESTION_RE.search(self.lowered) is not None
+        self.is_symptom_question = _SYMPTOM_QUESTION_RE.search(self.lowered) is not None
+        self.mentions_symptom = "symptom" in self.lowered or "sign" in self.lowered
+        self.opens_question = bool(self.tokens) and self.tokens[0] in QUESTION_OPENERS
+        self.first_person = FIRST_PERSON_PATTERN.search(self.lowered) is not None
+        self.intent = self._classify()
+
+        match = DISEASE_PHRASE_PATTERN.search(self.lowered)
+        self.disease_phrase: Optional[str] = match.group(1).strip() if match else None
+
+    def _classify(self) -> str:
+        if not self.text:
+            return "question"
+        word_count = len(self.tokens)
+        if "?" in self.text or self.is_question:
+            return "question"
+        if "," in self.text and word_count <= 5:
+            return "symptoms"
+        if word_count <= 3:
+            return "disease"
+        return "question"
+
+    @property
+    def symptom_terms(self) -> List[str]:
+        """The comma-separated parts of a symptom list, stripped."""
+
+        return [symptom.strip() for symptom in self.text.split(",")]
+
+
+__all__ = ["QueryAnalysis", "SYMPTOM_QUESTION_PATTERNS"]
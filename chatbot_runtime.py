@@ -0,0 +1,169 @@
+"""Bounded, deadline-aware execution of chatbot work off the request thread."""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+WORKERS_ENV_VAR = "CUREHELP_CHAT_WORKERS"
+QUEUE_DEPTH_ENV_VAR = "CUREHELP_CHAT_QUEUE_DEPTH"
+TIMEOUT_ENV_VAR = "CUREHELP_CHAT_TIMEOUT"
+BATCH_TIMEOUT_ENV_VAR = "CUREHELP_CHAT_BATCH_TIMEOUT"
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_DEPTH = 32
+DEFAULT_TIMEOUT_SECONDS = 5.0
+DEFAULT_BATCH_TIMEOUT_SECONDS = 30.0
+QUEUE_WAIT_SAMPLES = 1024
+
+
+class ChatUnavailableError(RuntimeError):
+    """The chatbot could not answer in time; the caller should retry later."""
+
+
+class ChatBusyError(ChatUnavailableError):
+    """Every worker is busy and the queue is full."""
+
+
+class ChatTimeoutError(ChatUnavailableError):
+    """The request's deadline passed before its answer was ready."""
+
+
+class ChatExecutor:
+    """Fixed pool of chatbot worker threads in front of a bounded queue.
+
+    At most ``workers + queue_depth`` calls are admitted at once; further
+    calls fail fast with :class:`ChatBusyError`. Each admitted call waits at
+    most its deadline for a result and then raises :class:`ChatTimeoutError`.
+    A call that already started keeps its worker until it finishes, since
+    Python threads cannot be interrupted, but it no longer holds the request
+    thread; a call still queued at its deadline is cancelled.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        queue_depth: int = DEFAULT_QUEUE_DEPTH,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        batch_timeout_seconds: float = DEFAULT_BATCH_TIMEOUT_SECONDS,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.timeout_seconds = timeout_seconds
+        self.batch_timeout_seconds = batch_timeout_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+        self._stats_lock = threading.Lock()
+        self._queue_waits: Deque[float] = deque(maxlen=QUEUE_WAIT_SAMPLES)
+        self._in_flight = 0
+        self._started = 0
+        self.submitted = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ChatExecutor":
+        return cls(
+            workers=int(os.environ.get(WORKERS_ENV_VAR, DEFAULT_WORKERS)),
+            queue_depth=int(os.environ.get(QUEUE_DEPTH_ENV_VAR, DEFAULT_QUEUE_DEPTH)),
+            timeout_seconds=float(os.environ.get(TIMEOUT_ENV_VAR, DEFAULT_TIMEOUT_SECONDS)),
+            batch_timeout_seconds=float(os.environ.get(BATCH_TIMEOUT_ENV_VAR, DEFAULT_BATCH_TIMEOUT_SECONDS)),
+        )
+
+    def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """Run ``func(*args)`` on the pool and return its result within ``timeout``."""
+
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise ChatBusyError("The assistant is busy right now. Please try again in a moment.")
+
+        enqueued_at = time.perf_counter()
+
+        def task() -> Any:
+            self._record_queue_wait(time.perf_counter() - enqueued_at)
+            return func(*args)
+
+        try:
+            future = self._pool().submit(task)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._stats_lock:
+            self.submitted += 1
+            self._in_flight += 1
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(timeout=self.timeout_seconds if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._stats_lock:
+                self.timeouts += 1
+            raise ChatTimeoutError("The assistant took too long to answer. Please try again.") from None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            waits = sorted(self._queue_waits)
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "timeout_seconds": self.timeout_seconds,
+                "batch_timeout_seconds": self.batch_timeout_seconds,
+                "in_flight": self._in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "queue_wait_ms": {
+                    "mean": round(self.queue_wait_total / self._started * 1000, 3) if self._started else 0.0,
+                    "max": round(self.queue_wait_max * 1000, 3),
+                    "p50": round(_percentile(waits, 0.50) * 1000, 3),
+                    "p95": round(_percentile(waits, 0.95) * 1000, 3),
+                },
+            }
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use so a pre-forking server never forks live threads.
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="chatbot")
+        return self._executor
+
+    def _record_queue_wait(self, seconds: float) -> None:
+        with self._stats_lock:
+            self._queue_waits.append(seconds)
+            self._started += 1
+            self.queue_wait_total += seconds
+            self.queue_wait_max = max(self.queue_wait_max, seconds)
+
+    def _release(self, future: "Future[Any]") -> None:
+        self._slots.release()
+        with self._stats_lock:
+            self._in_flight -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+__all__ = ["ChatBusyError", "ChatExecutor", "ChatTimeoutError", "ChatUnavailableError"]
@@ -0,0 +1,269 @@
+"""Server-side state for multi-turn symptom conversations.
+
+A session remembers the symptoms a user confirmed or denied across chat
+messages, together with every disease row's running score, so each new
+symptom costs one sparse column add instead of re-scoring the whole
+query. Sessions expire after ``CUREHELP_CHAT_SESSION_TTL`` idle seconds
+(default 1800). The store holds at most ``CUREHELP_CHAT_SESSIONS``
+sessions (default 10000) and ``CUREHELP_CHAT_SESSION_BYTES`` of score
+arrays (default 64 MiB), dropping the least recently used first.
+
+Sessions live in the memory of the process that created them, like the
+response cache. Behind several gunicorn workers a message that reaches
+another worker starts a new session, so route each client to one worker
+(or run one worker with more threads) when sessions matter.
+"""
+from __future__ import annotations
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chatbot_index import SymptomMatrix, alias_key
+
+SESSION_TTL_ENV_VAR = "CUREHELP_CHAT_SESSION_TTL"
+SESSION_LIMIT_ENV_VAR = "CUREHELP_CHAT_SESSIONS"
+SESSION_BYTES_ENV_VAR = "CUREHELP_CHAT_SESSION_BYTES"
+
+DEFAULT_IDLE_SECONDS = 1800.0
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Confirmed and denied symptoms kept per session; past it the oldest goes.
+MAX_SESSION_SYMPTOMS = 32
+
+AFFIRMATIVE_ANSWERS = frozenset({"yes", "y", "yeah", "yep", "yup", "i do", "yes i do", "yes i have", "correct"})
+NEGATIVE_ANSWERS = frozenset({"no", "n", "nope", "nah", "i dont", "no i dont", "no i havent", "not really"})
+
+
+def parse_answer(text: str) -> Optional[bool]:
+    """``True``/``False`` for a plain yes/no reply, ``None`` for anything else."""
+
+    key = alias_key(text)
+    if key in AFFIRMATIVE_ANSWERS:
+        return True
+    if key in NEGATIVE_ANSWERS:
+        return False
+    return None
+
+
+class SymptomSession:
+    """Symptoms gathered over one conversation and the scores they give each row.
+
+    ``totals`` is every row's dot product with the confirmed symptoms, so
+    confirming one more is :meth:`SymptomMatrix.add_symptom`. Denying one
+    bumps a counter on the rows listing it, and those rows drop out of
+    :meth:`weights`, as with :meth:`SymptomMatrix.candidate_weights`.
+    Removing a symptom (over the cap, or when the user changes their
+    answer) recomputes ``totals`` from scratch. ``asked`` is the follow-up
+    symptom the last reply asked about, which a plain yes or no answers.
+    Callers hold ``lock`` while reading or changing a session.
+    """
+
+    __slots__ = ("matrix", "confirmed", "ruled_out", "asked", "totals", "_excluded", "lock")
+
+    def __init__(self, matrix: SymptomMatrix) -> None:
+        self.matrix = matrix
+        self.confirmed: List[int] = []
+        self.ruled_out: List[int] = []
+        self.asked: Optional[int] = None
+        self.totals = np.zeros(matrix.shape[0])
+        self._excluded = np.zeros(matrix.shape[0], dtype=np.uint8)
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.totals.nbytes + self._excluded.nbytes
+
+    def confirm(self, columns: Sequence[int]) -> None:
+        for column in columns:
+            if column in self.confirmed:
+                continue
+            if column in self.ruled_out:
+                self.ruled_out.remove(column)
+                self._excluded[self.matrix.rows_listing(column)] -= 1
+            self.confirmed.append(column)
+            self.matrix.add_symptom(self.totals, column)
+        if len(self.confirmed) > MAX_SESSION_SYMPTOMS:
+            del self.confirmed[:-MAX_SESSION_SYMPTOMS]
+            self._rescore()
+
+    def rule_out(self, columns: Sequence[int]) -> None:
+        changed = False
+        for column in columns:
+            if column in self.ruled_out:
+                continue
+            if column in self.confirmed:
+                self.confirmed.remove(column)
+                changed = True
+            self.ruled_out.append(column)
+            self._excluded[self.matrix.rows_listing(column)] += 1
+        if len(self.ruled_out) > MAX_SESSION_SYMPTOMS:
+            for column in self.ruled_out[:-MAX_SESSION_SYMPTOMS]:
+                self._excluded[self.matrix.rows_listing(column)] -= 1
+            del self.ruled_out[:-MAX_SESSION_SYMPTOMS]
+        if changed:
+            self._rescore()
+
+    def weights(self) -> np.ndarray:
+        """Cosine score of every row with the confirmed symptoms, zero where one was denied."""
+
+        if not self.confirmed:
+            return np.zeros_like(self.totals)
+        weights = self.totals / np.sqrt(len(self.confirmed))
+        weights[self._excluded > 0] = 0.0
+        return weights
+
+    def rebase(self, matrix: SymptomMatrix) -> None:
+        """Carry the session over to an updated matrix, matching symptoms by name."""
+
+        names = [self.matrix.symptoms[column] for column in self.confirmed]
+        denied = [self.matrix.symptoms[column] for column in self.ruled_out]
+        asked = self.matrix.symptoms[self.asked] if self.asked is not None else None
+        self.matrix = matrix
+        self.confirmed, self.ruled_out = [], []
+        self.totals = np.zeros(matrix.shape[0])
+        self._excluded = np.zeros(matrix.shape[0], dtype=np.uint8)
+        self.rule_out(_columns(matrix, denied))
+        self.confirm(_columns(matrix, names))
+        self.asked = matrix.column(asked) if asked is not None else None
+
+    def _rescore(self) -> None:
+        self.totals = np.zeros(self.matrix.shape[0])
+        for column in self.confirmed:
+            self.matrix.add_symptom(self.totals, column)
+
+
+def _columns(matrix: SymptomMatrix, names: Sequence[str]) -> List[int]:
+    columns = (matrix.column(name) for name in names)
+    return [column for column in columns if column is not None]
+
+
+class SessionStore:
+    """Thread-safe LRU map of session id to :class:`SymptomSession` with idle expiry.
+
+    Ids are random tokens issued by :meth:`open`; an unknown or expired id
+    gets a fresh session under a new id rather than the one asked for.
+    ``max_sessions=0`` disables sessions: every call gets a new one that
+    is not kept.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Tuple[float, int, SymptomSession]]" = OrderedDict()
+        self._bytes = 0
+        self.created = 0
+        self.resumed = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            max_sessions=int(os.environ.get(SESSION_LIMIT_ENV_VAR, DEFAULT_MAX_SESSIONS)),
+            idle_seconds=float(os.environ.get(SESSION_TTL_ENV_VAR, DEFAULT_IDLE_SECONDS)),
+            max_bytes=int(os.environ.get(SESSION_BYTES_ENV_VAR, DEFAULT_MAX_BYTES)),
+        )
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def open(self, session_id: Optional[str], factory: Callable[[], SymptomSession]) -> Tuple[str, SymptomSession]:
+        """The live session under ``session_id``, or a new one from ``factory`` with its new id."""
+
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            entry = self._sessions.get(session_id or "")
+            if session_id and entry is not None:
+                _, size, session = entry
+                self._sessions[session_id] = (now, size, session)
+                self._sessions.move_to_end(session_id)
+                self.resumed += 1
+                return session_id, session
+
+        session = factory()
+        session_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self.created += 1
+            if self.max_sessions > 0 and session.nbytes <= self.max_bytes:
+                self._sessions[session_id] = (self._clock(), session.nbytes, session)
+                self._bytes += session.nbytes
+                while len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+                    oldest = next(iter(self._sessions))
+                    self._remove(oldest)
+                    self.evictions += 1
+        return session_id, session
+
+    def resize(self, session_id: str) -> None:
+        """Re-account a session whose arrays changed size (after :meth:`SymptomSession.rebase`)."""
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._bytes += entry[2].nbytes - entry[1]
+                self._sessions[session_id] = (entry[0], entry[2].nbytes, entry[2])
+
+    def discard(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "bytes": self._bytes,
+                "created": self.created,
+                "resumed": self.resumed,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "idle_seconds": self.idle_seconds,
+            }
+
+    def _expire(self, now: float) -> None:
+        # Entries are kept in last-use order, so the idle ones are at the front.
+        while self._sessions:
+            session_id, (last_used, _, _) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_seconds:
+                break
+            self._remove(session_id)
+            self.expirations += 1
+
+    def _remove(self, session_id: str) -> None:
+        _, size, _ = self._sessions.pop(session_id)
+        self._bytes -= size
+
+
+__all__ = [
+    "MAX_SESSION_SYMPTOMS",
+    "SESSION_BYTES_ENV_VAR",
+    "SESSION_LIMIT_ENV_VAR",
+    "SESSION_TTL_ENV_VAR",
+    "SessionStore",
+    "SymptomSession",
+    "parse_answer",
+]
@@ -0,0 +1,224 @@
+"""Runtime additions, edits and removals for the chatbot knowledge base.
+
+An update is a small JSON object, one of::
+
+    {"op": "put_qa", "question": "...", "answer": "..."}
+    {"op": "remove_qa", "question": "..."}
+    {"op": "put_disease", "name": "...", "symptoms": [...], "precautions": [...], "description": "..."}
+    {"op": "remove_disease", "name": "..."}
+
+Questions are compared on their words, ignoring case, spacing and order:
+``put_qa`` replaces the answer of a matching question or adds a new one,
+and ``remove_qa`` removes every matching question. ``put_disease`` adds a
+disease or replaces the fields it is given; omitted fields keep their
+current value.
+
+The app applies updates through ``POST /api/admin/kb``. When
+``CUREHELP_KB_UPDATE_LOG`` names a file, every accepted update is first
+appended to it (one JSON object per line) and the log is replayed whenever
+the knowledge base is built, so updates survive restarts. Workers of a
+pre-forking server also pick up lines appended by their siblings.
+
+From a shell::
+
+    python -m chatbot_updates add-qa "What is X?" "X is ..." --log kb_updates.jsonl
+    python -m chatbot_updates remove-disease Malaria --url http://127.0.0.1:5000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+UPDATE_LOG_ENV_VAR = "CUREHELP_KB_UPDATE_LOG"
+ADMIN_TOKEN_ENV_VAR = "CUREHELP_ADMIN_TOKEN"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+OPERATIONS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    # op: (required text fields, optional fields)
+    "put_qa": (("question", "answer"), ()),
+    "remove_qa": (("question",), ()),
+    "put_disease": (("name",), ("symptoms", "precautions", "description")),
+    "remove_disease": (("name",), ()),
+}
+LIST_FIELDS = ("symptoms", "precautions")
+
+
+class UpdateError(ValueError):
+    """Raised for an update that is malformed or names an unknown operation."""
+
+
+def validate_update(update: Any) -> Dict[str, Any]:
+    """Check ``update`` and return it with text fields stripped and unknown keys dropped."""
+
+    if not isinstance(update, Mapping):
+        raise UpdateError("An update must be a JSON object")
+    op = update.get("op")
+    if op not in OPERATIONS:
+        raise UpdateError(f"Unknown update op {op!r}; expected one of {', '.join(OPERATIONS)}")
+
+    required, optional = OPERATIONS[op]
+    cleaned: Dict[str, Any] = {"op": op}
+    for field in required:
+        value = update.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise UpdateError(f"{op} needs a non-empty '{field}' string")
+        cleaned[field] = value.strip()
+    for field in optional:
+        value = update.get(field)
+        if value is None:
+            continue
+        if field in LIST_FIELDS:
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise UpdateError(f"'{field}' must be a list of strings")
+            cleaned[field] = [item.strip() for item in value if item.strip()]
+        elif not isinstance(value, str):
+            raise UpdateError(f"'{field}' must be a string")
+        else:
+            cleaned[field] = value.strip()
+    return cleaned
+
+
+class UpdateLog:
+    """Append-only JSON-lines file of accepted updates.
+
+    Each update is written with a single ``O_APPEND`` write and fsynced, so
+    concurrent writers never interleave lines and an acknowledged update is
+    on disk. Readers only consume complete lines: a line still being written
+    (or torn by a crash) is left for the next read.
+    """
+
+    def __init__(self, path: os.PathLike) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["UpdateLog"]:
+        path = os.environ.get(UPDATE_LOG_ENV_VAR)
+        return cls(path) if path else None
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, update: Mapping[str, Any]) -> int:
+        """Write ``update`` as one line; returns the file offset just past it."""
+
+        line = (json.dumps(update, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+                return os.lseek(fd, 0, os.SEEK_CUR)
+            finally:
+                os.close(fd)
+
+    def read(self, offset: int = 0) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """Updates after byte ``offset`` as ``(end offset, update)`` pairs, plus the new offset.
+
+        Malformed lines are logged and skipped.
+        """
+
+        try:
+            with open(self.path, "rb") as fh:
+                fh.seek(offset)
+                data = fh.read()
+        except FileNotFoundError:
+            return [], offset
+
+        complete = data.rfind(b"\n") + 1
+        updates: List[Tuple[int, Dict[str, Any]]] = []
+        position = offset
+        for line in data[:complete].splitlines(keepends=True):
+            position += len(line)
+            if not line.strip():
+                continue
+            try:
+                updates.append((position, validate_update(json.loads(line))))
+            except (ValueError, UnicodeDecodeError) as exc:
+                logger.warning("Skipping bad line in knowledge-base update log %s at byte %d: %s", self.path, position - len(line), exc)
+        return updates, offset + complete
+
+
+def _post(url: str, token: Optional[str], update: Mapping[str, Any]) -> Dict[str, Any]:
+    request = urllib.request.Request(
+        url.rstrip("/") + "/api/admin/kb",
+        data=json.dumps(update).encode("utf-8"),
+        headers={"Content-Type": "application/json", ADMIN_TOKEN_HEADER: token or ""},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        raise SystemExit(f"Server rejected the update ({exc.code}): {exc.read().decode('utf-8', 'replace')}") from exc
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m chatbot_updates", description="Update the chatbot knowledge base.")
+    parser.add_argument("--log", default=os.environ.get(UPDATE_LOG_ENV_VAR), help="update log to append to")
+    parser.add_argument("--url", help="also apply the update to the app running at this URL")
+    parser.add_argument("--token", default=os.environ.get(ADMIN_TOKEN_ENV_VAR), help="admin token for --url")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_qa = commands.add_parser("add-qa", help="Add a QA entry or replace its answer.")
+    add_qa.add_argument("question")
+    add_qa.add_argument("answer")
+    remove_qa = commands.add_parser("remove-qa", help="Remove every QA entry with this question.")
+    remove_qa.add_argument("question")
+    add_disease = commands.add_parser("add-disease", help="Add a disease or replace the given fields.")
+    add_disease.add_argument("name")
+    add_disease.add_argument("--symptom", dest="symptoms", action="append")
+    add_disease.add_argument("--precaution", dest="precautions", action="append")
+    add_disease.add_argument("--description")
+    remove_disease = commands.add_parser("remove-disease", help="Remove a disease.")
+    remove_disease.add_argument("name")
+    args = parser.parse_args(argv)
+
+    if args.command in ("add-qa", "remove-qa"):
+        update: Dict[str, Any] = {"op": "put_qa" if args.command == "add-qa" else "remove_qa", "question": args.question}
+        if args.command == "add-qa":
+            update["answer"] = args.answer
+    else:
+        update = {"op": "put_disease" if args.command == "add-disease" else "remove_disease", "name": args.name}
+        if args.command == "add-disease":
+            update.update(symptoms=args.symptoms, precautions=args.precautions, description=args.description)
+    try:
+        update = validate_update(update)
+    except UpdateError as exc:
+        parser.error(str(exc))
+
+    if args.url:
+        # The server appends to its own log (if it has one) before applying.
+        print(json.dumps(_post(args.url, args.token, update)))
+    elif args.log:
+        UpdateLog(args.log).append(update)
+        print(f"Appended {update['op']} to {args.log}; running workers apply it on their next request")
+    else:
+        parser.error(f"give --log (or set {UPDATE_LOG_ENV_VAR}) or --url")
+    return 0
+
+
+__all__ = [
+    "ADMIN_TOKEN_ENV_VAR",
+    "ADMIN_TOKEN_HEADER",
+    "OPERATIONS",
+    "UPDATE_LOG_ENV_VAR",
+    "UpdateError",
+    "UpdateLog",
+    "validate_update",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
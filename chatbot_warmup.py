@@ -0,0 +1,146 @@
+"""Query logging and a precomputed chat response cache for warm restarts.
+
+When ``CUREHELP_CHAT_QUERY_LOG`` names a file, ``/api/chat`` appends every
+message to it as one ``ranker<TAB>normalised message`` line. Only the
+normalised text is kept: no user, session or time.
+
+From those logs, ``build`` answers the most frequent queries and writes
+them to a warm-cache file::
+
+    python -m chatbot_warmup build --log chat_queries.log --output chat_warm_cache.json --top 1000
+
+When ``CUREHELP_CHAT_WARM_CACHE`` names that file, each worker fills its
+response cache from it when it builds the knowledge base. The file records
+the content hash of the datasets and the update-log offset it was built
+against. It is ignored once either differs, since its replies may then be
+stale. Warm entries expire like any other cache entry.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from chatbot_cache import normalise_message
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_ENV_VAR = "CUREHELP_CHAT_QUERY_LOG"
+WARM_CACHE_ENV_VAR = "CUREHELP_CHAT_WARM_CACHE"
+WARM_CACHE_SCHEMA = 1
+DEFAULT_TOP_QUERIES = 1000
+
+
+class QueryLog:
+    """Append-only log of normalised chat messages, one per line."""
+
+    def __init__(self, path: os.PathLike) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["QueryLog"]:
+        path = os.environ.get(QUERY_LOG_ENV_VAR)
+        return cls(path) if path else None
+
+    def record(self, message: str, ranker: str) -> None:
+        """Append one query; a failed write is logged, never raised to the request."""
+
+        # Normalising collapses tabs and newlines, so a line is one query.
+        line = f"{ranker}\t{normalise_message(message)}\n"
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line)
+        except OSError as exc:
+            logger.warning("Could not write chat query log %s: %s", self.path, exc)
+
+
+def most_frequent_queries(paths: Iterable[os.PathLike], top: int = DEFAULT_TOP_QUERIES) -> List[Tuple[str, str, int]]:
+    """The ``top`` most frequent ``(ranker, message, count)`` across query logs, most frequent first."""
+
+    counts: Counter = Counter()
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as fh:
+            for line in fh:
+                ranker, separator, message = line.rstrip("\n").partition("\t")
+                if separator and message:
+                    counts[(ranker, message)] += 1
+    return [(ranker, message, count) for (ranker, message), count in counts.most_common(top)]
+
+
+def write_warm_cache(
+    path: os.PathLike, content_hash: Optional[str], update_offset: int, entries: Sequence[Mapping[str, Any]]
+) -> Path:
+    """Write ``entries`` (``ranker``, ``message``, ``analysis``) atomically to ``path``."""
+
+    path = Path(path)
+    document = {
+        "schema": WARM_CACHE_SCHEMA,
+        "content_hash": content_hash,
+        "update_offset": update_offset,
+        "entries": list(entries),
+    }
+    partial = path.with_name(path.name + ".tmp")
+    partial.write_text(json.dumps(document, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(partial, path)
+    return path
+
+
+def read_warm_cache(path: os.PathLike, content_hash: Optional[str], update_offset: int) -> Optional[List[Dict[str, Any]]]:
+    """Entries of the warm cache at ``path``, or ``None`` if it is missing, unreadable or stale."""
+
+    try:
+        document = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(document, dict)
+        or document.get("schema") != WARM_CACHE_SCHEMA
+        or document.get("content_hash") != content_hash
+        or document.get("update_offset") != update_offset
+    ):
+        return None
+    return [entry for entry in document.get("entries", []) if isinstance(entry, dict)]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m chatbot_warmup", description="Chat warm-cache tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Precompute replies to the most frequent logged queries.")
+    build.add_argument("--log", dest="logs", action="append", required=True, help="query log (repeatable)")
+    build.add_argument("--output", default=os.environ.get(WARM_CACHE_ENV_VAR, "chat_warm_cache.json"))
+    build.add_argument("--top", type=int, default=DEFAULT_TOP_QUERIES)
+    top = commands.add_parser("top", help="Print the most frequent logged queries.")
+    top.add_argument("--log", dest="logs", action="append", required=True, help="query log (repeatable)")
+    top.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "top":
+        for ranker, message, count in most_frequent_queries(args.logs, args.top):
+            print(f"{count:>8}  {ranker:<8} {message}")
+        return 0
+
+    from chatbot import build_warm_cache
+
+    path, written = build_warm_cache(args.logs, args.output, args.top)
+    print(f"Wrote {written} replies to {path} ({path.stat().st_size / 1024:.1f} KiB)")
+    return 0
+
+
+__all__ = [
+    "QUERY_LOG_ENV_VAR",
+    "QueryLog",
+    "WARM_CACHE_ENV_VAR",
+    "most_frequent_queries",
+    "read_warm_cache",
+    "write_warm_cache",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,25 @@
+"""Gunicorn settings for serving CureHelp+ with pre-forked workers.
+
+``gunicorn -c gunicorn.conf.py app:app`` imports the app and builds the
+chatbot knowledge base once in the master process, then forks the workers,
+which share those pages copy-on-write instead of each loading the datasets.
+Set ``CUREHELP_PRELOAD_CHATBOT=0`` to load lazily in every worker instead.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+preload_app = True
+
+
+def when_ready(server):
+    if os.environ.get("CUREHELP_PRELOAD_CHATBOT", "1") != "0":
+        from chatbot import preload_knowledge_base
+
+        preload_knowledge_base()
+    # Move everything loaded so far out of the collector's reach: collections
+    # in the workers would otherwise write to (and un-share) those pages.
+    gc.freeze()
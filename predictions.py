@@ -0,0 +1,312 @@
+"""Feature parsing and vectorised model calls for the four risk predictors.
+
+Each disease has a parser that turns one JSON record into its model feature
+row and the inputs shown back to the user (raising ``ValueError`` on a
+missing or invalid field), and a scorer that rates any number of rows
+with one scaler call and one call per model. The single-patient routes
+score a one-row batch; :func:`predict_records` serves ``/api/<disease>/batch``.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Features = List[Any]
+Parser = Callable[[Dict[str, Any]], Tuple[Features, Dict[str, Any]]]
+Scorer = Callable[[Dict[str, Any], Sequence[Features]], List[Dict[str, Any]]]
+
+DIABETES_INPUT_LABELS = {
+    "gender": "Gender",
+    "age": "Age",
+    "bmi": "BMI",
+    "glucose": "Glucose",
+    "blood_pressure": "Blood Pressure",
+    "pregnancies": "Pregnancies",
+    "skin_thickness": "Skin Thickness",
+    "insulin": "Insulin",
+    "diabetes_pedigree_function": "Diabetes Pedigree Function",
+}
+
+HEART_INPUT_LABELS = {
+    "gender": "Sex",
+    "age": "Age",
+    "resting_bp": "Resting BP",
+    "cholesterol": "Cholesterol",
+    "chest_pain_type": "Chest Pain Type",
+    "fasting_bs": "Fasting BS > 120?",
+    "resting_ecg": "Resting ECG",
+    "max_heart_rate": "Max Heart Rate",
+    "exercise_angina": "Exercise Angina",
+    "st_depression": "ST Depression",
+    "slope": "Slope of ST",
+    "major_vessels": "Major Vessels (ca)",
+    "thal": "Thal",
+}
+
+FEVER_NUMERIC_FIELDS = {
+    "temperature": "Temperature (C)",
+    "age": "Age",
+    "bmi": "BMI",
+    "humidity": "Humidity (%)",
+    "air_quality": "Air Quality Index",
+    "heart_rate": "Heart Rate",
+}
+
+FEVER_CATEGORICAL_ENCODERS = {
+    "gender": "Gender",
+    "headache": "Headache",
+    "body_ache": "Body_Ache",
+    "fatigue": "Fatigue",
+    "chronic_conditions": "Chronic_Conditions",
+    "allergies": "Allergies",
+    "smoking_history": "Smoking_History",
+    "alcohol_consumption": "Alcohol_Consumption",
+    "physical_activity": "Physical_Activity",
+    "diet_type": "Diet_Type",
+    "blood_pressure": "Blood_Pressure",
+    "previous_medication": "Previous_Medication",
+}
+
+ANEMIA_FEATURES = (
+    "rbc",
+    "hemoglobin",
+    "mcv",
+    "mch",
+    "mchc",
+    "hematocrit",
+    "wbc",
+    "platelets",
+    "pdw",
+    "pct",
+    "lymphocytes",
+    "neutrophils_pct",
+    "neutrophils_num",
+)
+
+ANEMIA_INPUT_LABELS = {
+    "gender": "Gender",
+    "rbc": "RBC",
+    "hemoglobin": "Hemoglobin (Hb)",
+    "hematocrit": "Hematocrit (HCT)",
+    "mcv": "MCV",
+    "mch": "MCH",
+    "mchc": "MCHC",
+    "wbc": "WBC",
+    "platelets": "Platelets",
+    "rdw": "RDW",
+    "pdw": "PDW",
+    "pct": "PCT",
+    "lymphocytes": "Lymphocytes",
+    "neutrophils_pct": "Neutrophils %",
+    "neutrophils_num": "Neutrophils #",
+}
+
+
+def _convert_to_float(payload: Dict[str, Any], key: str) -> float:
+    if key not in payload:
+        raise ValueError(f"Missing field: {key}")
+    try:
+        value = float(payload[key])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value for {key}")
+    # "inf" and "nan" parse as floats but make the scaler reject the whole batch.
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid value for {key}")
+    return value
+
+
+def _map_display_inputs(payload: Dict[str, Any], mapping: Dict[str, str]) -> Dict[str, Any]:
+    return {friendly: payload.get(raw) for raw, friendly in mapping.items() if raw in payload}
+
+
+def _leading_code(value: str) -> int:
+    return int(value.split(" ")[0]) if " " in value else int(value)
+
+
+def _yes(value: Any) -> int:
+    return 1 if str(value).lower() in {"yes", "1", "true"} else 0
+
+
+def parse_diabetes(data: Dict[str, Any]) -> Tuple[Features, Dict[str, Any]]:
+    gender = data.get("gender", "Female")
+    pregnancies = _convert_to_float(data, "pregnancies") if str(gender).lower() == "female" else 0.0
+    features = [
+        pregnancies,
+        _convert_to_float(data, "glucose"),
+        _convert_to_float(data, "blood_pressure"),
+        _convert_to_float(data, "skin_thickness"),
+        _convert_to_float(data, "insulin"),
+        _convert_to_float(data, "bmi"),
+        _convert_to_float(data, "diabetes_pedigree_function"),
+        _convert_to_float(data, "age"),
+    ]
+    return features, _map_display_inputs({**data, **{"pregnancies": pregnancies}}, DIABETES_INPUT_LABELS)
+
+
+def parse_heart(data: Dict[str, Any]) -> Tuple[Features, Dict[str, Any]]:
+    gender = data.get("gender", "Male")
+    codes = {
+        "Sex": 1 if str(gender).lower() == "male" else 0,
+        "Chest Pain Type": _leading_code(str(data.get("chest_pain_type", "1"))),
+        "Fasting BS > 120?": _yes(data.get("fasting_bs", "No")),
+        "Exercise Angina": _yes(data.get("exercise_angina", "No")),
+        "Slope of ST": _leading_code(str(data.get("slope", "1"))),
+        "Thal": _leading_code(str(data.get("thal", "3"))),
+    }
+    restecg_code = _leading_code(str(data.get("resting_ecg", "0")))
+    features = [
+        _convert_to_float(data, "age"),
+        codes["Sex"],
+        codes["Chest Pain Type"],
+        _convert_to_float(data, "resting_bp"),
+        _convert_to_float(data, "cholesterol"),
+        codes["Fasting BS > 120?"],
+        restecg_code,
+        _convert_to_float(data, "max_heart_rate"),
+        codes["Exercise Angina"],
+        _convert_to_float(data, "st_depression"),
+        codes["Slope of ST"],
+        _convert_to_float(data, "major_vessels"),
+        codes["Thal"],
+    ]
+    display_inputs = _map_display_inputs({**data, **{"gender": gender}}, HEART_INPUT_LABELS)
+    display_inputs.update(codes)
+    return features, display_inputs
+
+
+def parse_fever(data: Dict[str, Any]) -> Tuple[Features, Dict[str, Any]]:
+    """Six numeric readings followed by the raw categorical answers, encoded in :func:`score_fever`."""
+
+    numeric_inputs = {label: _convert_to_float(data, key) for key, label in FEVER_NUMERIC_FIELDS.items()}
+    categorical = []
+    categorical_display: Dict[str, Any] = {}
+    for key, encoder_name in FEVER_CATEGORICAL_ENCODERS.items():
+        value = data.get(key)
+        if value is None:
+            raise ValueError(f"Missing field: {key}")
+        if isinstance(value, (list, dict)):
+            raise ValueError(f"Invalid value for {key}")
+        categorical.append(value)
+        categorical_display[encoder_name.replace("_", " ")] = value
+    return [*numeric_inputs.values(), *categorical], {**numeric_inputs, **categorical_display}
+
+
+def parse_anemia(data: Dict[str, Any]) -> Tuple[Features, Dict[str, Any]]:
+    return [_convert_to_float(data, key) for key in ANEMIA_FEATURES], _map_display_inputs(data, ANEMIA_INPUT_LABELS)
+
+
+def score_diabetes(models: Dict[str, Any], rows: Sequence[Features]) -> List[Dict[str, Any]]:
+    scaled = models["diabetes_scaler"].transform(np.asarray(rows, dtype=np.float64))
+    probabilities = models["diabetes_model"].predict_proba(scaled)[:, 1] * 100
+    return [{"probability": float(probability)} for probability in probabilities]
+
+
+def score_heart(models: Dict[str, Any], rows: Sequence[Features]) -> List[Dict[str, Any]]:
+    scaled = models["heart_scaler"].transform(np.asarray(rows, dtype=np.float64))
+    probabilities = models["heart_model"].predict_proba(scaled)[:, 1] * 100
+    return [{"probability": float(probability)} for probability in probabilities]
+
+
+def score_fever(models: Dict[str, Any], rows: Sequence[Features]) -> List[Dict[str, Any]]:
+    """Raises ``KeyError`` when a categorical field has no fitted encoder."""
+
+    numeric_count = len(FEVER_NUMERIC_FIELDS)
+    numeric_scaled = models["fever_scaler"].transform(
+        np.asarray([row[:numeric_count] for row in rows], dtype=np.float64)
+    )
+    encoded = np.empty((len(rows), len(FEVER_CATEGORICAL_ENCODERS)))
+    for position, encoder_name in enumerate(FEVER_CATEGORICAL_ENCODERS.values()):
+        encoder = models["fever_le_dict"][encoder_name]
+        # One encoder call per column: look up every known class's code, and
+        # send unknown answers to the first class as the form always has.
+        classes = list(encoder.classes_)
+        codes = dict(zip(classes, encoder.transform(classes)))
+        fallback = codes[classes[0]]
+        encoded[:, position] = [codes.get(row[numeric_count + position], fallback) for row in rows]
+
+    final_input = np.hstack([numeric_scaled, encoded])
+    severity_codes = models["fever_severity_model"].predict(final_input).astype(int)
+    severities = models["fever_target_le"].inverse_transform(severity_codes)
+    risks = np.clip(models["fever_risk_model"].predict(final_input), 0, 100)
+    return [
+        {"probability": float(risk), "severity": severity} for risk, severity in zip(risks, severities)
+    ]
+
+
+def _anemia_type(models: Dict[str, Any], scaled: np.ndarray, mcv: float) -> str:
+    try:
+        type_pred = models["anemia_type_model"].predict(scaled)[0]
+        return models["anemia_label_encoder"].inverse_transform([type_pred])[0]
+    except Exception:
+        return "Microcytic" if mcv < 80 else ("Normocytic" if mcv <= 100 else "Macrocytic")
+
+
+def score_anemia(models: Dict[str, Any], rows: Sequence[Features]) -> List[Dict[str, Any]]:
+    features = np.asarray(rows, dtype=np.float64)
+    scaled = models["anemia_scaler"].transform(features)
+    risks = models["anemia_risk_model"].predict_proba(scaled)[:, 1] * 100
+    try:
+        types = list(models["anemia_label_encoder"].inverse_transform(models["anemia_type_model"].predict(scaled)))
+    except Exception:
+        # Classify row by row so only the rows the type model cannot handle
+        # fall back to the MCV rule.
+        mcv = features[:, ANEMIA_FEATURES.index("mcv")]
+        types = [_anemia_type(models, scaled[row : row + 1], mcv[row]) for row in range(len(rows))]
+    return [{"probability": float(risk), "severity": kind} for risk, kind in zip(risks, types)]
+
+
+PREDICTORS: Dict[str, Tuple[str, Parser, Scorer]] = {
+    "diabetes": ("Diabetes", parse_diabetes, score_diabetes),
+    "heart": ("Heart Disease", parse_heart, score_heart),
+    "fever": ("Fever", parse_fever, score_fever),
+    "anemia": ("Anemia", parse_anemia, score_anemia),
+}
+
+
+def predict_records(disease: str, models: Dict[str, Any], records: Sequence[Any]) -> List[Dict[str, Any]]:
+    """One result per record, in order: the prediction and inputs, or the validation error.
+
+    Every valid record is scored in a single scorer call.
+    """
+
+    _, parse, predict = PREDICTORS[disease]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    valid: Dict[int, Dict[str, Any]] = {}
+    rows: List[Features] = []
+    for position, record in enumerate(records):
+        if not isinstance(record, dict):
+            results[position] = {"success": False, "error": "Record must be an object."}
+            continue
+        try:
+            features, display_inputs = parse(record)
+        except ValueError as exc:
+            results[position] = {"success": False, "error": str(exc)}
+            continue
+        valid[position] = display_inputs
+        rows.append(features)
+
+    for (position, display_inputs), prediction in zip(valid.items(), predict(models, rows) if rows else []):
+        results[position] = {"success": True, **prediction, "inputs": display_inputs}
+    return results
+
+
+__all__ = [
+    "ANEMIA_FEATURES",
+    "ANEMIA_INPUT_LABELS",
+    "DIABETES_INPUT_LABELS",
+    "FEVER_CATEGORICAL_ENCODERS",
+    "FEVER_NUMERIC_FIELDS",
+    "HEART_INPUT_LABELS",
+    "PREDICTORS",
+    "parse_anemia",
+    "parse_diabetes",
+    "parse_fever",
+    "parse_heart",
+    "predict_records",
+    "score_anemia",
+    "score_diabetes",
+    "score_fever",
+    "score_heart",
+]
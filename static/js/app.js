@@ -308,6 +308,7 @@ const anemiaForm = document.getElementById("anemia-form");
 const chatForm = document.getElementById("chat-form");
 const chatHistory = document.getElementById("chat-history");
 const chatInput = document.getElementById("chat-input");
+const chatSuggestions = document.getElementById("chat-suggestions");
 const chatbotLauncher = document.getElementById("chatbot-launcher");
 const chatbotModal = document.getElementById("chatbot-modal");
 const chatbotOverlay = document.getElementById("chatbot-overlay");
@@ -335,6 +336,7 @@ const state = {
   predictions: {},
   normals: {},
   chatHistory: [],
+  chatSessionId: null,
 };
 
 let pendingDeleteProfileId = null;
@@ -351,6 +353,8 @@ const diseaseTabLabels = {
 };
 let modalOpenCount = 0;
 let chatTypingIndicator = null;
+let chatSuggestTimer = null;
+let chatSuggestController = null;
 const REPORT_ALLOWED_EXTENSIONS = new Set([".csv", ".pdf", ".xls", ".xlsx"]);
 const REPORT_ALLOWED_MIME_TYPES = new Set([
   "text/csv",
@@ -1554,13 +1558,31 @@ function hideChatTyping() {
   chatTypingIndicator = null;
 }
 
+function formatChatAlternates(analysis) {
+  const alternates = (analysis.alternates || []).map((item) => `<li>${item.question}</li>`).join("");
+  return alternates ? `<br /><br /><strong>Did you mean</strong><ul>${alternates}</ul>` : "";
+}
+
+function formatChatFollowUp(analysis) {
+  const symptoms = (analysis.follow_up_symptoms || []).map((item) => item.symptom);
+  const gathered = analysis.session_symptoms?.length ? `<br /><br /><strong>Symptoms so far:</strong> ${analysis.session_symptoms.join(", ")}` : "";
+  if (!symptoms.length) return gathered;
+  const [next, ...others] = symptoms;
+  const alsoAsk = others.length ? ` Other symptoms worth checking: ${others.join(", ")}.` : "";
+  return `${gathered}<br /><br /><strong>To narrow it down, do you also have ${next}?</strong> Answer yes or no.${alsoAsk}`;
+}
+
 function formatChatAnalysis(analysis) {
   if (analysis.type === "question" && analysis.faq_answer) {
     return `
       <strong>FAQ Answer</strong><br />
       <strong>Q:</strong> ${analysis.faq_question}<br />
       <strong>A:</strong> ${analysis.faq_answer}
-    `;
+    ` + formatChatAlternates(analysis);
+  }
+
+  if (analysis.type === "question" && analysis.alternates?.length) {
+    return "I could not find a specific answer in the knowledge base." + formatChatAlternates(analysis);
   }
 
   if (analysis.type === "disease" || analysis.type === "symptoms") {
@@ -1584,12 +1606,41 @@ function formatChatAnalysis(analysis) {
       `;
     }
     const description = analysis.description ? `<strong>Description:</strong><br />${analysis.description}` : "";
-    return [disease, symptomsPrecautions, description].filter(Boolean).join("<br /><br />") || "I could not interpret that input.";
+    return ([disease, symptomsPrecautions, description].filter(Boolean).join("<br /><br />") || "I could not interpret that input.") + formatChatFollowUp(analysis);
   }
 
   return analysis.message || "I could not find a relevant answer. Please try rephrasing.";
 }
 
+function requestChatSuggestions() {
+  window.clearTimeout(chatSuggestTimer);
+  chatSuggestTimer = window.setTimeout(async () => {
+    const text = chatInput.value;
+    const current = text.split(",").pop().trim();
+    if (!chatSuggestions || current.length < 2) {
+      if (chatSuggestions) chatSuggestions.innerHTML = "";
+      return;
+    }
+    chatSuggestController?.abort();
+    chatSuggestController = new AbortController();
+    try {
+      const response = await fetch(`/api/chat/suggest?q=${encodeURIComponent(current)}`, { signal: chatSuggestController.signal });
+      const payload = await response.json();
+      if (!payload.success) return;
+      const head = text.includes(",") ? `${text.slice(0, text.lastIndexOf(",") + 1)} ` : "";
+      chatSuggestions.innerHTML = "";
+      payload.suggestions.forEach((item) => {
+        const option = document.createElement("option");
+        option.value = `${head}${item.text}`;
+        option.label = item.type;
+        chatSuggestions.appendChild(option);
+      });
+    } catch (error) {
+      if (error.name !== "AbortError") chatSuggestions.innerHTML = "";
+    }
+  }, 120);
+}
+
 async function submitChat(event) {
   event.preventDefault();
   const message = chatInput.value.trim();
@@ -1602,10 +1653,11 @@ async function submitChat(event) {
     const response = await fetch("/api/chat", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message }),
+      body: JSON.stringify({ message, session: true, session_id: state.chatSessionId }),
     });
     const payload = await response.json();
     if (!payload.success) throw new Error(payload.error || "Assistant unavailable.");
+    state.chatSessionId = payload.response?.session_id || null;
     const analysis = payload.response?.analysis || {};
     hideChatTyping();
     renderChatMessage("bot", formatChatAnalysis(analysis));
@@ -2054,6 +2106,10 @@ async function createProfile(event) {
 
 async function resetSession() {
   await fetch("/api/reset", { method: "POST" });
+  if (state.chatSessionId) {
+    fetch(`/api/chat/session/${encodeURIComponent(state.chatSessionId)}`, { method: "DELETE" });
+    state.chatSessionId = null;
+  }
   state.profile = null;
   state.predictions = {};
   patientForm.reset();
@@ -2230,6 +2286,7 @@ function bindEvents() {
   });
 
   chatForm?.addEventListener("submit", submitChat);
+  chatInput?.addEventListener("input", requestChatSuggestions);
   chatbotLauncher?.addEventListener("click", () => openChatbotModal());
   chatbotClose?.addEventListener("click", () => closeChatbotModal({ returnFocus: true }));
   chatbotOverlay?.addEventListener("click", () => closeChatbotModal({ returnFocus: true }));
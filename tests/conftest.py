@@ -20,7 +20,7 @@ class DummyProbModel:
         self.prob = prob
 
     def predict_proba(self, arr):
-        return np.array([[1 - self.prob, self.prob]])
+        return np.tile([1 - self.prob, self.prob], (len(arr), 1))
 
 
 class DummyPredictModel:
@@ -28,7 +28,7 @@ class DummyPredictModel:
         self.label = label
 
     def predict(self, arr):
-        return np.array([self.label])
+        return np.full(len(arr), self.label)
 
 
 class DummyLabelEncoder:
@@ -44,10 +44,7 @@ class DummyEncoder:
         self.classes_ = np.array(classes)
 
     def transform(self, values):
-        value = values[0]
-        if value not in self.classes_:
-            value = self.classes_[0]
-        return np.array([int(np.where(self.classes_ == value)[0][0])])
+        return np.array([int(np.where(self.classes_ == value)[0][0]) for value in values])
 
 
 @pytest.fixture()
@@ -115,7 +112,7 @@ def app_client(monkeypatch, tmp_path):
         return io.BytesIO(b"%PDF-1.4 test")
 
     monkeypatch.setattr(app_module, "generate_pdf_report", fake_pdf)
-    monkeypatch.setattr(app_module, "get_chatbot_response", lambda message: {"message": "ok"})
+    monkeypatch.setattr(app_module, "get_chatbot_response", lambda message, ranker=None, explain=False: {"message": "ok"})
 
     with app_module.app.test_client() as client:
         yield app_module, client
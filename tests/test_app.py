@@ -1,7 +1,11 @@
 import json
+import threading
 
 import pytest
 
+from chatbot_runtime import ChatExecutor
+from predictions import FEVER_CATEGORICAL_ENCODERS
+
 
 def _post_json(client, url, payload):
     return client.post(url, data=json.dumps(payload), content_type="application/json")
@@ -168,6 +172,42 @@ def test_anemia_prediction_and_misc_endpoints(app_client):
     assert not_found.get_json()["success"] is False
 
 
+def test_batch_predictions_score_records_in_order_with_item_errors(app_client, monkeypatch):
+    app_module, client = app_client
+    record = {
+        "gender": "Male",
+        "age": 55,
+        "chest_pain_type": "2 (atypical angina)",
+        "resting_bp": 130,
+        "cholesterol": 200,
+        "max_heart_rate": 150,
+        "st_depression": 1.2,
+        "major_vessels": 1,
+    }
+    resp = _post_json(client, "/api/heart/batch", {"records": [record, {**record, "age": "old"}, "x", record]})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["disease"] == "Heart Disease"
+    results = data["results"]
+    assert [result["success"] for result in results] == [True, False, False, True]
+    assert results[0]["probability"] == pytest.approx(81.0)
+    assert results[0]["inputs"]["Chest Pain Type"] == 2
+    assert results[1]["error"] == "Invalid value for age"
+    assert results[2]["error"] == "Record must be an object."
+    # Batch results are not stored as the user's own predictions.
+    assert client.get("/api/report").get_json()["predictions"] == {}
+
+    fever = {"temperature": 38.5, "age": 28, "bmi": 24.0, "humidity": 60, "air_quality": 80, "heart_rate": 90}
+    fever.update({key: "Unknown" for key in FEVER_CATEGORICAL_ENCODERS})
+    results = _post_json(client, "/api/fever/batch", {"records": [fever]}).get_json()["results"]
+    assert (results[0]["probability"], results[0]["severity"]) == (pytest.approx(65.0), "Moderate")
+
+    assert _post_json(client, "/api/gout/batch", {"records": [record]}).status_code == 404
+    assert _post_json(client, "/api/heart/batch", {"records": []}).status_code == 400
+    monkeypatch.setattr(app_module, "PREDICT_BATCH_LIMIT", 1)
+    assert _post_json(client, "/api/heart/batch", {"records": [record, record]}).status_code == 400
+
+
 def test_profile_creation_requires_fields(app_client):
     app_module, client = app_client
     resp = _post_json(client, "/api/profile", {"name": ""})
@@ -180,3 +220,118 @@ def test_chat_requires_message(app_client):
     resp = _post_json(client, "/api/chat", {"message": ""})
     assert resp.status_code == 400
     assert resp.get_json()["success"] is False
+
+
+def test_chat_batch_returns_results_in_order_with_item_errors(app_client, monkeypatch):
+    app_module, client = app_client
+    monkeypatch.setattr(app_module, "get_chatbot_responses", lambda messages, ranker: [{"input": message} for message in messages])
+
+    resp = _post_json(client, "/api/chat/batch", {"messages": ["fever, cough", "", 42, " malaria "]})
+    assert resp.status_code == 200
+    results = resp.get_json()["results"]
+    assert results[0] == {"success": True, "response": {"input": "fever, cough"}}
+    assert results[1]["success"] is False
+    assert results[2]["success"] is False
+    assert results[3]["response"] == {"input": "malaria"}
+
+    assert _post_json(client, "/api/chat/batch", {"messages": []}).status_code == 400
+    too_many = ["hi"] * (app_module.CHAT_BATCH_LIMIT + 1)
+    assert _post_json(client, "/api/chat/batch", {"messages": too_many}).status_code == 400
+
+
+def test_chat_returns_retry_answer_when_deadline_passes(app_client, monkeypatch):
+    app_module, client = app_client
+    release = threading.Event()
+    monkeypatch.setattr(app_module, "CHAT_EXECUTOR", ChatExecutor(workers=1, timeout_seconds=0.05))
+    monkeypatch.setattr(app_module, "get_chatbot_response", lambda message, ranker, explain: release.wait(5))
+
+    try:
+        resp = _post_json(client, "/api/chat", {"message": "fever"})
+    finally:
+        release.set()
+    assert resp.status_code == 503
+    assert resp.get_json()["retry"] is True
+
+    metrics = client.get("/api/chat/metrics").get_json()
+    assert metrics["executor"]["timeouts"] == 1
+
+
+def test_chat_selects_faq_ranker_and_explain_from_query_or_body(app_client, monkeypatch):
+    app_module, client = app_client
+    monkeypatch.delenv("CUREHELP_FAQ_RANKER", raising=False)
+    calls = []
+    monkeypatch.setattr(app_module, "get_chatbot_response", lambda message, ranker, explain: calls.append((ranker, explain)) or {})
+
+    assert _post_json(client, "/api/chat?ranker=bm25", {"message": "what is flu?"}).status_code == 200
+    assert _post_json(client, "/api/chat", {"message": "what is flu?", "ranker": "BM25"}).status_code == 200
+    assert _post_json(client, "/api/chat", {"message": "what is flu?"}).status_code == 200
+    assert _post_json(client, "/api/chat?explain=true", {"message": "what is flu?"}).status_code == 200
+    assert _post_json(client, "/api/chat", {"message": "what is flu?", "explain": True}).status_code == 200
+    assert calls == [("bm25", False), ("bm25", False), ("overlap", False), ("overlap", True), ("overlap", True)]
+
+    resp = _post_json(client, "/api/chat?ranker=neural", {"message": "what is flu?"})
+    assert resp.status_code == 400
+    assert "ranker" in resp.get_json()["error"]
+
+
+def test_chat_logs_normalised_queries_when_configured(app_client, monkeypatch, tmp_path):
+    app_module, client = app_client
+    monkeypatch.setattr(app_module, "get_chatbot_response", lambda message, ranker, explain: {})
+    monkeypatch.setattr(app_module, "CHAT_QUERY_LOG", app_module.QueryLog(tmp_path / "queries.log"))
+
+    _post_json(client, "/api/chat", {"message": "  What is   FLU?"})
+    _post_json(client, "/api/chat?ranker=bm25", {"message": "what is flu?"})
+    _post_json(client, "/api/chat", {"message": ""})
+
+    assert (tmp_path / "queries.log").read_text(encoding="utf-8").splitlines() == ["overlap\twhat is flu?", "bm25\twhat is flu?"]
+
+
+def test_chat_sessions_route_messages_and_end_on_delete(app_client, monkeypatch):
+    app_module, client = app_client
+    calls = []
+    monkeypatch.setattr(
+        app_module, "get_session_response", lambda message, session_id, ranker: calls.append((message, session_id)) or {"session_id": "abc"}
+    )
+    monkeypatch.setattr(app_module, "end_session", lambda session_id: session_id == "abc")
+
+    first = _post_json(client, "/api/chat", {"message": "I have a headache", "session": True})
+    assert first.get_json()["response"]["session_id"] == "abc"
+    _post_json(client, "/api/chat", {"message": "yes", "session_id": "abc"})
+    assert calls == [("I have a headache", None), ("yes", "abc")]
+
+    assert _post_json(client, "/api/chat", {"message": "yes", "session_id": 7}).status_code == 400
+    assert _post_json(client, "/api/chat?explain=true", {"message": "yes", "session_id": "abc"}).status_code == 400
+    assert client.delete("/api/chat/session/abc").get_json() == {"success": True, "ended": True}
+    assert client.delete("/api/chat/session/gone").get_json()["ended"] is False
+    assert "sessions" in client.get("/api/chat/metrics").get_json()
+
+
+def test_chat_suggest_returns_completions(app_client, monkeypatch):
+    app_module, client = app_client
+    calls = []
+    monkeypatch.setattr(
+        app_module, "suggest_names", lambda query, limit: calls.append((query, limit)) or [{"text": "skin rash", "type": "symptom", "count": 3}]
+    )
+
+    resp = client.get("/api/chat/suggest?q=skin%20r&limit=500")
+    assert resp.status_code == 200
+    assert resp.get_json()["suggestions"][0]["text"] == "skin rash"
+    assert calls == [("skin r", app_module.CHAT_SUGGEST_MAX_LIMIT)]
+    assert client.get("/api/chat/suggest?q=").get_json() == {"success": True, "suggestions": []}
+
+
+def test_admin_kb_update_requires_configured_token(app_client, monkeypatch):
+    app_module, client = app_client
+    applied = []
+    monkeypatch.setattr(app_module, "update_knowledge_base", lambda update: applied.append(update) or {"op": update["op"]})
+    update = {"op": "remove_qa", "question": "What is asthma?"}
+
+    monkeypatch.delenv("CUREHELP_ADMIN_TOKEN", raising=False)
+    assert client.post("/api/admin/kb", json=update).status_code == 403
+
+    monkeypatch.setenv("CUREHELP_ADMIN_TOKEN", "s3cret")
+    assert client.post("/api/admin/kb", json=update, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    resp = client.post("/api/admin/kb", json=update, headers={"X-Admin-Token": "s3cret"})
+    assert resp.status_code == 200
+    assert resp.get_json() == {"success": True, "result": {"op": "remove_qa"}}
+    assert applied == [update]
@@ -1,5 +1,12 @@
 from __future__ import annotations
 
+import gc
+import gzip
+import threading
+import time
+import weakref
+from pathlib import Path
+
 import pandas as pd
 import pytest
 import zipfile
@@ -14,6 +21,22 @@ from chatbot import (
     predict_disease_from_symptoms,
     process_user_input,
 )
+from chatbot_index import BM25Index, NameSuggester, QAIndex, QARecord, SymptomMatrix, SymptomResolver, name_frequencies
+from chatbot_snapshot import Snapshot, SnapshotError
+from chatbot_updates import UPDATE_LOG_ENV_VAR, UpdateError, UpdateLog
+from chatbot_warmup import WARM_CACHE_ENV_VAR, QueryLog, most_frequent_queries
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the other threads"
+        time.sleep(0.001)
+
+
+@pytest.fixture(autouse=True)
+def fresh_knowledge_base(monkeypatch):
+    monkeypatch.setattr(chatbot, "_knowledge_base", None)
 
 
 @pytest.fixture()
@@ -139,6 +162,86 @@ def test_get_chatbot_response_raises_when_datasets_missing(monkeypatch):
         chatbot.get_chatbot_response("Hello")
 
 
+def test_get_chatbot_response_reuses_cached_analysis_until_reload(monkeypatch, sample_datasets):
+    monkeypatch.setattr(chatbot, "_response_cache", chatbot.ResponseCache())
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: sample_datasets)
+
+    first = chatbot.get_chatbot_response("Diabetes")
+    second = chatbot.get_chatbot_response("  diabetes ")
+    assert second["analysis"]["disease"] == "  diabetes "
+    assert second["analysis"]["precautions"] == first["analysis"]["precautions"]
+    assert chatbot.response_cache_stats()["hits"] == 1
+
+    reloaded = tuple(df.copy() for df in sample_datasets)
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: reloaded)
+    chatbot.reload_knowledge_base()
+    chatbot.get_chatbot_response("diabetes")
+    stats = chatbot.response_cache_stats()
+    assert (stats["hits"], stats["invalidations"]) == (1, 1)
+
+
+def test_get_chatbot_response_coalesces_identical_concurrent_messages(monkeypatch, sample_datasets):
+    monkeypatch.setattr(chatbot, "_response_cache", chatbot.ResponseCache(max_entries=0))
+    monkeypatch.setattr(chatbot, "_in_flight", chatbot.SingleFlight())
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: sample_datasets)
+    chatbot.get_knowledge_base()
+    started, release = threading.Event(), threading.Event()
+    analysed = []
+    analyse_input = chatbot.analyse_input
+
+    def slow_analyse(user_input, knowledge_base, ranker=None):
+        analysed.append(user_input)
+        started.set()
+        release.wait(5)
+        return analyse_input(user_input, knowledge_base, ranker)
+
+    monkeypatch.setattr(chatbot, "analyse_input", slow_analyse)
+    replies = {}
+    messages = ["Diabetes", "  diabetes ", "DIABETES"]
+    threads = [threading.Thread(target=lambda m=m: replies.update({m: chatbot.get_chatbot_response(m)})) for m in messages]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    _wait_until(lambda: chatbot.coalescing_stats()["coalesced"] >= 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert analysed == ["Diabetes"]
+    assert [replies[m]["analysis"]["disease"] for m in messages] == messages
+    assert chatbot.coalescing_stats() == {"in_flight": 0, "leaders": 1, "coalesced": 2, "errors": 0}
+
+
+def test_warm_cache_prefills_replies_until_the_datasets_change(monkeypatch, sample_datasets, tmp_path):
+    monkeypatch.setattr(chatbot, "_response_cache", chatbot.ResponseCache())
+    monkeypatch.setattr(chatbot, "dataset_content_hash", lambda: "hash-1")
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: sample_datasets)
+    log_path = tmp_path / "queries.log"
+    log = QueryLog(log_path)
+    for message in ["Diabetes", "diabetes", "What is diabetes?", "thirst, fatigue"]:
+        log.record(message, "overlap")
+    with log_path.open("a", encoding="utf-8") as fh:
+        fh.write("bm25\tfever\nnot a query line\n")
+    assert most_frequent_queries([log_path], 2) == [("overlap", "diabetes", 2), ("overlap", "what is diabetes?", 1)]
+
+    path, written = chatbot.build_warm_cache([log_path], tmp_path / "warm.json")
+    assert written == 4
+    expected = chatbot.get_chatbot_response("What is diabetes?")
+
+    monkeypatch.setenv(WARM_CACHE_ENV_VAR, str(path))
+    monkeypatch.setattr(chatbot, "_response_cache", chatbot.ResponseCache())
+    chatbot.reload_knowledge_base()
+    assert chatbot.response_cache_stats()["entries"] == 4
+    assert chatbot.get_chatbot_response("what is  DIABETES?")["analysis"] == expected["analysis"]
+    assert chatbot.response_cache_stats()["hits"] == 1
+
+    monkeypatch.setattr(chatbot, "dataset_content_hash", lambda: "hash-2")
+    monkeypatch.setattr(chatbot, "_response_cache", chatbot.ResponseCache())
+    chatbot.reload_knowledge_base()
+    assert chatbot.response_cache_stats()["entries"] == 0
+
+
 def test_load_datasets_from_zip(tmp_path):
     chatbot.load_datasets.cache_clear()
     zip_path = tmp_path / "bot_data.zip"
@@ -157,3 +260,503 @@ def test_load_datasets_from_zip(tmp_path):
     assert precautions_df is not None and not precautions_df.empty
     assert symptoms_df is not None and not symptoms_df.empty
     chatbot.load_datasets.cache_clear()
+
+
+def test_load_csv_flexible_streams_compressed_members_and_mixed_encodings(tmp_path):
+    text = "question,answer\nWhat is caf\u00e9 au lait?,Na\u00efve answer\n"
+    (tmp_path / "utf8.csv").write_bytes(b"\xef\xbb\xbf" + text.encode("utf-8"))
+    (tmp_path / "latin1.csv.gz").write_bytes(gzip.compress(text.encode("latin-1")))
+    zip_path = tmp_path / "bot_data.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("bot_data/humanqa.csv.gz", gzip.compress(text.encode("utf-8")))
+
+    expected = [{"question": "What is caf\u00e9 au lait?", "answer": "Na\u00efve answer"}]
+    assert chatbot.load_csv_flexible(tmp_path / "utf8.csv").to_dict("records") == expected
+    assert chatbot.load_csv_flexible(tmp_path / "latin1.csv").to_dict("records") == expected
+    with zipfile.ZipFile(zip_path) as archive:
+        assert chatbot.load_csv_flexible(Path("bot_data/humanqa.csv"), archive).to_dict("records") == expected
+    assert chatbot.load_csv_flexible(tmp_path / "missing.csv") is None
+
+
+def test_qa_index_matches_substring_terms_and_keeps_first_tie():
+    faq_df = pd.DataFrame({"question": ["Prediabetes warning list", "What is asthma?"], "answer": ["a", "b"]})
+    humanqa_df = pd.DataFrame({"question": ["prediabetes warning list", ""], "answer": ["c", "d"]})
+    index = QAIndex((faq_df, humanqa_df))
+
+    match = find_question_answer("diabetes warning", faq_df, humanqa_df, index=index)
+
+    assert match is not None
+    assert match["answer"] == "a"
+    assert find_question_answer("cholera", faq_df, humanqa_df, index=index) is None
+
+
+def test_qa_index_term_cache_is_safe_across_threads(monkeypatch):
+    monkeypatch.setattr(QAIndex, "TERM_CACHE_SIZE", 8)
+    words = [f"term{number:02d}" for number in range(64)]
+    index = QAIndex((pd.DataFrame({"question": words, "answer": words}),))
+    errors = []
+
+    def look_up(offset):
+        try:
+            for round_ in range(200):
+                term = words[(offset + round_) % len(words)]
+                assert index.rows_containing(term).tolist() == [words.index(term)]
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=look_up, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(index._term_cache) <= 8
+
+
+def test_get_knowledge_base_rebuilds_only_on_reload(monkeypatch, sample_datasets):
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: sample_datasets)
+    first = chatbot.get_knowledge_base()
+    assert chatbot.get_knowledge_base() is first
+
+    reloaded = tuple(df.copy() for df in sample_datasets)
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: reloaded)
+    assert chatbot.get_knowledge_base() is first
+    assert chatbot.reload_knowledge_base() is not first
+
+
+def test_knowledge_base_releases_dataframes_after_build(monkeypatch, sample_datasets):
+    frame_refs = []
+    loads = []
+
+    def loader():
+        loads.append(1)
+        frames = tuple(df.copy() for df in sample_datasets)
+        frame_refs.extend(weakref.ref(df) for df in frames)
+        return frames
+
+    monkeypatch.setattr(chatbot, "load_datasets", loader)
+    knowledge_base = chatbot.get_knowledge_base()
+    gc.collect()
+    assert all(ref() is None for ref in frame_refs)
+
+    match = find_question_answer("how to manage diabetes", index=knowledge_base.qa_index)
+    assert isinstance(match, QARecord)
+    assert (match.name, match["answer"]) == (0, "Follow diet, exercise, and medication.")
+    # Updates work on the indexes alone; only ``datasets`` parses the CSVs again.
+    assert knowledge_base.apply_update({"op": "remove_qa", "question": "diabetes? how to manage"})["removed"] == 1
+    assert len(loads) == 1
+    assert knowledge_base.datasets[4]["question"].tolist() == ["How to manage diabetes?"]
+    assert chatbot.reload_knowledge_base() is not knowledge_base
+
+
+def test_qa_index_updates_match_a_rebuilt_index():
+    faq_df = pd.DataFrame({"question": ["What is asthma?", "How is asthma treated?"], "answer": ["a", "b"]})
+    index = QAIndex((faq_df,))
+
+    appended = index.appended("Is asthma contagious?", "c", 0)
+    rebuilt = QAIndex((pd.concat([faq_df, pd.DataFrame({"question": ["Is asthma contagious?"], "answer": ["c"]})]),))
+    assert sorted(appended.vocabulary()) == sorted(rebuilt.vocabulary())
+    for token in rebuilt.vocabulary():
+        assert appended.postings(token).tolist() == rebuilt.postings(token).tolist()
+    assert appended.record(2)["answer"] == "c"
+    assert len(index) == 2
+
+    removed = appended.without_rows(appended.rows_for_question("what is ASTHMA? "))
+    assert removed.postings("what").tolist() == []
+    assert removed.postings("asthma").tolist() == [1, 2]
+    assert removed.with_answer([1], "d").record(1)["answer"] == "d"
+    assert QAIndex.from_arrays(appended.to_arrays("qa"), "qa").record(2)["question"] == "Is asthma contagious?"
+
+
+def test_qa_index_compaction_folds_repeated_questions_without_changing_answers():
+    faq_df = pd.DataFrame({"question": ["What is asthma?"], "answer": ["faq"]})
+    humanqa_df = pd.DataFrame(
+        {
+            "question": ["what is  ASTHMA?", "How is asthma treated?", "What is asthma?", "asthma? What is", "Is asthma rare?"],
+            "answer": ["h0", "h1", "h2", "h3", "h4"],
+        }
+    )
+    full = QAIndex((faq_df, humanqa_df))
+    compact = QAIndex((faq_df, humanqa_df), compact=True)
+
+    assert (len(full), len(compact), compact.alias_count) == (6, 3, 3)
+    assert compact.aliases(0) == [(1, 0), (1, 2), (1, 3)]
+    assert compact.multiplicities().tolist() == [4, 1, 1]
+    for question in ["What is asthma?", "how is asthma treated", "is asthma rare or common?", "asthma symptoms"]:
+        expected, actual = full.search(question, False), compact.search(question, False)
+        assert (expected is None) == (actual is None)
+        if expected is not None:
+            assert full.record(expected[0])["answer"] == compact.record(actual[0])["answer"]
+            assert actual[1] == pytest.approx(expected[1])
+        assert [(full.question(row), score) for row, score in BM25Index(full).top_k(question, 3)] == pytest.approx(
+            [(compact.question(row), score) for row, score in BM25Index(compact).top_k(question, 3)]
+        )
+
+    restored = QAIndex.from_arrays(compact.appended("Is asthma genetic?", "new", 2).to_arrays("qa"), "qa")
+    assert restored.aliases(0) == compact.aliases(0)
+    assert restored.aliases(3) == []
+
+    # Any spelling of a folded question removes the row with its aliases,
+    # as it removes every matching row of an uncompacted index.
+    for removed in ["What is asthma?", "what is  asthma?", "asthma? what is"]:
+        expected = full.without_rows(full.rows_for_question(removed))
+        actual, rows, count = compact.without_question(removed)
+        assert (rows, count, actual.alias_count) == ([0], len(full.rows_for_question(removed)), 0)
+        for question in ["What is asthma?", "asthma what", "is asthma rare or common?"]:
+            assert (expected.search(question, False) is None) == (actual.search(question, False) is None)
+            assert [(expected.record(row)["answer"], score) for row, score in BM25Index(expected).top_k(question, 3)] == pytest.approx(
+                [(actual.record(row)["answer"], score) for row, score in BM25Index(actual).top_k(question, 3)]
+            )
+    flu = (pd.DataFrame({"question": ["What is flu", "What is fever", "what is  FLU"], "answer": ["first", "fever", "second"]}),)
+    index, rows, count = QAIndex(flu, compact=True).without_question("flu what is")
+    assert (rows, count, index.aliases(0)) == ([0], 2, [])
+    assert index.record(index.search("what is flu", False)[0])["answer"] == "fever"
+
+
+def test_knowledge_base_updates_apply_in_place_and_replay_from_log(monkeypatch, sample_datasets, tmp_path):
+    log_path = tmp_path / "kb_updates.jsonl"
+    monkeypatch.setenv(UPDATE_LOG_ENV_VAR, str(log_path))
+    monkeypatch.setattr(chatbot, "_response_cache", chatbot.ResponseCache())
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: sample_datasets)
+    knowledge_base = chatbot.get_knowledge_base()
+    generation = knowledge_base.generation
+    assert chatbot.get_chatbot_response("how to manage diabetes")["analysis"]["faq_question"] == "How to manage diabetes?"
+
+    assert chatbot.update_knowledge_base(
+        {"op": "put_qa", "question": "How to manage diabetes?", "answer": "See your doctor."}
+    ) == {"op": "put_qa", "added": 0, "updated": 1}
+    assert knowledge_base.generation is not generation
+    assert chatbot.get_chatbot_response("how to manage diabetes")["analysis"]["faq_answer"] == "See your doctor."
+
+    chatbot.update_knowledge_base({"op": "put_qa", "question": "Is gout hereditary?", "answer": "Partly."})
+    chatbot.update_knowledge_base(
+        {"op": "put_disease", "name": "Gout", "symptoms": ["joint pain", "swelling"], "precautions": ["Rest"], "description": "Arthritis."}
+    )
+    chatbot.update_knowledge_base({"op": "remove_disease", "name": "Diabetes"})
+    with pytest.raises(UpdateError):
+        chatbot.update_knowledge_base({"op": "put_qa", "question": "No answer"})
+
+    def check(knowledge_base):
+        assert knowledge_base.qa_index.rows_for_question("is gout hereditary?") == [2]
+        reply = chatbot.get_chatbot_response("joint pain, swelling")["analysis"]
+        assert (reply["disease"], reply["precautions"], reply["description"]) == ("Gout", ["Rest"], "Arthritis.")
+        assert knowledge_base.disease_index.get("diabetes") is None
+        assert [entry["text"] for entry in chatbot.suggest_names("gou")] == ["Gout"]
+
+    check(knowledge_base)
+    assert len(UpdateLog(log_path).read()[0]) == 4
+    # A rebuilt knowledge base replays the log.
+    rebuilt = chatbot.reload_knowledge_base()
+    assert rebuilt is not knowledge_base
+    check(rebuilt)
+    assert chatbot.get_chatbot_response("how to manage diabetes")["analysis"]["faq_answer"] == "See your doctor."
+
+    # Lines appended by another process are applied on the next request.
+    UpdateLog(log_path).append({"op": "remove_qa", "question": "Is gout hereditary?"})
+    assert chatbot.get_knowledge_base().qa_index.rows_for_question("is gout hereditary?") == []
+
+    # Another spelling of an existing question updates that row instead of
+    # adding one that could never win a tie against it.
+    assert chatbot.update_knowledge_base(
+        {"op": "put_qa", "question": "how to  manage DIABETES?", "answer": "Ask your doctor."}
+    ) == {"op": "put_qa", "added": 0, "updated": 1}
+    assert chatbot.get_chatbot_response("how to manage diabetes")["analysis"]["faq_answer"] == "Ask your doctor."
+    # The same spelling removes the row it updated.
+    assert chatbot.update_knowledge_base({"op": "remove_qa", "question": "diabetes? How to  MANAGE"}) == {
+        "op": "remove_qa",
+        "removed": 1,
+    }
+    assert chatbot.get_knowledge_base().qa_index.rows_for_question("How to manage diabetes?") == []
+
+
+def test_explain_reports_stages_and_score_breakdown_without_changing_the_reply(monkeypatch, sample_datasets):
+    monkeypatch.setattr(chatbot, "_response_cache", chatbot.ResponseCache())
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: sample_datasets)
+    knowledge_base = chatbot.get_knowledge_base()
+
+    for message in ["how to manage diabetes", "frequent urination", "Diabetes", "What are the symptoms of diabetes?"]:
+        for ranker in chatbot.FAQ_RANKERS:
+            analysis, report = chatbot.explain_input(message, knowledge_base, ranker)
+            assert analysis == chatbot.analyse_input(message, knowledge_base, ranker)
+            assert report["stages"][0]["stage"] == "classify"
+            assert all(stage["wall_ms"] >= 0 and stage["cpu_ms"] >= 0 for stage in report["stages"])
+
+    reply = chatbot.get_chatbot_response("how to manage diabetes", explain=True)
+    assert [stage["stage"] for stage in reply["explain"]["stages"]] == ["classify", "symptom_extract", "disease_lookup", "faq_scan"]
+    winner, runner_up = reply["explain"]["faq"]["matches"]
+    assert (winner["question"], winner["matched_words"]) == ("How to manage diabetes?", ["how", "manage", "to"])
+    assert winner["long_terms"] == ["manage", "diabetes"]
+    assert winner["score"] == pytest.approx(winner["word_overlap"] + winner["long_term_bonus"] + winner["symptom_bonus"])
+    assert winner["score"] > runner_up["score"]
+    assert reply["explain"]["faq"]["rows_scored"] == 2
+
+    symptoms = chatbot.get_chatbot_response("frequent urination, thirst", explain=True)["explain"]
+    assert symptoms["symptoms"]["matches"][0]["matched_symptoms"] == ["frequent_urination"]
+    # Explained replies are computed afresh and never cached.
+    assert chatbot.response_cache_stats()["hits"] == 0
+
+
+def test_free_text_symptom_mentions_feed_symptom_prediction():
+    symptoms_df = pd.DataFrame({
+        "Disease": ["Flu", "Migraine", "Gastritis"],
+        "Symptom_1": ["high_fever", "headache", "stomach_pain"],
+        "Symptom_2": [" headache", " nausea", " nausea"],
+        "Symptom_3": [" fatigue", " blurred_and_distorted_vision", " vomiting"],
+    })
+    knowledge_base = chatbot.KnowledgeBase((None, symptoms_df, None, None, None))
+    matrix = knowledge_base.symptom_matrix
+
+    mentions = matrix.extract("I've had a HEADACHE and high fever since yesterday, so tired, no nausea or vomiting")
+    assert [(words, matrix.symptoms[column], negated) for words, column, negated in mentions] == [
+        ("headache", "headache", False),
+        ("high fever", "high_fever", False),
+        ("tired", "fatigue", False),
+        ("nausea", "nausea", True),
+        ("vomiting", "vomiting", True),
+    ]
+    # Whole words and whole phrases only.
+    assert matrix.extract("headaches with fever") == []
+
+    analysis = chatbot.analyse_input("I've had a headache and high fever since yesterday", knowledge_base)
+    assert analysis["type"] == "symptoms"
+    assert analysis["disease"] == "Flu"
+    assert [entry["symptom"] for entry in analysis["resolved_symptoms"]] == ["headache", "high fever"]
+    assert chatbot.analyse_inputs(["I've had a headache and high fever since yesterday"], knowledge_base) == [analysis]
+
+    denied = chatbot.analyse_input("stomach pain and nausea but no vomiting", knowledge_base)
+    assert denied["disease"] == "Gastritis"
+    assert "vomiting" not in [entry["symptom"] for entry in denied["follow_up_symptoms"]]
+    assert chatbot.analyse_input("Migraine", knowledge_base)["type"] == "disease"
+    # Short messages that are not in the first person stay disease lookups,
+    # known disease or not, as the classifier sends them.
+    for message in ["headache", "high fever", "headache nausea fatigue"]:
+        assert chatbot.analyse_input(message, knowledge_base)["type"] == "disease"
+        assert chatbot.analyse_inputs([message], knowledge_base)[0]["type"] == "disease"
+    assert chatbot.analyse_input("my headache", knowledge_base)["type"] == "symptoms"
+    assert chatbot.analyse_input("why does a headache happen at night?", knowledge_base)["type"] == "question"
+    assert chatbot.analyse_input("is nausea contagious", knowledge_base)["type"] == "disease"
+    # One mention in someone else's words is not enough to leave the FAQ path.
+    assert chatbot.analyse_input("the word headache comes from old english", knowledge_base)["type"] == "question"
+
+
+def test_session_accumulates_symptoms_across_messages(monkeypatch):
+    symptoms_df = pd.DataFrame({
+        "Disease": ["Flu", "Migraine", "Gastritis"],
+        "Symptom_1": ["high_fever", "headache", "stomach_pain"],
+        "Symptom_2": [" headache", " nausea", " nausea"],
+        "Symptom_3": [" fatigue", " dizziness", " vomiting"],
+    })
+    knowledge_base = chatbot.KnowledgeBase((None, symptoms_df, None, None, None))
+    monkeypatch.setattr(chatbot, "get_knowledge_base", lambda: knowledge_base)
+    monkeypatch.setattr(chatbot, "_sessions", chatbot.SessionStore())
+
+    first = chatbot.get_session_response("I have a headache")
+    session_id = first["session_id"]
+    assert first["analysis"]["session_symptoms"] == ["headache"]
+
+    second = chatbot.get_session_response("nausea too", session_id)["analysis"]
+    assert second["session_symptoms"] == ["headache", "nausea"]
+    assert second["disease"] == "Migraine"
+    asked = second["follow_up_symptoms"][0]["symptom"]
+
+    third = chatbot.get_session_response("no", session_id)["analysis"]
+    assert third["ruled_out_symptoms"] == [asked]
+    assert asked not in [entry["symptom"] for entry in third["follow_up_symptoms"]]
+    # Questions are answered as usual, through the shared response cache,
+    # and leave the session alone.
+    hits = chatbot.response_cache_stats()["hits"]
+    assert chatbot.get_session_response("what is a migraine?", session_id)["analysis"]["type"] == "question"
+    assert chatbot.get_session_response("What is a migraine?", session_id)["session_id"] == session_id
+    assert chatbot.response_cache_stats()["hits"] == hits + 1
+    assert chatbot.get_session_response("dizziness", session_id)["analysis"]["session_symptoms"] == [
+        "headache", "nausea", "dizziness"
+    ]
+
+    assert chatbot.end_session(session_id) is True
+    assert chatbot.get_session_response("dizziness", session_id)["analysis"]["session_symptoms"] == ["dizziness"]
+
+
+def test_symptom_matrix_derived_from_symptom_table_ranks_differential():
+    symptoms_df = pd.DataFrame({
+        "Disease": ["Flu", "Flu", "Allergy"],
+        "Symptom_1": ["fever", " cough", " sneezing"],
+        "Symptom_2": [" headache", None, " watering_from_eyes"],
+    })
+    matrix = SymptomMatrix.from_frames(None, symptoms_df)
+
+    ranked = matrix.top_k(["Fever", "cough", "sneezing"], 2)
+
+    assert [disease for disease, _ in ranked] == ["Flu", "Allergy"]
+    assert ranked[0][1] == pytest.approx(2 / (3 ** 0.5 * 3 ** 0.5))
+    assert matrix.top_k(["unknown"], 2) == []
+
+
+def test_symptom_matrix_follow_up_asks_the_most_informative_symptom():
+    symptoms_df = pd.DataFrame({
+        "Disease": ["Cold", "Measles", "Scabies", "Migraine"],
+        "Symptom_1": ["fever", "fever", "fever", "headache"],
+        "Symptom_2": ["cough", "rash", "rash", None],
+        "Symptom_3": [None, None, "itching", None],
+    })
+    matrix = SymptomMatrix.from_frames(None, symptoms_df)
+    assert matrix.cooccurrence[matrix.query_columns(["fever"])[0], matrix.query_columns(["rash"])[0]] == 2
+
+    suggestions = matrix.follow_up(matrix.query_columns(["fever"]), 3)
+
+    # rash and cough split the candidates equally well (shares p and 1 - p);
+    # rash co-occurs with fever more often. headache never does.
+    assert [symptom for symptom, _, _ in suggestions] == ["rash", "cough", "itching"]
+    weights = {"Cold": 1 / 2 ** 0.5, "Measles": 1 / 2 ** 0.5, "Scabies": 1 / 3 ** 0.5}
+    share = (weights["Measles"] + weights["Scabies"]) / sum(weights.values())
+    assert suggestions[0][2] == pytest.approx(share)
+    assert suggestions[0][1] == pytest.approx(suggestions[1][1])
+    assert matrix.follow_up(matrix.query_columns(["fever", "itching"]), 3)[0][0] == "rash"
+    assert matrix.follow_up(matrix.query_columns(["headache"]), 3) == []
+    # Ruling out rash leaves only the cold: nothing is left to ask.
+    assert matrix.follow_up(matrix.query_columns(["fever"]), 3, matrix.query_columns(["rash"])) == []
+
+
+def test_symptom_resolver_tolerates_typos_and_reports_matches(sample_datasets):
+    resolver = SymptomResolver(["stomach_pain", "skin_rash", "redness"])
+    assert resolver.resolve("Skin  Rash") == (1, 1.0)
+    assert resolver.resolve("stomache pain")[0] == 0
+    assert resolver.resolve("tiredness") is None
+    assert resolver.resolve("xyz") is None
+
+    analysis = process_user_input("frequent urinaton, zzz", *sample_datasets)
+    assert analysis["disease"] == "Diabetes"
+    assert [item["symptom"] for item in analysis["resolved_symptoms"]] == ["frequent urination", None]
+
+
+def test_process_user_input_symptoms_without_augmented_dataset(sample_datasets):
+    precautions_df, symptoms_df, faq_df, _, humanqa_df = sample_datasets
+
+    analysis = process_user_input("frequent urination, thirst", precautions_df, symptoms_df, faq_df, None, humanqa_df)
+
+    assert analysis["disease"] == "Diabetes"
+    assert analysis["differential"][0] == {"disease": "Diabetes", "score": pytest.approx(1.0)}
+
+
+def test_disease_index_resolves_normalised_names(sample_datasets):
+    knowledge_base = chatbot.KnowledgeBase(sample_datasets)
+
+    record = knowledge_base.disease_index.get("  DIABETES ")
+    assert record.symptoms == ("frequent urination",)
+    assert record.precautions == ("Exercise regularly", "Monitor glucose")
+    assert knowledge_base.disease_description("Diabetes") == "Increased thirst and urination among others."
+    assert knowledge_base.disease_index.get("malaria") is None
+    assert knowledge_base.disease_details("malaria") == {"symptoms": [], "precautions": [], "description": None}
+
+
+def test_disease_cards_serve_aliases_of_known_diseases():
+    symptoms_df = pd.DataFrame({
+        "Disease": ["Hypertension (High Blood Pressure)", "Acute Lymphoblastic Leukemia (ALL)", "COVID-19"],
+        "Symptom_1": ["headache", "fatigue", "cough"],
+    })
+    precautions_df = pd.DataFrame({"Disease": ["Hypertension (High Blood Pressure)"], "Precaution_1": ["Reduce salt"]})
+    knowledge_base = chatbot.KnowledgeBase((precautions_df, symptoms_df, None, None, None))
+
+    card = knowledge_base.disease_cards.get("high blood pressure")
+    assert card is knowledge_base.disease_cards.get("Hypertension") is knowledge_base.disease_cards.get("HYPERTENSION (high blood pressure)")
+    assert card.fields == {"symptoms": ["headache"], "precautions": ["Reduce salt"], "description": None}
+    assert knowledge_base.disease_cards.get("covid 19").name == "COVID-19"
+    assert knowledge_base.disease_cards.get("all") is None
+
+    analysis = chatbot.analyse_input("high blood pressure", knowledge_base)
+    assert (analysis["disease"], analysis["symptoms"], analysis["precautions"]) == ("high blood pressure", ["headache"], ["Reduce salt"])
+
+
+def test_name_suggester_completes_word_prefixes_by_frequency():
+    symptoms_df = pd.DataFrame({
+        "Disease": ["Flu", "Flu", "Allergy", "Fungal infection"],
+        "Symptom_1": ["fever", " skin_rash", " skin_rash", " skin_rash"],
+        "Symptom_2": [" headache", " fatigue", " rash", None],
+    })
+    suggester = NameSuggester.from_counts(*name_frequencies(None, symptoms_df, None))
+
+    assert [item["text"] for item in suggester.suggest("ras", 5)] == ["skin rash", "rash"]
+    assert suggester.suggest("f", 2) == [
+        {"text": "Flu", "type": "disease", "count": 2},
+        {"text": "fever", "type": "symptom", "count": 1},
+    ]
+    assert suggester.suggest("Skin_R", 5)[0] == {"text": "skin rash", "type": "symptom", "count": 3}
+    assert suggester.suggest("xyz", 5) == [] and suggester.suggest("  ", 5) == []
+
+    restored = NameSuggester.from_arrays(suggester.to_arrays("suggest"), "suggest")
+    assert restored.suggest("f", 2) == suggester.suggest("f", 2)
+
+
+def test_suggest_names_completes_the_last_symptom_typed(monkeypatch, sample_datasets):
+    monkeypatch.setattr(chatbot, "load_datasets", lambda: sample_datasets)
+    assert [item["text"] for item in chatbot.suggest_names("thirst, frequ")] == ["frequent urination"]
+    assert chatbot.suggest_names("diab")[0] == {"text": "Diabetes", "type": "disease", "count": 3}
+
+
+def test_analyse_inputs_matches_single_analysis(sample_datasets):
+    knowledge_base = chatbot.KnowledgeBase(sample_datasets)
+    messages = ["frequent urination, blurred vision", "How to manage diabetes?", "diabetes", "", "frequent urination, blurred vision"]
+
+    batch = chatbot.analyse_inputs(messages, knowledge_base)
+
+    assert batch == [chatbot.analyse_input(message, knowledge_base) for message in messages]
+    assert batch[0]["disease"] == "Diabetes"
+    assert batch[0] is not batch[4]
+
+
+def _write_bot_data(directory):
+    directory.mkdir()
+    (directory / "Disease precaution.csv").write_text("Disease,Precaution_1\nDiabetes,Exercise\n")
+    (directory / "DiseaseAndSymptoms.csv").write_text("Disease,Symptom_1,Symptom_2\nDiabetes,thirst, frequent_urination\n")
+    (directory / "humanqa.csv").write_text("question,answer\nHow to manage diabetes?,Diet and exercise\n")
+
+
+def test_knowledge_snapshot_round_trip_and_staleness(tmp_path):
+    data_dir = tmp_path / "bot_data"
+    _write_bot_data(data_dir)
+    chatbot.load_datasets.cache_clear()
+    snapshot_path = chatbot.build_knowledge_snapshot(str(data_dir), tmp_path / "kb.snapshot")
+    chatbot.load_datasets.cache_clear()
+
+    knowledge_base = chatbot.load_snapshot_knowledge_base(str(snapshot_path), str(data_dir))
+    assert knowledge_base is not None
+    analysis = process_user_input("How to manage diabetes?", *knowledge_base.datasets, knowledge_base=knowledge_base)
+    assert analysis["faq_answer"] == "Diet and exercise"
+    assert knowledge_base.symptom_matrix.top_k(["thirst"], 1)[0][0] == "Diabetes"
+    assert knowledge_base.disease_index.get("diabetes").precautions == ("Exercise",)
+
+    (data_dir / "humanqa.csv").write_text("question,answer\nHow to manage asthma?,Inhalers\n")
+    chatbot.load_snapshot_knowledge_base.cache_clear()
+    assert chatbot.load_snapshot_knowledge_base(str(snapshot_path), str(data_dir)) is None
+    chatbot.load_snapshot_knowledge_base.cache_clear()
+
+    # A garbled or cut-off header falls back to the CSVs instead of raising.
+    data = snapshot_path.read_bytes()
+    header_end = 20 + int.from_bytes(data[12:20], "little")
+    for damaged in [data[:header_end - 7], data[:20] + b"\xff" + data[21:header_end] + data[header_end:]]:
+        snapshot_path.write_bytes(damaged)
+        with pytest.raises(SnapshotError):
+            Snapshot.open(snapshot_path)
+        assert chatbot.load_snapshot_knowledge_base(str(snapshot_path), str(data_dir)) is None
+        chatbot.load_snapshot_knowledge_base.cache_clear()
+
+
+def test_bm25_ranker_answers_paraphrases_and_offers_alternates():
+    faq_df = pd.DataFrame({
+        "question": ["How is malaria treated?", "What causes malaria fever?", "How is asthma treated?", "How is malaria treated?"],
+        "answer": ["Antimalarial drugs.", "Parasites.", "Inhalers.", "Duplicate."],
+    })
+    index = BM25Index(QAIndex((faq_df,)))
+
+    ranked = index.top_k("treatment: how is MALARIA treated", 5)
+    assert [row_id for row_id, _ in ranked] == [0, 2, 1]
+    assert ranked[0][1] > ranked[1][1] > 0
+    assert index.top_k("cholera", 3) == []
+
+    knowledge_base = chatbot.KnowledgeBase((None, None, faq_df, None, None))
+    analysis = chatbot.analyse_input("how is malaria treated?", knowledge_base, ranker="bm25")
+    assert analysis["faq_answer"] == "Antimalarial drugs."
+    assert [item["question"] for item in analysis["alternates"]] == ["How is asthma treated?", "What causes malaria fever?"]
+    assert chatbot.analyse_input("how is malaria treated?", knowledge_base)["alternates"] == []
+    with pytest.raises(ValueError):
+        chatbot.analyse_input("how is malaria treated?", knowledge_base, ranker="neural")
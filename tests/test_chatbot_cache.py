@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from chatbot_cache import ResponseCache, SingleFlight, normalise_message
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalise_message_collapses_case_and_whitespace():
+    assert normalise_message("  What are   the Symptoms of MALARIA? ") == "what are the symptoms of malaria?"
+
+
+def test_cache_evicts_least_recently_used_and_counts():
+    cache = ResponseCache(max_entries=2)
+    generation = object()
+    cache.put("a", generation, 1)
+    cache.put("b", generation, 2)
+    assert cache.get("a", generation) == 1
+    cache.put("c", generation, 3)
+
+    assert cache.get("b", generation) is None
+    assert cache.get("c", generation) == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 1, 1, 2)
+
+
+def test_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(ttl_seconds=10, clock=clock)
+    generation = object()
+    cache.put("fever", generation, {"type": "disease"})
+
+    clock.now = 9.5
+    assert cache.get("fever", generation) == {"type": "disease"}
+    clock.now = 10.0
+    assert cache.get("fever", generation) is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_cache_respects_byte_budget():
+    cache = ResponseCache(max_bytes=40)
+    generation = object()
+    cache.put("a", generation, "x" * 20)
+    cache.put("b", generation, "y" * 20)
+
+    assert cache.get("a", generation) is None
+    assert cache.stats()["bytes"] <= 40
+    cache.put("huge", generation, "z" * 100)
+    assert cache.get("huge", generation) is None
+
+
+def test_cache_drops_entries_when_generation_changes():
+    cache = ResponseCache()
+    cache.put("diabetes", "kb-1", "old")
+
+    assert cache.get("diabetes", "kb-2") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_cache_discards_replies_computed_for_a_retired_generation():
+    cache = ResponseCache()
+    cache.put("diabetes", "kb-1", "old")
+    cache.put("asthma", "kb-2", "new")
+
+    # A request that began before the update finishes after it.
+    cache.put("diabetes", "kb-1", "stale")
+    assert cache.get("asthma", "kb-1") is None
+    assert cache.get("asthma", "kb-2") == "new"
+    assert cache.get("diabetes", "kb-2") is None
+    stats = cache.stats()
+    assert (stats["invalidations"], stats["stale_puts"], stats["entries"]) == (1, 1, 1)
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResponseCache(max_entries=0)
+    cache.put("a", None, 1)
+
+    assert cache.get("a", None) is None
+    assert cache.stats()["misses"] == 0
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the other threads"
+        time.sleep(0.001)
+
+
+def _start_waiting(flight, key, function, results):
+    thread = threading.Thread(target=lambda: results.append(_outcome(flight, key, function)))
+    thread.start()
+    return thread
+
+
+def _outcome(flight, key, function):
+    try:
+        return flight.do(key, function)
+    except RuntimeError as exc:
+        return exc
+
+
+def test_single_flight_shares_one_computation_between_concurrent_callers():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {"answer": 42}
+
+    results = []
+    leader = _start_waiting(flight, "fever", slow, results)
+    _wait_until(lambda: flight.stats()["in_flight"] > 0)
+    followers = [_start_waiting(flight, "fever", slow, results) for _ in range(5)]
+    _wait_until(lambda: flight.stats()["coalesced"] >= 5)
+    assert flight.do("cough", lambda: "other") == "other"
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [{"answer": 42}] * 6
+    assert flight.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 5, "errors": 0}
+    assert flight.do("fever", lambda: "fresh") == "fresh"
+
+
+def test_single_flight_hands_the_leaders_error_to_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("datasets missing")
+
+    results = []
+    threads = [_start_waiting(flight, "fever", failing, results)]
+    _wait_until(lambda: flight.stats()["in_flight"] > 0)
+    threads.append(_start_waiting(flight, "fever", failing, results))
+    _wait_until(lambda: flight.stats()["coalesced"] > 0)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert [str(result) for result in results] == ["datasets missing"] * 2
+    assert flight.stats()["errors"] == 1
+    with pytest.raises(ValueError):
+        flight.do("fever", lambda: int("x"))
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from chatbot_query import QueryAnalysis
+
+
+def test_query_analysis_extracts_question_features_once():
+    query = QueryAnalysis("  What are the Symptoms of Malaria? ")
+
+    assert query.intent == "question"
+    assert query.lowered == "what are the symptoms of malaria?"
+    assert query.term_set == {"what", "are", "the", "symptoms", "of", "malaria?"}
+    assert query.long_terms == ["symptoms", "malaria"]
+    assert query.is_symptom_question and query.mentions_symptom
+    assert query.disease_phrase == "of malaria"
+
+
+def test_query_analysis_intents():
+    assert QueryAnalysis("fever, cough, headache").intent == "symptoms"
+    assert QueryAnalysis("fever, cough").symptom_terms == ["fever", "cough"]
+    assert QueryAnalysis("malaria").intent == "disease"
+    assert QueryAnalysis("i have had a mild fever for days").intent == "question"
+    assert QueryAnalysis("").intent == "question"
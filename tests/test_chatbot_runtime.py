@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from chatbot_runtime import ChatBusyError, ChatExecutor, ChatTimeoutError
+
+
+def test_executor_returns_results_and_records_queue_wait():
+    executor = ChatExecutor(workers=2, queue_depth=2, timeout_seconds=1)
+    try:
+        assert executor.run(lambda a, b: a + b, 2, 3) == 5
+        stats = executor.stats()
+        assert stats["submitted"] == 1
+        assert stats["queue_wait_ms"]["max"] >= 0
+    finally:
+        executor.shutdown()
+
+
+def test_executor_times_out_and_rejects_when_full():
+    executor = ChatExecutor(workers=1, queue_depth=0, timeout_seconds=0.05)
+    release = threading.Event()
+    try:
+        with pytest.raises(ChatTimeoutError):
+            executor.run(release.wait, 5)
+        with pytest.raises(ChatBusyError):
+            executor.run(lambda: "late")
+        release.set()
+
+        stats = executor.stats()
+        assert (stats["timeouts"], stats["rejected"]) == (1, 1)
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_executor_propagates_errors():
+    executor = ChatExecutor(workers=1)
+    try:
+        with pytest.raises(RuntimeError, match="maintenance"):
+            executor.run(lambda: (_ for _ in ()).throw(RuntimeError("maintenance")))
+    finally:
+        executor.shutdown()
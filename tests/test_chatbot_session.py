@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chatbot_index import SymptomMatrix
+from chatbot_session import SessionStore, SymptomSession, parse_answer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def matrix():
+    symptoms_df = pd.DataFrame({
+        "Disease": ["Flu", "Migraine", "Gastritis", "Allergy"],
+        "Symptom_1": ["fever", "headache", "stomach_pain", "sneezing"],
+        "Symptom_2": ["headache", "nausea", "nausea", "itching"],
+        "Symptom_3": ["cough", "dizziness", "vomiting", "headache"],
+    })
+    return SymptomMatrix.from_frames(None, symptoms_df)
+
+
+def test_parse_answer_reads_plain_yes_and_no():
+    assert parse_answer("Yes!") is True
+    assert parse_answer("no, I don't") is False
+    assert parse_answer("yes I have a cough") is None
+
+
+def test_session_scores_match_a_full_recomputation(matrix):
+    session = SymptomSession(matrix)
+    columns = matrix.query_columns(["headache", "nausea", "fever"])
+
+    for count in range(1, len(columns) + 1):
+        session.confirm(columns[count - 1:count])
+        assert session.weights() == pytest.approx(matrix.row_scores(columns[:count]))
+
+    denied = matrix.query_columns(["vomiting"])
+    session.rule_out(denied)
+    assert session.weights() == pytest.approx(matrix.candidate_weights(columns, denied))
+    # Changing an answer moves the symptom between the lists.
+    session.confirm(denied)
+    assert session.ruled_out == []
+    assert session.weights() == pytest.approx(matrix.row_scores([*columns, *denied]))
+    session.rule_out(columns[:1])
+    assert session.weights() == pytest.approx(matrix.candidate_weights([*columns[1:], *denied], columns[:1]))
+
+
+def test_session_keeps_only_the_latest_symptoms(matrix, monkeypatch):
+    monkeypatch.setattr("chatbot_session.MAX_SESSION_SYMPTOMS", 2)
+    session = SymptomSession(matrix)
+    columns = matrix.query_columns(["fever", "headache", "cough"])
+    session.confirm(columns)
+
+    assert session.confirmed == columns[1:]
+    assert session.weights() == pytest.approx(matrix.row_scores(columns[1:]))
+
+
+def test_session_rebase_maps_symptoms_by_name(matrix):
+    session = SymptomSession(matrix)
+    session.confirm(matrix.query_columns(["headache", "nausea"]))
+    session.rule_out(matrix.query_columns(["vomiting"]))
+    updated = matrix.with_disease("Vertigo", ["dizziness", "tinnitus", "nausea"])
+
+    session.rebase(updated)
+
+    assert [updated.symptoms[column] for column in session.confirmed] == ["headache", "nausea"]
+    assert [updated.symptoms[column] for column in session.ruled_out] == ["vomiting"]
+    expected = updated.candidate_weights(session.confirmed, session.ruled_out)
+    assert np.allclose(session.weights(), expected)
+
+
+def test_store_resumes_expires_and_evicts_sessions(matrix):
+    clock = FakeClock()
+    store = SessionStore(max_sessions=2, idle_seconds=60, clock=clock)
+    first_id, first = store.open(None, lambda: SymptomSession(matrix))
+
+    clock.now = 30
+    assert store.open(first_id, lambda: SymptomSession(matrix)) == (first_id, first)
+    second_id, _ = store.open("made-up", lambda: SymptomSession(matrix))
+    assert second_id not in (first_id, "made-up")
+
+    clock.now = 85
+    third_id, _ = store.open(None, lambda: SymptomSession(matrix))
+    # Both earlier sessions are still within the idle time, so the least
+    # recently used one makes room.
+    assert len(store) == 2 and store.stats()["evictions"] == 1
+
+    clock.now = 200
+    assert store.open(third_id, lambda: SymptomSession(matrix))[0] != third_id
+    stats = store.stats()
+    assert (stats["created"], stats["resumed"], stats["expirations"]) == (4, 1, 2)
+    assert store.discard(third_id) is False
+
+
+def test_store_respects_byte_budget(matrix):
+    size = SymptomSession(matrix).nbytes
+    store = SessionStore(max_bytes=2 * size)
+    for _ in range(3):
+        store.open(None, lambda: SymptomSession(matrix))
+
+    assert len(store) == 2
+    assert store.stats()["bytes"] == 2 * size
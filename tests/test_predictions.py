@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from predictions import (
+    ANEMIA_FEATURES,
+    FEVER_CATEGORICAL_ENCODERS,
+    FEVER_NUMERIC_FIELDS,
+    parse_anemia,
+    parse_fever,
+    predict_records,
+    score_anemia,
+    score_fever,
+)
+
+
+class FailingTypeModel:
+    def predict(self, arr):
+        if (arr[:, 0] > 0).any():
+            raise ValueError("unseen class")
+        return np.zeros(len(arr), dtype=int)
+
+
+@pytest.fixture()
+def models():
+    rng = np.random.default_rng(0)
+    fever_rows = rng.normal(size=(60, len(FEVER_NUMERIC_FIELDS) + len(FEVER_CATEGORICAL_ENCODERS)))
+    fever_severity = rng.integers(0, 3, size=60)
+    anemia_rows = rng.normal(size=(60, len(ANEMIA_FEATURES)))
+    type_encoder = LabelEncoder().fit(["Iron Deficiency"])
+    return {
+        "fever_scaler": StandardScaler().fit(fever_rows[:, : len(FEVER_NUMERIC_FIELDS)]),
+        "fever_le_dict": {
+            name: LabelEncoder().fit(["Yes", "No"] if name != "Physical_Activity" else ["Sedentary", "Active"])
+            for name in FEVER_CATEGORICAL_ENCODERS.values()
+        },
+        "fever_severity_model": LogisticRegression().fit(fever_rows, fever_severity),
+        "fever_risk_model": LinearRegression().fit(fever_rows, rng.uniform(-20, 120, size=60)),
+        "fever_target_le": LabelEncoder().fit(["Mild", "Moderate", "Severe"]),
+        "anemia_scaler": StandardScaler().fit(anemia_rows),
+        "anemia_risk_model": LogisticRegression().fit(anemia_rows, rng.integers(0, 2, size=60)),
+        "anemia_type_model": FailingTypeModel(),
+        "anemia_label_encoder": type_encoder,
+    }
+
+
+def _fever_record(rng, index):
+    record = {key: float(value) for key, value in zip(FEVER_NUMERIC_FIELDS, rng.normal(size=6))}
+    record.update({key: ["Yes", "No", "Maybe"][(index + offset) % 3] for offset, key in enumerate(FEVER_CATEGORICAL_ENCODERS)})
+    return record
+
+
+def test_batch_scores_match_one_record_at_a_time(models):
+    rng = np.random.default_rng(1)
+    fever = [_fever_record(rng, index) for index in range(20)]
+    anemia = [{key: float(value) for key, value in zip(ANEMIA_FEATURES, rng.normal(size=13))} for _ in range(20)]
+
+    for records, parse, score in ((fever, parse_fever, score_fever), (anemia, parse_anemia, score_anemia)):
+        rows = [parse(record)[0] for record in records]
+        batch = score(models, rows)
+        single = [score(models, [row])[0] for row in rows]
+        assert [result["severity"] for result in batch] == [result["severity"] for result in single]
+        assert [result["probability"] for result in batch] == pytest.approx([result["probability"] for result in single])
+    assert all(0 <= result["probability"] <= 100 for result in score_fever(models, [parse_fever(record)[0] for record in fever]))
+
+
+def test_anemia_type_falls_back_to_mcv_only_for_failing_rows(models):
+    low_mcv = {key: -1.0 for key in ANEMIA_FEATURES}
+    high_rbc = {**low_mcv, "rbc": 1.0, "mcv": 120.0}
+
+    results = predict_records("anemia", models, [low_mcv, high_rbc, {"rbc": 1.0}])
+
+    assert [result.get("severity") for result in results] == ["Iron Deficiency", "Macrocytic", None]
+    assert results[2] == {"success": False, "error": "Missing field: hemoglobin"}
+
+
+def test_non_finite_values_are_item_errors(models):
+    record = {key: -1.0 for key in ANEMIA_FEATURES}
+
+    results = predict_records("anemia", models, [record, {**record, "mcv": "inf"}, {**record, "wbc": float("nan")}])
+
+    assert results[0]["success"] is True
+    assert results[1:] == [
+        {"success": False, "error": "Invalid value for mcv"},
+        {"success": False, "error": "Invalid value for wbc"},
+    ]